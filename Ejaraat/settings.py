@@ -41,8 +41,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.ServerTimingMiddleware",
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -58,7 +62,8 @@ ROOT_URLCONF = "Ejaraat.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates, with the render time reported by ServerTimingMiddleware
+        "BACKEND": "core.profiling.ProfiledDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -68,6 +73,7 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
                 "django.template.context_processors.i18n",
+                "core.context_processors.live_events",
             ],
         },
     },
@@ -83,6 +89,15 @@ CHANNEL_LAYERS = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
@@ -107,8 +122,26 @@ DATABASES = {
     }
 }
 
-
-WHITENOISE_USE_FINDERS = True
+# Read replicas of the default database, e.g. "db-replica-1,db-replica-2". Each host gets a
+# "replica_<n>" alias with the credentials of the default database, see core.routers.
+# To try the routing locally, add a second alias to DATABASES, e.g. a copy of the SQLite
+# file, and list it in DATABASE_REPLICAS.
+DATABASE_REPLICA_HOSTS = [
+    host for host in os.getenv("DATABASE_REPLICA_HOSTS", "").split(",") if host
+]
+for index, host in enumerate(DATABASE_REPLICA_HOSTS, 1):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        # the tests read the replicas from the test database
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+# a session reads from the primary for this long after it wrote, the replication lag
+# should be well under it
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 10))
+REPLICA_PIN_COOKIE_NAME = "db_pin"
 
 
 # Password validation
@@ -166,14 +199,56 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = "/static/"
-STATICFILES_DIRS = [BASE_DIR / "static"]
+# the image variants written by `manage.py build_static`, see core.images
+RESPONSIVE_IMAGES_DIR = BASE_DIR / "static_build"
+STATICFILES_DIRS = [BASE_DIR / "static", RESPONSIVE_IMAGES_DIR]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Production sets STATIC_MANIFEST=True and runs `manage.py build_static` on deploy: the
+# files get hashed names, served by whitenoise as immutable, with .br and .gz siblings.
+# The manifest storage fails to render any page until that manifest exists, so
+# without the flag the files keep their names and are found in STATICFILES_DIRS.
+STATIC_MANIFEST = os.getenv("STATIC_MANIFEST", "False") == "True"
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if STATIC_MANIFEST
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
+# Production serves the files collected by `manage.py build_static` from STATIC_ROOT,
+# whitenoise indexes them once at startup instead of searching the finders per request
+WHITENOISE_USE_FINDERS = DEBUG or not STATIC_MANIFEST
+
+# The public pages pre-rendered per language by `manage.py build_static`, see core.prerender
+PRERENDERED_PAGES_DIR = BASE_DIR / "prerendered"
+PRERENDERED_PAGES_MAX_AGE = 60 * 60 * 24
+
+RESPONSIVE_IMAGE_WIDTHS = (80, 160, 200, 400, 640, 960, 1280, 1920)
+# encoder quality per format, in the order the browser tries them
+RESPONSIVE_IMAGE_FORMATS = {"avif": 50, "webp": 80}
+
 
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Media files are only served to their landlord through core.views.protected_media.
+# Set to "nginx" (X-Accel-Redirect) or "sendfile" (X-Sendfile) to let the front
+# server do the byte transfer, e.g. for nginx:
+#   location /protected-media/ { internal; alias /path/to/media/; }
+MEDIA_SENDFILE_BACKEND = os.getenv("MEDIA_SENDFILE_BACKEND")
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+
+# Resumable contract uploads (core.views.start_upload / upload_chunk)
+CHUNKED_UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+CHUNKED_UPLOAD_MAX_SIZE = 50 * 1024 * 1024  # 50MB
+# uploads that are not attached to a rental after this are deleted by `manage.py prune_history`
+CHUNKED_UPLOAD_TTL_HOURS = int(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", 24))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -181,6 +256,85 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+NOTIFICATIONS_PAGE_SIZE = 20
+
+RENT_HISTORY_PAGE_SIZE = 20
+# Pages of the read API, see core.api; a client may ask for up to API_MAX_PAGE_SIZE rows
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+# Delta sync of the offline clients, see core.sync
+SYNC_PAGE_SIZE = 500
+# changes younger than this are left for the next sync, their transaction may still be open
+SYNC_SETTLE_SECONDS = 5
+# tombstones of deleted rows are pruned after this, older cursors sync from scratch
+SYNC_TOMBSTONE_TTL_DAYS = int(os.getenv("SYNC_TOMBSTONE_TTL_DAYS", 90))
+# Live events of the WebSocket clients, see core.events. A reconnecting client gets the
+# events it missed when there are at most WS_REPLAY_BUFFER_SIZE of them and they are
+# younger than WS_REPLAY_TTL seconds, otherwise it resyncs
+WS_REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", 100))
+WS_REPLAY_TTL = int(os.getenv("WS_REPLAY_TTL", 60 * 10))
+# The clients send a heartbeat every WS_HEARTBEAT_SECONDS; a user whose clients were not
+# heard of for WS_PRESENCE_TTL seconds, e.g. after a worker crashed, is counted offline
+# and the live events are not built for them
+WS_HEARTBEAT_SECONDS = int(os.getenv("WS_HEARTBEAT_SECONDS", 30))
+WS_PRESENCE_TTL = int(os.getenv("WS_PRESENCE_TTL", 90))
+
+# Seconds the property card and rent history fragments are cached, they are keyed by
+# the property version so a change shows up right away
+PROPERTY_FRAGMENT_TTL = 60 * 60 * 24
+
+# Seconds each lazy loaded panel of the home page is cached, see core.dashboard.PANELS
+DASHBOARD_PANEL_TTLS = {
+    "revenue": 60 * 15,
+    "upcoming_payments": 60 * 5,
+    "expiring_contracts": 60 * 30,
+    "recent_activities": 60,
+    "payment_status_chart": 60 * 5,
+    "recent_tenants": 60 * 30,
+    "available_properties": 60 * 30,
+    "rented_properties": 60 * 30,
+}
+
+# Read exchange rates from a JSON file instead of the exchange rate API,
+# e.g. BASE_DIR / "core" / "data" / "currency_rates.json" when working offline
+CURRENCY_RATES_FIXTURE = os.getenv("CURRENCY_RATES_FIXTURE")
+# how long the exchange rates from the API are cached
+CURRENCY_RATES_CACHE_TTL = 60 * 60
+
+# Response compression, see core.middleware.CompressionMiddleware
+COMPRESSION_MIN_SIZE = 512  # bytes, smaller responses are sent as they are
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_GZIP_LEVEL = 6
+# random-length padding added to each compressed body against BREACH, at most 256
+COMPRESSION_MAX_RANDOM_BYTES = 100
+# responses that come from a cache are compressed harder once, and the result is cached
+COMPRESSION_CACHED_BROTLI_QUALITY = 11
+COMPRESSION_CACHED_GZIP_LEVEL = 9
+COMPRESSION_CACHE_TTL = 60 * 60
+
+# Retention of RecentActivity and read Notifications, see `manage.py prune_history`
+RECENT_ACTIVITY_TTL_DAYS = int(os.getenv("RECENT_ACTIVITY_TTL_DAYS", 90))
+NOTIFICATIONS_TTL_DAYS = int(os.getenv("NOTIFICATIONS_TTL_DAYS", 30))
+# move pruned rows to the archive tables instead of deleting them
+RETENTION_ARCHIVE = True
+
+# Compile the templates and load the translations when a worker boots, see core.warmup
+WARMUP_ON_BOOT = os.getenv("WARMUP_ON_BOOT", "True") == "True"
+
+# Server-Timing headers and slow request logs, see core.middleware.ServerTimingMiddleware
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "False") == "True"
+# share of the requests that are profiled
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", 0.1))
+SERVER_TIMING_SLOW_MS = int(os.getenv("SERVER_TIMING_SLOW_MS", 500))
+
+# Prometheus metrics served at /metrics, see core.metrics
+# a directory shared by the workers to report their metrics together, per process when empty
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_SNAPSHOT_INTERVAL = 5  # seconds
+# /metrics requires an "Authorization: Bearer <token>" header, it is not served without a token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
@@ -1,7 +1,5 @@
 from django.contrib import admin
 from django.conf.urls.i18n import i18n_patterns
-from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import path, include
 from django.views.i18n import set_language
 
@@ -13,6 +11,3 @@ urlpatterns = [
 urlpatterns += i18n_patterns(
     path("set-language/", set_language, name="set_language"),
 )
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -5,3 +5,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Ejaraat.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings
+
+from core.warmup import warm_up
+
+if settings.WARMUP_ON_BOOT:
+    warm_up()
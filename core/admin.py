@@ -8,3 +8,7 @@ admin.site.register(Tenant)
 admin.site.register(RentHistory)
 admin.site.register(RecentActivity)
 admin.site.register(Notifications)
+admin.site.register(ChunkedUpload)
+admin.site.register(ArchivedActivity)
+admin.site.register(ArchivedNotification)
+admin.site.register(Tombstone)
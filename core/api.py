@@ -0,0 +1,251 @@
+import hashlib
+
+import orjson
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import (
+    Notifications,
+    Property,
+    RecentActivity,
+    RentHistory,
+    RentProperty,
+    Tenant,
+)
+from .routers import read_from_replicas
+from .utils import landlord_conditional
+
+
+class ApiError(ValueError):
+    """
+    A request the API cannot answer, returned to the client as a 400.
+    """
+
+
+# The resources of the read API: the model, the lookup of the landlord, the fields a
+# client may select, the filters it may use and whether the landlord's data version
+# covers the rows. The first field is the key of the keyset pagination.
+API_RESOURCES = {
+    "properties": {
+        "model": Property,
+        "owner": "user",
+        "fields": (
+            "id",
+            "name",
+            "property_type",
+            "country",
+            "city",
+            "address",
+            "currency",
+            "is_rented",
+            "created_at",
+        ),
+        "filters": {"is_rented": "is_rented"},
+        "versioned": True,
+    },
+    "tenants": {
+        "model": Tenant,
+        "owner": "landlord",
+        "fields": ("id", "name", "phone_number"),
+        "filters": {},
+        "versioned": True,
+    },
+    "rentals": {
+        "model": RentProperty,
+        "owner": "property__user",
+        "fields": (
+            "id",
+            "property_id",
+            "tenant_id",
+            "payment",
+            "price",
+            "damage_deposit",
+            "start_date",
+            "end_date",
+            "status",
+        ),
+        "filters": {"property": "property_id", "tenant": "tenant_id", "status": "status"},
+        "versioned": True,
+    },
+    "history": {
+        "model": RentHistory,
+        "owner": "property__user",
+        "fields": (
+            "id",
+            "property_id",
+            "tenant_id",
+            "price",
+            "damage_deposit",
+            "payment_type",
+            "start_date",
+            "end_date",
+        ),
+        "filters": {"property": "property_id", "tenant": "tenant_id"},
+        "versioned": True,
+    },
+    "activities": {
+        "model": RecentActivity,
+        "owner": "user",
+        "fields": ("id", "property_id", "activity_type", "timestamp"),
+        "filters": {"property": "property_id", "activity_type": "activity_type"},
+        "versioned": True,
+    },
+    # reading a notification does not change the landlord's data version
+    "notifications": {
+        "model": Notifications,
+        "owner": "user",
+        "fields": ("id", "property_id", "kind", "message", "is_read", "period", "timestamp"),
+        "filters": {"property": "property_id", "is_read": "is_read"},
+        "versioned": False,
+    },
+}
+
+BOOLEANS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def parse_fields(resource, value):
+    """
+    Parse the sparse fieldset of a request, e.g. "name,city".
+
+    Args:
+        resource (dict): The resource, one of API_RESOURCES.
+        value (str | None): The "fields" query parameter.
+
+    Returns:
+        list: The selected fields, the key first. All the fields without a value.
+
+    Raises:
+        ApiError: If a field is not one of the fields of the resource.
+    """
+    key, *fields = resource["fields"]
+    if not value:
+        return [key, *fields]
+
+    selected = [key]
+    for field in value.split(","):
+        if field not in resource["fields"]:
+            raise ApiError(f"Unknown field: {field}")
+        if field not in selected:
+            selected.append(field)
+    return selected
+
+
+def get_api_page(name, user, params):
+    """
+    Get a page of a resource of the API as dicts, with keyset pagination on its key.
+
+    The rows are read with values(), no model instance is built.
+
+    Args:
+        name (str): The name of the resource, one of API_RESOURCES.
+        user (User): The landlord.
+        params (QueryDict): The query parameters: "fields", "after" (the cursor returned
+            with the previous page), "limit" and the filters of the resource.
+
+    Returns:
+        dict: The rows of the page in "results" and the cursor of the next page in
+            "next", None on the last page.
+
+    Raises:
+        ApiError: If a parameter is invalid.
+    """
+    resource = API_RESOURCES[name]
+    fields = parse_fields(resource, params.get("fields"))
+    key = fields[0]
+
+    try:
+        limit = int(params.get("limit", settings.API_PAGE_SIZE))
+        after = int(params["after"]) if params.get("after") else None
+    except ValueError:
+        raise ApiError("limit and after must be integers")
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(f"limit must be between 1 and {settings.API_MAX_PAGE_SIZE}")
+
+    rows = resource["model"].objects.filter(**{resource["owner"]: user})
+
+    for param, lookup in resource["filters"].items():
+        value = params.get(param)
+        if value is None:
+            continue
+        if lookup.startswith("is_"):
+            if value not in BOOLEANS:
+                raise ApiError(f"{param} must be true or false")
+            value = BOOLEANS[value]
+        try:
+            rows = rows.filter(**{lookup: value})
+        except (TypeError, ValueError):
+            raise ApiError(f"Invalid {param}: {value}")
+
+    if after is not None:
+        rows = rows.filter(**{f"{key}__gt": after})
+
+    results = list(rows.order_by(key).values(*fields)[: limit + 1])
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = str(results[-1][key])
+
+    return {"results": results, "next": next_cursor}
+
+
+def json_response(request, data, etag=False, status=200):
+    """
+    Encode data with orjson into a JSON response.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        data: The data, dates and datetimes are encoded in ISO 8601.
+        etag (bool, optional): Set an ETag from the content and answer a matching
+            If-None-Match with a 304. Defaults to False.
+        status (int, optional): The status code. Defaults to 200.
+
+    Returns:
+        HttpResponse: The JSON response.
+    """
+    content = orjson.dumps(data)
+
+    if etag and status == 200:
+        etag = f'W/"{hashlib.md5(content, usedforsecurity=False).hexdigest()}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type="application/json")
+        response.headers["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return HttpResponse(content, content_type="application/json", status=status)
+
+
+def render_api_page(request, name, etag=False):
+    try:
+        page = get_api_page(name, request.user, request.GET)
+    except ApiError as error:
+        return json_response(request, {"error": str(error)}, status=400)
+    return json_response(request, page, etag=etag)
+
+
+@landlord_conditional
+@read_from_replicas
+def serve_versioned_api_page(request, name):
+    return render_api_page(request, name)
+
+
+def serve_api_page(request, name):
+    """
+    Serve a page of a resource of the API.
+
+    The pages of the resources covered by the landlord's data version get their ETag
+    from it, so an up to date client gets a 304 without a query. The other pages get
+    their ETag from their content.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        name (str): The name of the resource, one of API_RESOURCES.
+
+    Returns:
+        HttpResponse: The page as JSON, or the error as JSON with a 400.
+    """
+    if API_RESOURCES[name]["versioned"]:
+        return serve_versioned_api_page(request, name)
+    return render_api_page(request, name, etag=True)
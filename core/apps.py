@@ -6,4 +6,6 @@ class CoreConfig(AppConfig):
     name = "core"
 
     def ready(self):
+        import core.checks
+        import core.profiling
         import core.signals
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# The cache backends whose data is only seen by the process that wrote it
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def check_live_events_cache(app_configs, **kwargs):
+    """
+    Check that the live events state is shared by the processes that share the channel layer.
+
+    The presence counts and the sequence numbers of core.events are kept in the default
+    cache. With a channel layer shared by several processes (e.g. Redis) and a cache
+    local to each, a process sees the users connected to another one as offline and
+    skips their events, and each process numbers the events on its own.
+
+    Args:
+        app_configs (list | None): The apps to check, unused.
+        **kwargs: Additional keyword arguments.
+
+    Returns:
+        list: An error when the channel layer is shared and the cache is not.
+    """
+    layer = settings.CHANNEL_LAYERS.get("default", {}).get("BACKEND", "")
+    backend = settings.CACHES["default"]["BACKEND"]
+
+    shared_layer = layer and layer != "channels.layers.InMemoryChannelLayer"
+
+    if shared_layer and backend in PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                f"The default cache ({backend}) is local to each process, but the channel "
+                f"layer ({layer}) is shared.",
+                hint="Set CACHE_BACKEND to a shared cache, e.g. Redis or Memcached, so "
+                "the WebSocket presence and event sequence numbers are seen by every "
+                "process.",
+                id="core.E001",
+            )
+        ]
+
+    return []
@@ -1,10 +1,21 @@
 import json
 
-from django.template.loader import render_to_string
+from django.conf import settings
 
 from asgiref.sync import async_to_sync
 from channels.generic.websocket import WebsocketConsumer
 
+from .events import (
+    PROTOCOL_VERSION,
+    get_event_seq,
+    get_missed_events,
+    get_resync,
+    mark_connected,
+    mark_disconnected,
+    publish_event,
+    refresh_presence,
+)
+from .metrics import WEBSOCKETS
 from .utils import clear_notification_service
 
 
@@ -25,53 +36,60 @@ class RecentActivitiesConsumer(WebsocketConsumer):
                 f"user_{self.user_id}", self.channel_name
             )
             self.accept()
+            mark_connected(self.user_id)
+            WEBSOCKETS.inc()
 
     def disconnect(self, close_code):
         if self.user.is_authenticated:
             async_to_sync(self.channel_layer.group_discard)(
                 f"user_{self.user_id}", self.channel_name
             )
+            mark_disconnected(self.user_id)
+            WEBSOCKETS.dec()
 
     def receive(self, text_data):
-        data = json.loads(text_data).get("data")
+        message = json.loads(text_data)
 
-        if data == "clear":
-            notifications_html = clear_notification_service(self.user)
-            self.send(
-                text_data=json.dumps(
-                    {
-                        "notifications_html": notifications_html,
-                        "type": "clear_notifications",
-                    }
-                )
-            )
+        if message.get("type") == "resume":
+            self.resume(message.get("last_seq"))
+        elif message.get("data") == "clear":
+            clear_notification_service(self.user)
+            # every tab of the user drops its notifications
+            publish_event(self.user_id, "notifications.cleared", {"unread_count": 0})
 
-    # Method to send the recent activities
-    def send_recent_activities(self, event):
-        if event["recent_activities"]:
-            activities_html = render_to_string("includes/recent_activities.html", {"recent_activities": event["recent_activities"]}
-            )
-            self.send(
-                text_data=json.dumps(
-                    {"activities_html": activities_html, "type": "recent_activities"}
-                )
-            )
+    def resume(self, last_seq):
+        """
+        Catch a (re)connected client up with the events it missed, and keep it counted as
+        connected. The client also resumes as its heartbeat.
 
-    # Method to send overdue notifications
-    def send_overdue_notifications(self, event):
-        if event["notifications"]:
-            notifications_html = render_to_string("includes/notifications.html", {"notifications": event["notifications"]}
-            )
-            self.send(
-                text_data=json.dumps(
-                    {"notifications_html": notifications_html, "type": "notifications"}
-                )
-            )
+        Args:
+            last_seq (int | None): The sequence number of the last event the client got,
+                None when it just loaded the page and has the current state.
+        """
+        refresh_presence(self.user_id)
+
+        if isinstance(last_seq, int):
+            seq, events = get_missed_events(self.user_id, last_seq)
+            if events is None:
+                self.send(text_data=get_resync(self.user, seq))
+            else:
+                # events sent to the group meanwhile may come again, the client skips them
+                for text in events:
+                    self.send(text_data=text)
+        else:
+            seq = get_event_seq(self.user_id)
 
-    def send_payment_status_chart(self, event):
-        if event["data"]:
-            self.send(
-                text_data=json.dumps(
-                    {"data": event["data"], "type": "payment_status_chart"}
-                )
+        self.send(
+            text_data=json.dumps(
+                {
+                    "v": PROTOCOL_VERSION,
+                    "seq": seq,
+                    "type": "hello",
+                    "heartbeat": settings.WS_HEARTBEAT_SECONDS,
+                }
             )
+        )
+
+    # Method to send an event, encoded once by publish_event for all the clients
+    def send_event(self, event):
+        self.send(text_data=event["text"])
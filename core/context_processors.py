@@ -0,0 +1,21 @@
+from .events import get_event_seq
+
+
+def live_events(request):
+    """
+    Add the sequence number of the user's last live event to the context, see core.events.
+
+    The number is read when the page template uses it, before the content below it, so
+    the WebSocket client of the page asks for the events sent after it, including those
+    sent before the socket was open.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        dict: The "event_seq" of an authenticated user, as a callable so only the pages
+            that use it read it.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {"event_seq": lambda: get_event_seq(request.user.id)}
@@ -0,0 +1,141 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.translation import get_language
+
+from .models import Property, RecentActivity, RentProperty
+from .utils import (
+    aget_monthly_revenue,
+    get_expiring_contracts,
+    get_payment_status_chart,
+    get_upcoming_payments,
+    sync_to_thread,
+)
+
+
+def get_rented_properties(user):
+    return list(
+        Property.objects.filter(user=user, is_rented=True)
+        .order_by("property_rentals__end_date")
+        .prefetch_related("property_rentals__tenant")
+    )
+
+
+async def load_revenue(user):
+    rented_properties = await sync_to_thread(get_rented_properties, user)
+    return {"monthly_revenue": await aget_monthly_revenue(rented_properties)}
+
+
+async def load_upcoming_payments(user):
+    def load():
+        return get_upcoming_payments(get_rented_properties(user))
+
+    return {"upcoming_payments": await sync_to_thread(load)}
+
+
+async def load_expiring_contracts(user):
+    def load():
+        return get_expiring_contracts(get_rented_properties(user))
+
+    return {"expiring_contracts": await sync_to_thread(load)}
+
+
+async def load_recent_activities(user):
+    def load():
+        return list(
+            RecentActivity.objects.filter(user=user)
+            .exclude(activity_type="overdue")
+            .select_related("property")
+            .order_by("-timestamp")[:10]
+        )
+
+    return {"recent_activities": await sync_to_thread(load)}
+
+
+async def load_payment_status_chart(user):
+    return {"payment_status_counts": await sync_to_thread(get_payment_status_chart, user)}
+
+
+async def load_recent_tenants(user):
+    def load():
+        return list(
+            RentProperty.objects.filter(tenant__landlord=user, property__user=user)
+            .select_related("tenant", "property")
+            .order_by("-start_date")[:5]
+        )
+
+    return {"recent_tenants": await sync_to_thread(load)}
+
+
+async def load_available_properties(user):
+    def load():
+        return list(
+            Property.objects.filter(user=user, is_rented=False).order_by("created_at")
+        )
+
+    return {"available_properties": await sync_to_thread(load)}
+
+
+async def load_rented_properties(user):
+    return {"rented_properties": await sync_to_thread(get_rented_properties, user)}
+
+
+# The lazy loaded panels of the home page: the template they render and their loader.
+# Each panel is cached on its own for DASHBOARD_PANEL_TTLS[name] seconds.
+PANELS = {
+    "revenue": ("includes/monthly_revenue.html", load_revenue),
+    "upcoming_payments": ("includes/upcoming_payments.html", load_upcoming_payments),
+    "expiring_contracts": ("includes/expiring_contracts.html", load_expiring_contracts),
+    "recent_activities": ("includes/recent_activities.html", load_recent_activities),
+    "payment_status_chart": ("includes/payment_status_chart.html", load_payment_status_chart),
+    "recent_tenants": ("includes/recent_tenants.html", load_recent_tenants),
+    # the lists of the overview modals, loaded when the modal is opened
+    "available_properties": ("includes/available_properties.html", load_available_properties),
+    "rented_properties": ("includes/rented_properties.html", load_rented_properties),
+}
+
+
+def get_panel_cache_key(name, user_id, language):
+    return f"dashboard_panel_{name}_{user_id}_{language}"
+
+
+async def render_panel(request, user, name):
+    """
+    Render a panel of the home page, from the cache when it was rendered recently.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        user (User): The user the panel is rendered for.
+        name (str): The name of the panel, one of PANELS.
+
+    Returns:
+        str: The HTML of the panel.
+    """
+    cache_key = get_panel_cache_key(name, user.id, get_language())
+    html = await cache.aget(cache_key)
+    if html is not None:
+        return html
+
+    template_name, load = PANELS[name]
+    context = await load(user)
+    html = await sync_to_async(render_to_string)(template_name, context, request)
+
+    await cache.aset(cache_key, html, settings.DASHBOARD_PANEL_TTLS[name])
+    return html
+
+
+def invalidate_panels(user_id):
+    """
+    Drop the cached panels of a user, in every language, after their data changed.
+
+    Args:
+        user_id (int): The id of the user.
+    """
+    cache.delete_many(
+        [
+            get_panel_cache_key(name, user_id, language)
+            for name in PANELS
+            for language, _ in settings.LANGUAGES
+        ]
+    )
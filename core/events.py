@@ -0,0 +1,270 @@
+import time
+
+import orjson
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .metrics import GROUP_SEND_LATENCY, GROUP_SENDS
+from .models import RecentActivity
+from .utils import (
+    get_notifications_page,
+    get_payment_status_chart,
+    get_unread_notifications_count,
+)
+
+
+# The version of the messages sent to the WebSocket clients. Each event is sent as
+# {"v": 2, "seq": <n>, "type": <type>, "data": {...}} where the sequence number grows by
+# one per event of the user, so a client knows when it missed some:
+#   - "activity.created": a recent activity, its "html" is the item of the list
+#   - "notification.created": an overdue notification, its "html" and "unread_count"
+#   - "notifications.cleared": the notifications were read, with "unread_count"
+#   - "chart.updated": the "paid", "pending" and "overdue" counts of the rentals
+# The client sends {"type": "resume", "last_seq": <n>} when it (re)connects, and every
+# WS_HEARTBEAT_SECONDS to stay counted as connected, and gets the events it missed, or a
+# "resync" with the current state when they are gone, then a "hello".
+PROTOCOL_VERSION = 2
+
+
+def get_event_seq_key(user_id):
+    return f"ws_event_seq_{user_id}"
+
+
+def get_event_key(user_id, seq):
+    return f"ws_event_{user_id}_{seq}"
+
+
+def get_event_seq(user_id):
+    """
+    Get the sequence number of the last event sent to a user.
+
+    A user without one, e.g. after a cache restart, starts from the current time in
+    milliseconds, above the numbers sent before, so the clients see a gap and resync.
+
+    Args:
+        user_id (int): The id of the user.
+
+    Returns:
+        int: The sequence number.
+    """
+    key = get_event_seq_key(user_id)
+    seq = cache.get(key)
+    if seq is None:
+        cache.add(key, int(time.time() * 1000), None)
+        seq = cache.get(key)
+    return seq
+
+
+def next_event_seq(user_id):
+    key = get_event_seq_key(user_id)
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.incr(key)
+
+
+def get_presence_key(user_id):
+    return f"ws_presence_{user_id}"
+
+
+def mark_connected(user_id):
+    """
+    Count a new WebSocket connection of a user.
+
+    The count expires WS_PRESENCE_TTL seconds after the last heartbeat of the user's
+    clients, so the connections of a worker that crashed are not counted for ever.
+
+    Args:
+        user_id (int): The id of the user.
+    """
+    key = get_presence_key(user_id)
+    cache.add(key, 0, settings.WS_PRESENCE_TTL)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # expired in between
+        count = 0
+    if count <= 0:
+        # the count was recreated while others were connected, see refresh_presence
+        cache.set(key, 1, settings.WS_PRESENCE_TTL)
+
+
+def mark_disconnected(user_id):
+    try:
+        cache.decr(get_presence_key(user_id))
+    except ValueError:
+        # expired, it is not counted anymore
+        pass
+
+
+def refresh_presence(user_id):
+    """
+    Keep the connections of a user counted, on each heartbeat of a client.
+
+    A count that expired while the client was connected starts again from this
+    connection, the others are counted again on their own heartbeat.
+
+    Args:
+        user_id (int): The id of the user.
+    """
+    key = get_presence_key(user_id)
+    if cache.get(key, 0) > 0:
+        cache.touch(key, settings.WS_PRESENCE_TTL)
+    else:
+        cache.set(key, 1, settings.WS_PRESENCE_TTL)
+
+
+def is_online(user_id):
+    return cache.get(get_presence_key(user_id), 0) > 0
+
+
+def skip_event(user_id):
+    """
+    Skip an event of a user without a connected client, without building it.
+
+    Its sequence number is still used, so a client that was connected in the meantime
+    (e.g. counted offline after a crash) sees the gap on its next heartbeat or reconnect
+    and resyncs.
+
+    Args:
+        user_id (int): The id of the user.
+    """
+    next_event_seq(user_id)
+
+
+def send_to_user(user_id, message):
+    """
+    Send a message to the WebSocket group of a user, counting and timing it per message type.
+
+    Args:
+        user_id (int): The id of the user.
+        message (dict): The message, its "type" is the consumer method that handles it and
+            its "event", if any, the type of the event it carries.
+    """
+    type = message.get("event", message["type"])
+    with GROUP_SEND_LATENCY.time(type=type):
+        async_to_sync(get_channel_layer().group_send)(f"user_{user_id}", message)
+    GROUP_SENDS.inc(type=type)
+
+
+def publish_event(user_id, type, data):
+    """
+    Send an event to the WebSocket clients of a user and keep it in the replay buffer.
+
+    The event is encoded once here, the consumers send the text as is.
+
+    Args:
+        user_id (int): The id of the user.
+        type (str): The type of the event, see PROTOCOL_VERSION.
+        data (dict): The data of the event, it must be serializable to JSON.
+
+    Returns:
+        int: The sequence number of the event.
+    """
+    seq = next_event_seq(user_id)
+    text = orjson.dumps(
+        {"v": PROTOCOL_VERSION, "seq": seq, "type": type, "data": data}
+    ).decode()
+    cache.set(get_event_key(user_id, seq), text, settings.WS_REPLAY_TTL)
+
+    send_to_user(user_id, {"type": "send_event", "event": type, "text": text})
+    return seq
+
+
+def publish_activity(activity):
+    """
+    Send a new recent activity to the clients of its user, as the item of the list.
+
+    Args:
+        activity (RecentActivity): The activity, with its property.
+    """
+    publish_event(
+        activity.user_id,
+        "activity.created",
+        {
+            "id": activity.id,
+            "activity_type": activity.activity_type,
+            "property_id": activity.property_id,
+            "timestamp": activity.timestamp,
+            "html": render_to_string(
+                "includes/activity_item.html", {"activity": activity}
+            ),
+        },
+    )
+
+
+def publish_notification(notification, unread_count):
+    publish_event(
+        notification.user_id,
+        "notification.created",
+        {
+            "id": notification.id,
+            "unread_count": unread_count,
+            "html": render_to_string(
+                "includes/notification_item.html", {"notification": notification}
+            ),
+        },
+    )
+
+
+def get_missed_events(user_id, last_seq):
+    """
+    Get the events a client missed since the last one it got.
+
+    Args:
+        user_id (int): The id of the user.
+        last_seq (int): The sequence number of the last event the client got.
+
+    Returns:
+        tuple: The sequence number of the last event, and the encoded events after
+            last_seq in order, or None when some of them are no longer in the replay
+            buffer and the client has to resync.
+    """
+    seq = get_event_seq(user_id)
+    if last_seq >= seq:
+        return seq, []
+    if seq - last_seq > settings.WS_REPLAY_BUFFER_SIZE:
+        return seq, None
+
+    keys = [get_event_key(user_id, n) for n in range(last_seq + 1, seq + 1)]
+    events = cache.get_many(keys)
+    if len(events) < len(keys):
+        return seq, None
+    return seq, [events[key] for key in keys]
+
+
+def get_resync(user, seq):
+    """
+    Get the current state of the live parts of the pages, for a client that missed too
+    many events to catch up.
+
+    Args:
+        user (User): The user.
+        seq (int): The sequence number of the last event, the client continues from it.
+
+    Returns:
+        str: The encoded "resync" message.
+    """
+    recent_activities = list(
+        RecentActivity.objects.filter(user=user)
+        .exclude(activity_type="overdue")
+        .select_related("property")
+        .order_by("-timestamp")[:10]
+    )
+    notifications, next_cursor = get_notifications_page(user, unread_only=True)
+
+    data = {
+        "activities_html": render_to_string(
+            "includes/recent_activities.html", {"recent_activities": recent_activities}
+        ),
+        "notifications_html": render_to_string(
+            "includes/notifications_feed.html",
+            {"notifications": notifications, "next_cursor": next_cursor, "unread_only": True},
+        ),
+        "unread_count": get_unread_notifications_count(user),
+        "chart": get_payment_status_chart(user),
+    }
+    return orjson.dumps(
+        {"v": PROTOCOL_VERSION, "seq": seq, "type": "resync", "data": data}
+    ).decode()
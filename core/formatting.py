@@ -0,0 +1,145 @@
+import copy
+from functools import lru_cache
+
+from babel import Locale
+from django.conf import settings
+from django.utils.translation import get_language, to_locale
+
+
+@lru_cache
+def get_locale(language):
+    """
+    Get the Babel locale of a language, parsed once per process.
+
+    Args:
+        language (str): A language code, e.g. "ar" or "en-us".
+
+    Returns:
+        Locale: The locale.
+    """
+    return Locale.parse(to_locale(language))
+
+
+@lru_cache
+def get_number_pattern(language):
+    return get_locale(language).decimal_formats[None]
+
+
+@lru_cache
+def get_currency_patterns(language):
+    """
+    Get the currency pattern of a language, and a copy of it for whole amounts.
+
+    Args:
+        language (str): A language code.
+
+    Returns:
+        tuple: The standard pattern, and the pattern without decimals.
+    """
+    pattern = get_locale(language).currency_formats["standard"]
+    whole = copy.copy(pattern)
+    whole.frac_prec = (0, 0)
+    return pattern, whole
+
+
+def get_formatting_language(language=None):
+    return language or get_language() or settings.LANGUAGE_CODE
+
+
+def format_number(value, language=None):
+    """
+    Format a number the way it is written in a language, e.g. 12,500 or 12٬500.
+
+    Args:
+        value (int | float | Decimal): The number.
+        language (str, optional): A language code. Defaults to the active language.
+
+    Returns:
+        str: The formatted number.
+    """
+    language = get_formatting_language(language)
+    return get_number_pattern(language).apply(
+        value, get_locale(language), numbering_system="default"
+    )
+
+
+def format_currency(value, currency, language=None):
+    """
+    Format an amount of money the way it is written in a language, e.g. $12,500.
+
+    Whole amounts are written without decimals, others with the decimals of the currency.
+
+    Args:
+        value (int | float | Decimal): The amount.
+        currency (str | None): The ISO 4217 code of the currency, e.g. Property.currency.
+            Without it, the amount is formatted as a number.
+        language (str, optional): A language code. Defaults to the active language.
+
+    Returns:
+        str: The formatted amount.
+    """
+    language = get_formatting_language(language)
+    if not currency:
+        return format_number(value, language)
+
+    pattern, whole = get_currency_patterns(language)
+    if value == int(value):
+        pattern = whole
+    return pattern.apply(
+        value,
+        get_locale(language),
+        currency=currency,
+        currency_digits=pattern is not whole,
+        numbering_system="default",
+    )
+
+
+def format_numbers(values, language=None):
+    """
+    Format many numbers at once, the locale and pattern are only looked up once.
+
+    Args:
+        values (iterable): The numbers.
+        language (str, optional): A language code. Defaults to the active language.
+
+    Returns:
+        list: The formatted numbers, in the same order.
+    """
+    language = get_formatting_language(language)
+    locale, pattern = get_locale(language), get_number_pattern(language)
+    return [pattern.apply(value, locale, numbering_system="default") for value in values]
+
+
+def format_currencies(amounts, language=None):
+    """
+    Format many amounts of money at once.
+
+    Args:
+        amounts (iterable): The (amount, currency) pairs.
+        language (str, optional): A language code. Defaults to the active language.
+
+    Returns:
+        list: The formatted amounts, in the same order.
+    """
+    language = get_formatting_language(language)
+    return [format_currency(value, currency, language) for value, currency in amounts]
+
+
+def format_rental_prices(rentals, language=None):
+    """
+    Set the formatted price of rentals, in the currency of their property, as their
+    `formatted_price` for the templates that list many of them.
+
+    Args:
+        rentals (list): RentProperty instances with their property loaded.
+        language (str, optional): A language code. Defaults to the active language.
+
+    Returns:
+        list: The rentals.
+    """
+    prices = format_currencies(
+        ((rental.price, rental.property.currency) for rental in rentals), language
+    )
+    for rental, price in zip(rentals, prices):
+        rental.formatted_price = price
+    return rentals
@@ -0,0 +1,141 @@
+import json
+import os
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import FileSystemFinder
+from PIL import Image
+
+
+SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+MANIFEST_NAME = "responsive_images.json"
+
+
+def get_supported_formats():
+    """
+    Get the image formats of RESPONSIVE_IMAGE_FORMATS the installed Pillow can write.
+
+    AVIF needs a Pillow built with libavif, the variants are only written in WebP otherwise.
+
+    Returns:
+        dict: The quality of each format, in the order the browser should try them.
+    """
+    extensions = Image.registered_extensions()
+    return {
+        format: quality
+        for format, quality in settings.RESPONSIVE_IMAGE_FORMATS.items()
+        if f".{format}" in extensions
+    }
+
+
+def find_source_images():
+    """
+    Find the raster images of STATICFILES_DIRS, except the generated variants.
+
+    Returns:
+        list: The (static path, absolute path) of each image.
+    """
+    build_dir = os.path.abspath(settings.RESPONSIVE_IMAGES_DIR)
+    ignore_patterns = apps.get_app_config("staticfiles").ignore_patterns
+    images = []
+
+    for path, storage in FileSystemFinder().list(ignore_patterns):
+        full_path = os.path.abspath(storage.path(path))
+        if full_path.startswith(build_dir + os.sep):
+            continue
+        if path.lower().endswith(SOURCE_EXTENSIONS):
+            images.append((path.replace(os.sep, "/"), full_path))
+
+    return sorted(images)
+
+
+def write_variant(image, destination, width, format, quality):
+    """
+    Resize an image and write it in another format.
+
+    Args:
+        image (Image): The source image.
+        destination (str): The absolute path of the variant.
+        width (int): The width of the variant, the height keeps the aspect ratio.
+        format (str): "avif" or "webp".
+        quality (int): The encoder quality.
+    """
+    height = round(image.height * width / image.width)
+    variant = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    variant.save(destination, format.upper(), quality=quality)
+
+
+def build_responsive_images(force=False, log=None):
+    """
+    Write the resized WebP/AVIF variants of the static images to RESPONSIVE_IMAGES_DIR,
+    and the manifest the responsive_image template tag reads them from.
+
+    Each image gets a variant per RESPONSIVE_IMAGE_WIDTHS width smaller than the image,
+    and one at its own width unless it is wider than all of them. Variants newer than
+    their source are kept.
+
+    Args:
+        force (bool, optional): Write every variant again. Defaults to False.
+        log (callable, optional): Called with a line for each written variant.
+
+    Returns:
+        dict: The manifest, the size and the variants of each image by static path.
+    """
+    formats = get_supported_formats()
+    manifest = {}
+
+    for path, source in find_source_images():
+        with Image.open(source) as image:
+            image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        # images wider than the widest variant are not sent at their own size
+        widths = [width for width in settings.RESPONSIVE_IMAGE_WIDTHS if width < image.width]
+        if image.width <= max(settings.RESPONSIVE_IMAGE_WIDTHS):
+            widths.append(image.width)
+        stem = os.path.splitext(path)[0]
+
+        variants = {}
+        for format, quality in formats.items():
+            variants[format] = []
+            for width in widths:
+                name = f"{stem}-{width}w.{format}"
+                destination = os.path.join(settings.RESPONSIVE_IMAGES_DIR, name)
+                if (
+                    force
+                    or not os.path.exists(destination)
+                    or os.path.getmtime(destination) < os.path.getmtime(source)
+                ):
+                    write_variant(image, destination, width, format, quality)
+                    if log:
+                        log(f"Wrote {name}")
+                variants[format].append([width, name])
+
+        manifest[path] = {"width": image.width, "height": image.height, "variants": variants}
+
+    os.makedirs(settings.RESPONSIVE_IMAGES_DIR, exist_ok=True)
+    with open(os.path.join(settings.RESPONSIVE_IMAGES_DIR, MANIFEST_NAME), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    get_responsive_images.cache_clear()
+    return manifest
+
+
+@lru_cache
+def get_responsive_images():
+    """
+    Read the manifest of the image variants written by `manage.py build_static`.
+
+    Returns:
+        dict: The manifest, empty when the variants were not built.
+    """
+    try:
+        with open(os.path.join(settings.RESPONSIVE_IMAGES_DIR, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
@@ -0,0 +1,171 @@
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from core.models import (
+    Notifications,
+    Property,
+    RecentActivity,
+    RentHistory,
+    RentProperty,
+    Tenant,
+)
+
+
+COUNTRIES = ["SD", "EG", "US", "EU"]
+CURRENCIES = ["USD", "EUR", "SDG", "EGP"]
+PAYMENTS = ["1", "7", "30", "30", "30", "365"]
+STATUSES = ["paid", "paid", "pending", "overdue", "unpaid"]
+ACTIVITIES = ["add", "rent", "payment", "payment", "overdue"]
+
+
+def generate_portfolio(
+    landlords,
+    properties,
+    history=10,
+    activities=100,
+    occupancy=0.7,
+    prefix="bench",
+    seed=0,
+):
+    """
+    Build a synthetic portfolio of landlords, properties, tenants and their history.
+
+    Rows are written with bulk_create so the signals (activities, notifications and
+    socket broadcasts) are not triggered while generating the data.
+
+    Args:
+        landlords (int): The number of landlords.
+        properties (int): The number of properties of each landlord.
+        history (int, optional): The number of RentHistory rows of each property. Defaults to 10.
+        activities (int, optional): The number of RecentActivity rows of each landlord. Defaults to 100.
+        occupancy (float, optional): The share of properties that are rented. Defaults to 0.7.
+        prefix (str, optional): The prefix of the generated usernames. Defaults to "bench".
+        seed (int, optional): The random seed, the same seed builds the same portfolio. Defaults to 0.
+
+    Returns:
+        list: The generated landlords.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    now = timezone.now()
+
+    User.objects.bulk_create(
+        [
+            User(username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com")
+            for i in range(landlords)
+        ]
+    )
+    # bulk_create only returns primary keys on some databases
+    users = list(User.objects.filter(username__startswith=f"{prefix}_").order_by("id"))
+
+    Property.objects.bulk_create(
+        [
+            Property(
+                user=user,
+                name=f"Unit {i}",
+                property_type=rng.choice(Property.TYPE_CHOICES)[0],
+                country=rng.choice(COUNTRIES),
+                city="Khartoum",
+                address=f"Street {i}",
+                currency=rng.choice(CURRENCIES),
+                is_rented=rng.random() < occupancy,
+            )
+            for user in users
+            for i in range(properties)
+        ]
+    )
+    all_properties = list(Property.objects.filter(user__in=users).order_by("id"))
+
+    Tenant.objects.bulk_create(
+        [
+            Tenant(
+                landlord_id=property.user_id,
+                name=f"Tenant {property.id}",
+                phone_number=f"+2499{property.id:08d}"[:14],
+            )
+            for property in all_properties
+        ]
+    )
+    tenants = {
+        tenant.name: tenant
+        for tenant in Tenant.objects.filter(landlord__in=users)
+    }
+
+    rentals = []
+    histories = []
+    for property in all_properties:
+        tenant = tenants[f"Tenant {property.id}"]
+
+        if property.is_rented:
+            start_date = today - timedelta(days=rng.randint(1, 700))
+            rentals.append(
+                RentProperty(
+                    tenant=tenant,
+                    property=property,
+                    payment=rng.choice(PAYMENTS),
+                    price=rng.randint(50, 5000) * 10,
+                    damage_deposit=rng.choice([None, 500, 1000]),
+                    start_date=start_date,
+                    end_date=today + timedelta(days=rng.randint(-10, 400)),
+                    status=rng.choice(STATUSES),
+                )
+            )
+
+        end_date = today - timedelta(days=rng.randint(1, 30))
+        for _ in range(history):
+            start_date = end_date - timedelta(days=rng.randint(30, 365))
+            histories.append(
+                RentHistory(
+                    property=property,
+                    tenant=tenant,
+                    price=rng.randint(50, 5000) * 10,
+                    payment_type="month",
+                    start_date=start_date,
+                    end_date=end_date,
+                )
+            )
+            end_date = start_date - timedelta(days=1)
+
+    RentProperty.objects.bulk_create(rentals, batch_size=1000)
+    RentHistory.objects.bulk_create(histories, batch_size=1000)
+
+    properties_by_user = {}
+    for property in all_properties:
+        properties_by_user.setdefault(property.user_id, []).append(property)
+
+    recent_activities = []
+    notifications = []
+    for user in users:
+        for i in range(activities):
+            property = rng.choice(properties_by_user[user.id])
+            recent_activities.append(
+                RecentActivity(
+                    user=user,
+                    property=property,
+                    activity_type=rng.choice(ACTIVITIES),
+                )
+            )
+            if i % 10 == 0:
+                notifications.append(
+                    Notifications(
+                        user=user,
+                        property=property,
+                        message="Payment overdue for property",
+                        is_read=rng.random() < 0.8,
+                        period=today - timedelta(days=i),
+                    )
+                )
+
+    RecentActivity.objects.bulk_create(recent_activities, batch_size=1000)
+    Notifications.objects.bulk_create(notifications, batch_size=1000)
+
+    # auto_now_add sets every timestamp to now, spread them over the past year
+    recent_activities = list(RecentActivity.objects.filter(user__in=users).only("id"))
+    for activity in recent_activities:
+        activity.timestamp = now - timedelta(minutes=rng.randint(0, 525600))
+    RecentActivity.objects.bulk_update(recent_activities, ["timestamp"], batch_size=1000)
+
+    return users
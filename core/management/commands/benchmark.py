@@ -0,0 +1,247 @@
+import json
+import statistics
+import subprocess
+import time
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core.models import Property, RentProperty
+from core.utils import (
+    get_expiring_contracts,
+    get_monthly_revenue,
+    get_next_payment,
+    get_payment_status_chart,
+    get_upcoming_payments,
+)
+
+from ._portfolio import generate_portfolio
+from .check_query_budgets import record_queries
+
+
+class Command(BaseCommand):
+    """
+    Time the core views and helpers against synthetic portfolios of several sizes
+    """
+
+    help = (
+        "Build synthetic portfolios in a throw-away test database and time the core "
+        "views and core.utils helpers at each scale. Results are written as JSON so "
+        "runs from different commits can be compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="1x10,5x50,10x200",
+            help="Comma separated LANDLORDSxPROPERTIES scales (default: 1x10,5x50,10x200).",
+        )
+        parser.add_argument(
+            "--history",
+            type=int,
+            default=20,
+            help="RentHistory rows per property (default: 20).",
+        )
+        parser.add_argument(
+            "--activities",
+            type=int,
+            default=500,
+            help="RecentActivity rows per landlord (default: 500).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Cold and warm runs per target, after one warm-up run (default: 5).",
+        )
+        parser.add_argument(
+            "--output",
+            default="bench_output.json",
+            help="File the results are written to (default: bench_output.json).",
+        )
+        parser.add_argument(
+            "--compare",
+            help="A previous results file to compare the median timings with.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed of the generated data."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = [
+                tuple(int(value) for value in scale.split("x"))
+                for scale in options["scales"].split(",")
+            ]
+        except ValueError:
+            raise CommandError("--scales must look like 1x10,5x50")
+
+        results = {
+            "commit": self.get_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "scales": {},
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            fixture = Path(settings.BASE_DIR) / "core" / "data" / "currency_rates.json"
+            with override_settings(CURRENCY_RATES_FIXTURE=str(fixture)):
+                for index, (landlords, properties) in enumerate(scales):
+                    label = f"{landlords}x{properties}"
+                    self.stdout.write(f"Generating portfolio {label}...")
+                    users = generate_portfolio(
+                        landlords,
+                        properties,
+                        history=options["history"],
+                        activities=options["activities"],
+                        prefix=f"bench{index}",
+                        seed=options["seed"],
+                    )
+                    results["scales"][label] = self.run_scale(users[0], options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options["output"], "w") as f:
+            json.dump(results, f, indent=2)
+
+        self.report(results)
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                self.compare(json.load(f), results)
+
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_scale(self, user, repeat):
+        """
+        Time every target for one landlord of a generated portfolio.
+
+        Args:
+            user (User): The landlord the requests are made as.
+            repeat (int): The number of timed runs per target.
+
+        Returns:
+            dict: The timings and query counts of each target.
+        """
+        client = Client()
+        client.force_login(user)
+
+        rented = Property.objects.filter(user=user, is_rented=True)
+        rental = RentProperty.objects.filter(property__user=user).first()
+
+        targets = {
+            "home": lambda: client.get(reverse("home")),
+            "all_properties": lambda: client.get(reverse("all_properties")),
+            "all_tenants": lambda: client.get(reverse("all_tenants")),
+            "search_all_properties": lambda: client.get(
+                reverse("search_all_properties"), {"q": "Unit 1"}
+            ),
+            "search_all_tenants": lambda: client.get(
+                reverse("search_all_tenants"), {"q": "Tenant"}
+            ),
+            "view_property": lambda: client.get(
+                reverse("view_property", args=[rental.property_id])
+            ),
+            "mark_as_paid": lambda: client.get(reverse("mark_as_paid", args=[rental.id])),
+            "get_expiring_contracts": lambda: get_expiring_contracts(rented),
+            "get_upcoming_payments": lambda: get_upcoming_payments(rented),
+            "get_monthly_revenue": lambda: get_monthly_revenue(rented),
+            "get_payment_status_chart": lambda: get_payment_status_chart(user),
+            "get_next_payment": lambda: get_next_payment(
+                rental.payment, rental.start_date, date(2100, 1, 1)
+            ),
+        }
+
+        return {name: self.time_target(target, repeat) for name, target in targets.items()}
+
+    def time_target(self, target, repeat):
+        """
+        Run a target once to warm up, then time it with an empty cache and right after.
+
+        The queries of the threads the async views run their sections in are counted too.
+
+        Args:
+            target (callable): The target to run.
+            repeat (int): The number of cold and of warm runs.
+
+        Returns:
+            dict: The "cold" and "warm" min, median, mean and max time in milliseconds and
+                the queries of the last run.
+        """
+        target()
+
+        timings = {"cold": [], "warm": []}
+        queries = {}
+        for _ in range(repeat):
+            # the cold run fills the caches the warm run reads
+            cache.clear()
+            for kind in ("cold", "warm"):
+                with record_queries() as recorder:
+                    start = time.perf_counter()
+                    response = target()
+                    timings[kind].append((time.perf_counter() - start) * 1000)
+                queries[kind] = len(recorder.queries)
+
+                status_code = getattr(response, "status_code", None)
+                if status_code is not None and status_code >= 400:
+                    raise CommandError(f"target returned {status_code}")
+
+        return {
+            kind: {
+                "min_ms": round(min(timings[kind]), 3),
+                "median_ms": round(statistics.median(timings[kind]), 3),
+                "mean_ms": round(statistics.mean(timings[kind]), 3),
+                "max_ms": round(max(timings[kind]), 3),
+                "queries": queries[kind],
+            }
+            for kind in ("cold", "warm")
+        }
+
+    def report(self, results):
+        for label, targets in results["scales"].items():
+            self.stdout.write(f"\n{label:<30}{'cold':>13}{'warm':>30}")
+            for name, timing in targets.items():
+                self.stdout.write(
+                    f"  {name:<28}"
+                    + "".join(
+                        f" {timing[kind]['median_ms']:>12.2f} ms {timing[kind]['queries']:>5} queries"
+                        for kind in ("cold", "warm")
+                    )
+                )
+
+    def compare(self, previous, results):
+        self.stdout.write(f"\nCompared with {previous.get('commit') or 'previous run'}")
+        for label, targets in results["scales"].items():
+            for name, timing in targets.items():
+                before = previous.get("scales", {}).get(label, {}).get(name)
+                for kind in ("cold", "warm"):
+                    # files written before the cold and warm runs were split have neither
+                    if not before or not before.get(kind, {}).get("median_ms"):
+                        continue
+                    ratio = timing[kind]["median_ms"] / before[kind]["median_ms"]
+                    line = f"  {label:<10} {name:<28} {kind:<5} {ratio:>6.2f}x"
+                    if ratio > 1.1:
+                        self.stdout.write(self.style.WARNING(line))
+                    else:
+                        self.stdout.write(line)
+
+    def get_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except OSError:
+            return None
@@ -0,0 +1,49 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.images import build_responsive_images
+from core.prerender import prerender_pages
+
+
+class Command(BaseCommand):
+    """
+    Build the static files served in production
+    """
+
+    help = (
+        "Write the resized WebP/AVIF variants of the static images, collect the static "
+        "files with hashed names and their brotli and gzip siblings, then pre-render the "
+        "public pages in each language."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Write every image variant again, even when it is newer than its source.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the files of STATIC_ROOT before collecting them.",
+        )
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        manifest = build_responsive_images(force=options["force"], log=log)
+        variants = sum(
+            len(names) for image in manifest.values() for names in image["variants"].values()
+        )
+        self.stdout.write(f"{len(manifest)} images, {variants} variants")
+
+        # CompressedManifestStaticFilesStorage hashes the names and writes the .br and .gz files
+        call_command(
+            "collectstatic",
+            interactive=False,
+            clear=options["clear"],
+            verbosity=options["verbosity"],
+        )
+
+        # the pages link the hashed names, so they are rendered once the manifest exists
+        paths = prerender_pages()
+        self.stdout.write(f"{len(paths)} pages pre-rendered")
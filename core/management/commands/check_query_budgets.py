@@ -0,0 +1,339 @@
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.template.base import Node
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core.api import API_RESOURCES
+from core.dashboard import PANELS
+from core.models import ChunkedUpload, Property, RentProperty
+from core.urls import urlpatterns
+
+from ._portfolio import generate_portfolio
+
+
+# The maximum number of queries each URL in core/urls.py may run, sessions and auth included.
+QUERY_BUDGETS = {
+    "landing": 0,
+    "home": 6,
+    "dashboard_panel": 6,
+    "add_property": 2,
+    "rent_property": 3,
+    "edit_rental": 4,
+    "all_properties": 4,
+    "delete_property": 16,
+    "edit_property": 3,
+    "view_property": 5,
+    "rent_history": 4,
+    "mark_as_paid": 11,
+    "empty_property": 10,
+    "search_all_properties": 4,
+    "not_developed": 0,
+    "all_tenants": 3,
+    "search_all_tenants": 3,
+    "notifications_feed": 3,
+    "start_upload": 2,
+    "upload_chunk": 3,
+    "attach_contract_upload": 2,
+    "protected_media": 3,
+    "metrics": 0,
+    "api_summary": 3,
+    "api_resource": 3,
+    "api_sync": 8,
+}
+
+# URLs requested once per set of arguments, each checked against the budget of the URL
+URL_VARIANTS = {
+    "dashboard_panel": [[name] for name in PANELS],
+    "api_resource": [[name] for name in API_RESOURCES],
+}
+
+# Query strings of the URLs that need one, a rent history cursor before any end date
+QUERY_STRINGS = {
+    "rent_history": "after=9999-12-31_0",
+}
+
+# The public pages are requested without a login, the way their visitors come, and are
+# rendered whether or not `manage.py build_static` pre-rendered them
+PUBLIC_VIEWS = ["landing", "not_developed"]
+
+# Views that change data run last so the other views see the same portfolio.
+MUTATING_VIEWS = ["mark_as_paid", "delete_property", "empty_property"]
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql):
+    """
+    Replace the literals of a query so the same query with other parameters compares equal.
+
+    Args:
+        sql (str): The SQL of the query.
+
+    Returns:
+        str: The SQL with its literals replaced by "?".
+    """
+    return LITERAL_RE.sub("?", sql)
+
+
+def get_template_line():
+    """
+    Find the template line being rendered by walking up the stack.
+
+    Returns:
+        str | None: "template name:line" of the innermost template node, None outside templates.
+    """
+    frame = sys._getframe(1)
+    while frame:
+        node = frame.f_locals.get("self")
+        # type() instead of isinstance() so lazy objects are not evaluated
+        if issubclass(type(node), Node) and getattr(node, "token", None) and node.origin:
+            return f"{node.origin.template_name}:{node.token.lineno}"
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """
+    A database execute wrapper that records each query, its time and the template line that ran it
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "sql": sql,
+                    "time": time.perf_counter() - start,
+                    "template": get_template_line(),
+                }
+            )
+
+    @property
+    def total_time(self):
+        return sum(query["time"] for query in self.queries)
+
+    def duplicates(self):
+        """
+        Group the queries that ran more than once with different parameters.
+
+        Returns:
+            list: (normalized SQL, count, template lines) tuples, the most repeated first.
+        """
+        counts = Counter(normalize_sql(query["sql"]) for query in self.queries)
+        duplicates = []
+        for sql, count in counts.most_common():
+            if count < 2:
+                break
+            lines = sorted(
+                {
+                    query["template"]
+                    for query in self.queries
+                    if query["template"] and normalize_sql(query["sql"]) == sql
+                }
+            )
+            duplicates.append((sql, count, lines))
+        return duplicates
+
+
+@contextmanager
+def record_queries():
+    """
+    Record the queries of the current connection, and of the connections opened meanwhile
+    by the threads async views run their sections in.
+    """
+    recorder = QueryRecorder()
+    wrappers = []
+
+    def install(sender, connection, **kwargs):
+        if recorder not in connection.execute_wrappers:
+            connection.execute_wrappers.append(recorder)
+            wrappers.append(connection)
+
+    connection_created.connect(install, weak=False)
+    try:
+        with connection.execute_wrapper(recorder):
+            yield recorder
+    finally:
+        connection_created.disconnect(install)
+        for wrapper in wrappers:
+            wrapper.execute_wrappers.remove(recorder)
+
+
+def get_budget_problems(name, small, large):
+    """
+    Compare the queries a view ran against the small and the large portfolio with its budget.
+
+    Args:
+        name (str): The URL name, "name:argument" for the URL_VARIANTS.
+        small (QueryRecorder): The queries run against the small portfolio.
+        large (QueryRecorder): The queries run against the large portfolio.
+
+    Returns:
+        list: The problems found, empty when the view is within its budget.
+    """
+    budget = QUERY_BUDGETS[name.split(":")[0]]
+    problems = []
+    if len(large.queries) > len(small.queries):
+        problems.append("query count grows with data size")
+    if len(large.queries) > budget:
+        problems.append(f"exceeds its budget of {budget}")
+    return problems
+
+
+class Command(BaseCommand):
+    """
+    Check that no view in core/urls.py exceeds its query budget or runs more queries as data grows
+    """
+
+    help = (
+        "Request every URL in core/urls.py against a small and a large synthetic "
+        "portfolio, and fail when a view exceeds its query budget or its query count "
+        "grows with the size of the data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--small",
+            type=int,
+            default=3,
+            help="Properties of the landlord in the small portfolio (default: 3).",
+        )
+        parser.add_argument(
+            "--large",
+            type=int,
+            default=30,
+            help="Properties of the landlord in the large portfolio (default: 30).",
+        )
+
+    def handle(self, *args, **options):
+        names = [pattern.name for pattern in urlpatterns]
+        missing = [name for name in names if name not in QUERY_BUDGETS]
+        if missing:
+            raise CommandError(f"No query budget declared for: {', '.join(missing)}")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            fixture = Path(settings.BASE_DIR) / "core" / "data" / "currency_rates.json"
+            with override_settings(CURRENCY_RATES_FIXTURE=str(fixture)):
+                small = self.run_all(names, options["small"], "small")
+                large = self.run_all(names, options["large"], "large")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        failures = []
+        for name in small:
+            budget = QUERY_BUDGETS[name.split(":")[0]]
+            small_count = len(small[name].queries)
+            large_count = len(large[name].queries)
+
+            line = (
+                f"{name:<36} {small_count:>4} / {large_count:>4} queries "
+                f"(budget {budget:>3}), {large[name].total_time * 1000:>8.2f} ms SQL, "
+                f"{sum(count for _, count, _ in large[name].duplicates()):>4} duplicates"
+            )
+
+            problems = get_budget_problems(name, small[name], large[name])
+            if problems:
+                failures.append((name, problems, large[name]))
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        for name, problems, recorder in failures:
+            self.stdout.write(self.style.ERROR(f"\n{name}: {', '.join(problems)}"))
+            for sql, count, lines in recorder.duplicates()[:5]:
+                self.stdout.write(f"  {count}x {sql[:300]}")
+                for template_line in lines:
+                    self.stdout.write(f"      from {template_line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} view(s) over their query budget")
+
+        self.stdout.write(self.style.SUCCESS("All views are within their query budget"))
+
+    def run_all(self, names, properties, prefix):
+        """
+        Request every URL as the landlord of a new portfolio.
+
+        Args:
+            names (list): The URL names to request.
+            properties (int): The number of properties of the landlord.
+            prefix (str): The username prefix of the portfolio.
+
+        Returns:
+            dict: The QueryRecorder of each URL name, "name:argument" for the URL_VARIANTS.
+        """
+        user = generate_portfolio(
+            1, properties, history=properties, occupancy=0.5, prefix=prefix
+        )[0]
+
+        # every portfolio needs at least one vacant and one rented property
+        rental = RentProperty.objects.filter(property__user=user).order_by("id").first()
+        vacant = Property.objects.filter(user=user, is_rented=False).order_by("-id").first()
+        if rental is None or vacant is None:
+            raise CommandError("Use a larger --small portfolio")
+        RentProperty.objects.filter(id=rental.id).update(contract="contracts/scan.pdf")
+        upload = ChunkedUpload.objects.create(user=user, filename="scan.pdf", size=1)
+
+        args = {
+            "rent_property": [vacant.id],
+            "edit_rental": [rental.id],
+            "delete_property": [vacant.id],
+            "edit_property": [vacant.id],
+            "view_property": [rental.property_id],
+            "rent_history": [rental.property_id],
+            "mark_as_paid": [rental.id],
+            "empty_property": [rental.id],
+            "upload_chunk": [upload.id],
+            "attach_contract_upload": [upload.id, rental.id],
+            "protected_media": ["contracts/scan.pdf"],
+        }
+
+        client = Client()
+        client.force_login(user)
+        anonymous_client = Client()
+
+        recorders = {}
+        ordered = [name for name in names if name not in MUTATING_VIEWS] + [
+            name for name in MUTATING_VIEWS if name in names
+        ]
+        for name in ordered:
+            for variant in URL_VARIANTS.get(name, [args.get(name, [])]):
+                label = f"{name}:{variant[0]}" if name in URL_VARIANTS else name
+                url = reverse(name, args=variant)
+                if name in QUERY_STRINGS:
+                    url = f"{url}?{QUERY_STRINGS[name]}"
+                requester = anonymous_client if name in PUBLIC_VIEWS else client
+                # warm up caches that are only filled once per process
+                if name not in MUTATING_VIEWS:
+                    requester.get(url)
+                # but measure the views without the data they cache
+                cache.clear()
+
+                with record_queries() as recorder:
+                    response = requester.get(url)
+
+                if response.status_code >= 500:
+                    raise CommandError(f"{label} returned {response.status_code}")
+                recorders[label] = recorder
+
+        return recorders
@@ -0,0 +1,160 @@
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+IMPORT_TIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# What a worker imports before it serves a request
+STARTUP_CODE = "import Ejaraat.asgi"
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    """
+    Profile the imports of a worker and time its cold start
+    """
+
+    help = (
+        "Report the slowest imports of the ASGI application, then start daphne several "
+        "times and time how long it takes from the process start to the first response."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Number of imports listed, slowest first (default: 20).",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="Number of cold starts timed, 0 to only profile the imports (default: 3).",
+        )
+        parser.add_argument(
+            "--path",
+            default="/",
+            help="The path requested from the started worker (default: /).",
+        )
+        parser.add_argument(
+            "--host",
+            default=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost",
+            help="The Host header of the request (default: the first of ALLOWED_HOSTS).",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to wait for the first response (default: 60).",
+        )
+        parser.add_argument(
+            "--no-warmup",
+            action="store_true",
+            help="Start the workers with WARMUP_ON_BOOT off, to compare.",
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        if options["no_warmup"]:
+            env["WARMUP_ON_BOOT"] = "False"
+
+        self.profile_imports(env, options["top"])
+
+        if options["runs"]:
+            self.time_cold_starts(env, options)
+
+    def profile_imports(self, env, top):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        duration = time.perf_counter() - start
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        imports = []
+        for line in result.stderr.splitlines():
+            match = IMPORT_TIME_RE.match(line)
+            if match:
+                own, cumulative, indent, name = match.groups()
+                imports.append((int(cumulative), int(own), len(indent) // 2, name))
+
+        self.stdout.write(f"Imported {len(imports)} modules in {duration * 1000:.0f}ms")
+        self.stdout.write(f"{'cumulative':>12} {'self':>10}  module")
+        for cumulative, own, level, name in sorted(imports, reverse=True)[:top]:
+            self.stdout.write(
+                f"{cumulative / 1000:10.1f}ms {own / 1000:8.1f}ms  {'  ' * level}{name}"
+            )
+
+    def time_cold_starts(self, env, options):
+        timings = {"listening": [], "first": [], "next": []}
+
+        for _ in range(options["runs"]):
+            port = get_free_port()
+            url = f"http://127.0.0.1:{port}{options['path']}"
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "-m", "daphne", "-p", str(port), "Ejaraat.asgi:application"],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                # daphne imports the application, and warms it up, before it listens
+                self.wait_for_port(port, start, options["timeout"])
+                timings["listening"].append(time.perf_counter() - start)
+
+                for key in ("first", "next"):
+                    request_start = time.perf_counter()
+                    self.request(url, options["host"])
+                    timings[key].append(time.perf_counter() - request_start)
+            finally:
+                process.terminate()
+                process.wait()
+
+        listening, first, next = (
+            statistics.median(values) * 1000 for values in timings.values()
+        )
+        self.stdout.write(
+            f"Median of {options['runs']} cold starts: listening after {listening:.0f}ms, "
+            f"first response after {listening + first:.0f}ms ({first:.1f}ms request), "
+            f"next request {next:.1f}ms"
+        )
+
+    def wait_for_port(self, port, start, timeout):
+        while time.perf_counter() - start < timeout:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.01)
+        raise CommandError(f"daphne did not listen on port {port} after {timeout:.0f}s")
+
+    def request(self, url, host):
+        request = urllib.request.Request(url, headers={"Host": host})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+        except urllib.error.HTTPError as error:
+            # an error page is still a served request, a server error is not
+            if error.code >= 500:
+                raise CommandError(f"{url} returned {error.code}")
@@ -0,0 +1,162 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    ArchivedActivity,
+    ArchivedNotification,
+    ChunkedUpload,
+    Notifications,
+    RecentActivity,
+    Tombstone,
+)
+from core.uploads import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    """
+    Archive or delete RecentActivity and read Notifications rows older than their retention period,
+    and delete the sync tombstones older than theirs and the abandoned chunked uploads
+    """
+
+    help = (
+        "Move recent activities and read notifications older than their TTL to the "
+        "archive tables (or delete them), and delete the expired sync tombstones, in "
+        "small transactions, then delete the chunked uploads that were never attached."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of rows moved per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to wait between chunks to let other writers in (default: 0.1).",
+        )
+        parser.add_argument(
+            "--no-archive",
+            action="store_true",
+            help="Delete the rows instead of copying them to the archive tables.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many rows would be pruned.",
+        )
+
+    def handle(self, *args, **options):
+        archive = settings.RETENTION_ARCHIVE and not options["no_archive"]
+        now = timezone.now()
+
+        targets = [
+            (
+                RecentActivity.objects.filter(
+                    timestamp__lt=now - timedelta(days=settings.RECENT_ACTIVITY_TTL_DAYS)
+                ),
+                ArchivedActivity,
+                ["user_id", "property_id", "activity_type", "timestamp"],
+            ),
+            (
+                # unread notifications are kept until the user clears them, and so are the
+                # overdue ones of a rental that is still overdue: they are what stops
+                # create_notification_once from notifying again for the same period
+                Notifications.objects.filter(
+                    is_read=True,
+                    timestamp__lt=now - timedelta(days=settings.NOTIFICATIONS_TTL_DAYS),
+                ).exclude(
+                    kind="overdue",
+                    period__isnull=False,
+                    property__property_rentals__status="overdue",
+                ),
+                ArchivedNotification,
+                ["user_id", "property_id", "message", "timestamp"],
+            ),
+            (
+                Tombstone.objects.filter(
+                    timestamp__lt=now - timedelta(days=settings.SYNC_TOMBSTONE_TTL_DAYS)
+                ),
+                # tombstones are not archived
+                None,
+                [],
+            ),
+        ]
+
+        for queryset, archive_model, fields in targets:
+            label = queryset.model._meta.verbose_name_plural
+
+            if options["dry_run"]:
+                self.stdout.write(f"{label}: {queryset.count()} rows would be pruned")
+                continue
+
+            total = 0
+            while True:
+                pruned = self.prune_chunk(
+                    queryset,
+                    archive_model if archive else None,
+                    fields,
+                    options["chunk_size"],
+                )
+                total += pruned
+                if pruned < options["chunk_size"]:
+                    break
+                time.sleep(options["sleep"])
+
+            action = "archived" if archive and archive_model else "deleted"
+            self.stdout.write(self.style.SUCCESS(f"{label}: {total} rows {action}"))
+
+        # uploads that were never attached to a rental, with their partial files
+        uploads_before = now - timedelta(hours=settings.CHUNKED_UPLOAD_TTL_HOURS)
+        if options["dry_run"]:
+            count = ChunkedUpload.objects.filter(created_at__lt=uploads_before).count()
+            self.stdout.write(f"chunked uploads: {count} rows would be pruned")
+        else:
+            deleted = delete_expired_uploads(uploads_before)
+            self.stdout.write(self.style.SUCCESS(f"chunked uploads: {deleted} rows deleted"))
+
+    def prune_chunk(self, queryset, archive_model, fields, chunk_size):
+        """
+        Archive and delete one chunk of the oldest expired rows in its own transaction.
+
+        Rows locked by other transactions are skipped and picked up by a later run,
+        so pruning never waits on the writers of the hot table.
+
+        Args:
+            queryset (QuerySet): The expired rows.
+            archive_model (Model | None): The archive model, None to only delete.
+            fields (list): The fields copied to the archive model.
+            chunk_size (int): The maximum number of rows in the chunk.
+
+        Returns:
+            int: The number of rows pruned.
+        """
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(skip_locked=True)
+                .order_by("timestamp")
+                .values("id", *fields)[:chunk_size]
+            )
+            if not rows:
+                return 0
+
+            if archive_model:
+                archive_model.objects.bulk_create(
+                    [
+                        archive_model(**{field: row[field] for field in fields})
+                        for row in rows
+                    ]
+                )
+            # a plain DELETE without the delete signals: pruning is not a change of the
+            # data, so it records no sync tombstones, and no rows cascade from these tables
+            expired = queryset.model.objects.filter(id__in=[row["id"] for row in rows])
+            expired._raw_delete(expired.db)
+
+        return len(rows)
@@ -0,0 +1,531 @@
+import asyncio
+import base64
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.models import Property, RecentActivity
+
+from ._portfolio import generate_portfolio
+from .profile_startup import get_free_port
+
+
+WS_PATH = "/ws/recent-activities/"
+
+PREFIX = "wsload"
+
+RESUME = json.dumps({"type": "resume", "v": 2, "last_seq": None})
+
+
+def get_rss(pid):
+    """
+    Get the resident memory of a process, from /proc.
+
+    Args:
+        pid (int): The id of the process.
+
+    Returns:
+        int | None: The resident memory in KB, None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def raise_open_files_limit(needed):
+    # each connection is a file descriptor on both ends
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        limit = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+
+
+class Results:
+    """
+    What the clients of a load test received.
+    """
+
+    def __init__(self):
+        self.connect_times = []
+        self.connect_duration = None
+        self.memory_before = self.memory_after = None
+        # when each activity of the bursts was saved, by id
+        self.sent_at = {}
+        self.saves = 0
+        self.saved_for = []
+        # the activity.created events the clients should receive
+        self.expected = 0
+        # the (activity id, time) of each activity.created event received; the event
+        # may arrive before its save returned, the latencies are computed afterwards
+        self.received_at = []
+        self.burst_started = self.last_received = None
+        self.burst_messages = 0
+        self.delivered = asyncio.Event()
+
+    def received(self, client, text):
+        now = time.perf_counter()
+        message = json.loads(text)
+
+        if message["type"] == "hello" and not client.ready.done():
+            self.connect_times.append(now - client.started_at)
+            client.ready.set_result(True)
+        elif self.burst_started is not None:
+            self.burst_messages += 1
+            self.last_received = now
+            if message["type"] == "activity.created":
+                self.received_at.append((message["data"]["id"], now))
+                if len(self.received_at) >= self.expected:
+                    self.delivered.set()
+
+    @property
+    def latencies(self):
+        return [received - self.sent_at[id] for id, received in self.received_at]
+
+
+class CommunicatorClient:
+    """
+    A dashboard connected to the ASGI application of this process.
+    """
+
+    def __init__(self, application, headers, results):
+        self.communicator = WebsocketCommunicator(application, WS_PATH, headers)
+        self.results = results
+        self.ready = asyncio.get_running_loop().create_future()
+
+    async def connect(self, timeout):
+        self.started_at = time.perf_counter()
+        connected, _ = await self.communicator.connect(timeout)
+        if not connected:
+            raise CommandError("The consumer refused the connection")
+        await self.communicator.send_to(text_data=RESUME)
+        self.reader = asyncio.create_task(self.read())
+        await asyncio.wait_for(self.ready, timeout)
+
+    async def heartbeat(self):
+        await self.communicator.send_to(text_data=RESUME)
+
+    async def read(self):
+        while True:
+            message = await self.communicator.receive_output(timeout=None)
+            if message["type"] == "websocket.send":
+                self.results.received(self, message["text"])
+
+    async def close(self):
+        self.reader.cancel()
+        await self.communicator.disconnect()
+
+
+class SocketClient:
+    """
+    A dashboard connected to a daphne server over a real socket, with a minimal
+    WebSocket client (RFC 6455): text frames, pings and close.
+    """
+
+    def __init__(self, port, headers, results):
+        self.port = port
+        self.headers = headers
+        self.results = results
+        self.ready = asyncio.get_running_loop().create_future()
+        self.writer = None
+
+    async def connect(self, timeout):
+        self.started_at = time.perf_counter()
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection("127.0.0.1", self.port), timeout
+        )
+        key = base64.b64encode(os.urandom(16)).decode()
+        headers = "".join(f"{name}: {value}\r\n" for name, value in self.headers.items())
+        self.writer.write(
+            (
+                f"GET {WS_PATH} HTTP/1.1\r\n"
+                f"Host: 127.0.0.1:{self.port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n"
+                f"{headers}\r\n"
+            ).encode()
+        )
+        response = await asyncio.wait_for(self.reader.readuntil(b"\r\n\r\n"), timeout)
+        if not response.startswith(b"HTTP/1.1 101"):
+            raise CommandError(f"daphne refused the connection: {response.splitlines()[0]}")
+
+        self.send(RESUME.encode())
+        self.task = asyncio.create_task(self.read())
+        await asyncio.wait_for(self.ready, timeout)
+
+    async def heartbeat(self):
+        self.send(RESUME.encode())
+
+    def send(self, payload, opcode=0x1):
+        # the frames of a client are masked
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x80 | opcode, 0x80 | length])
+        elif length < 1 << 16:
+            header = bytes([0x80 | opcode, 0x80 | 126]) + length.to_bytes(2, "big")
+        else:
+            header = bytes([0x80 | opcode, 0x80 | 127]) + length.to_bytes(8, "big")
+        self.writer.write(
+            header + mask + bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        )
+
+    async def read(self):
+        message = b""
+        while True:
+            first, second = await self.reader.readexactly(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length = int.from_bytes(await self.reader.readexactly(2), "big")
+            elif length == 127:
+                length = int.from_bytes(await self.reader.readexactly(8), "big")
+            payload = await self.reader.readexactly(length)
+
+            if opcode == 0x9:
+                # daphne pings the clients every --ping-interval
+                self.send(payload, 0xA)
+            elif opcode == 0x8:
+                return
+            elif opcode in (0x0, 0x1):
+                message += payload
+                if first & 0x80:
+                    self.results.received(self, message.decode())
+                    message = b""
+
+    async def close(self):
+        self.task.cancel()
+        self.send((1000).to_bytes(2, "big"), 0x8)
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    """
+    Load test the WebSocket fan-out of the recent activities
+    """
+
+    help = (
+        "Connect many authenticated dashboards to ws/recent-activities/, in this process "
+        "through the channels communicator or over real sockets to a local daphne, save "
+        "bursts of RecentActivity rows and report the connection time, the delivery "
+        "latency, the message rate and the memory per connection of the process running "
+        "the consumers. The landlords are created in a throw-away test database, "
+        "which a daphne started with --mode daphne reads through DATABASE_NAME."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mode",
+            choices=["inprocess", "daphne"],
+            default="inprocess",
+            help="Where the consumers run (default: inprocess).",
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=1000,
+            help="Number of connected dashboards (default: 1000).",
+        )
+        parser.add_argument(
+            "--landlords",
+            type=int,
+            default=10,
+            help="Number of landlords the dashboards are spread over (default: 10).",
+        )
+        parser.add_argument(
+            "--bursts",
+            type=int,
+            default=5,
+            help="Number of bursts of activities, 0 to only connect (default: 5).",
+        )
+        parser.add_argument(
+            "--burst-size",
+            type=int,
+            default=20,
+            help="Activities saved per burst, spread over the landlords (default: 20).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1,
+            help="Seconds between the bursts (default: 1).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=100,
+            help="Connections opened at the same time (default: 100).",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30,
+            help="Seconds to wait for a connection, and for the deliveries (default: 30).",
+        )
+        parser.add_argument(
+            "--host",
+            default=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost",
+            help="The host of the Origin header (default: the first of ALLOWED_HOSTS).",
+        )
+
+    def handle(self, *args, **options):
+        if options["landlords"] < 1 or options["clients"] < options["landlords"]:
+            raise CommandError("--clients must be at least --landlords, at least 1")
+
+        # the activities are saved in this process, the consumers run in daphne
+        if options["mode"] == "daphne" and options["bursts"]:
+            if isinstance(get_channel_layer(), InMemoryChannelLayer):
+                raise CommandError(
+                    "The in-memory channel layer does not reach daphne, configure a "
+                    "shared channel layer or use --bursts 0"
+                )
+            if isinstance(cache, (LocMemCache, DummyCache)):
+                raise CommandError(
+                    "The sequence numbers and presence of the clients need a cache "
+                    "shared with daphne, configure one or use --bursts 0"
+                )
+
+        raise_open_files_limit(options["clients"] + 256)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # daphne runs in its own process, it can only open a test database on disk
+            if options["mode"] == "daphne" and (
+                connection.vendor == "sqlite" and connection.is_in_memory_db()
+            ):
+                raise CommandError(
+                    "An in-memory test database is not reachable from daphne, give the "
+                    "test database a NAME or use --mode inprocess"
+                )
+
+            users = generate_portfolio(
+                options["landlords"], 1, history=0, activities=0, prefix=PREFIX
+            )
+            cookies = {}
+            for user in users:
+                client = Client()
+                client.force_login(user)
+                cookies[user.id] = client.cookies[settings.SESSION_COOKIE_NAME].value
+            properties = {
+                property.user_id: property
+                for property in Property.objects.filter(user__in=users)
+            }
+
+            results = asyncio.run(self.run(users, cookies, properties, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results, options)
+
+    async def run(self, users, cookies, properties, options):
+        results = Results()
+        # client i is a dashboard of landlord i % landlords
+        assigned = [users[i % len(users)] for i in range(options["clients"])]
+        origin = f"http://{options['host']}"
+        cookies = {
+            id: f"{settings.SESSION_COOKIE_NAME}={session_key}"
+            for id, session_key in cookies.items()
+        }
+
+        process = heartbeat = None
+        clients = []
+        try:
+            if options["mode"] == "inprocess":
+                from Ejaraat.asgi import application
+
+                gc.collect()
+                pid = os.getpid()
+                clients = [
+                    CommunicatorClient(
+                        application,
+                        [
+                            (b"cookie", cookies[user.id].encode()),
+                            (b"origin", origin.encode()),
+                        ],
+                        results,
+                    )
+                    for user in assigned
+                ]
+            else:
+                port = get_free_port()
+                process = subprocess.Popen(
+                    [sys.executable, "-m", "daphne", "-p", str(port), "Ejaraat.asgi:application"],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    # the test database this process created
+                    env={
+                        **os.environ,
+                        "DATABASE_NAME": str(settings.DATABASES["default"]["NAME"]),
+                    },
+                )
+                pid = process.pid
+                await self.wait_for_port(port, options["timeout"])
+                clients = [
+                    SocketClient(
+                        port,
+                        {
+                            "Cookie": cookies[user.id],
+                            "Origin": origin,
+                        },
+                        results,
+                    )
+                    for user in assigned
+                ]
+
+            results.memory_before = get_rss(pid)
+            started = time.perf_counter()
+            semaphore = asyncio.Semaphore(options["concurrency"])
+
+            async def connect(client):
+                async with semaphore:
+                    await client.connect(options["timeout"])
+
+            await asyncio.gather(*(connect(client) for client in clients))
+            results.connect_duration = time.perf_counter() - started
+            gc.collect()
+            results.memory_after = get_rss(pid)
+            heartbeat = asyncio.create_task(self.send_heartbeats(clients))
+
+            clients_per_user = {}
+            for user in assigned:
+                clients_per_user[user.id] = clients_per_user.get(user.id, 0) + 1
+
+            # the expected count grows with the saves, it must not be reached before
+            results.expected = float("inf") if options["bursts"] else 0
+            results.burst_started = time.perf_counter()
+            for burst in range(options["bursts"]):
+                if burst:
+                    await asyncio.sleep(options["interval"])
+                await sync_to_async(self.save_burst)(
+                    users, properties, clients_per_user, results, options["burst_size"]
+                )
+
+            if options["bursts"]:
+                results.expected = sum(
+                    clients_per_user[user.id] for user in results.saved_for
+                )
+                if len(results.received_at) >= results.expected:
+                    results.delivered.set()
+                try:
+                    await asyncio.wait_for(results.delivered.wait(), options["timeout"])
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            for client in clients:
+                if client.ready.done():
+                    await client.close()
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(options["timeout"])
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+
+        return results
+
+    async def send_heartbeats(self, clients):
+        # like the dashboards, so the clients stay counted as connected, see core.events
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_SECONDS)
+            for client in clients:
+                await client.heartbeat()
+
+    def save_burst(self, users, properties, clients_per_user, results, size):
+        for i in range(size):
+            user = users[(results.saves + i) % len(users)]
+            sent_at = time.perf_counter()
+            activity = RecentActivity.objects.create(
+                user=user, property=properties[user.id], activity_type="payment"
+            )
+            results.sent_at[activity.id] = sent_at
+            results.saved_for.append(user)
+        results.saves += size
+
+    async def wait_for_port(self, port, timeout):
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                return
+            except OSError:
+                await asyncio.sleep(0.05)
+        raise CommandError(f"daphne did not listen on port {port} after {timeout:.0f}s")
+
+    def report(self, results, options):
+        clients = options["clients"]
+        connect = [value * 1000 for value in results.connect_times]
+        self.stdout.write(
+            f"Connected {clients} dashboards of {options['landlords']} landlords "
+            f"({options['mode']}) in {results.connect_duration:.2f}s, "
+            f"{clients / results.connect_duration:.0f}/s: "
+            f"p50 {percentile(connect, 50):.1f}ms, p99 {percentile(connect, 99):.1f}ms"
+        )
+
+        if results.memory_before is not None:
+            per_connection = (results.memory_after - results.memory_before) / clients
+            self.stdout.write(
+                f"Memory {results.memory_before / 1024:.1f}MB -> "
+                f"{results.memory_after / 1024:.1f}MB, {per_connection:.1f}KB per connection"
+            )
+        else:
+            self.stdout.write("Memory: not available on this platform")
+
+        if not options["bursts"]:
+            return
+
+        delivered, expected = len(results.received_at), results.expected
+        if not delivered:
+            raise CommandError(f"None of the {expected} events were delivered")
+        duration = results.last_received - results.burst_started
+        latencies = [value * 1000 for value in results.latencies]
+        self.stdout.write(
+            f"Saved {results.saves} activities in {options['bursts']} bursts, delivered "
+            f"{delivered} of {expected} to the dashboards in {duration:.2f}s"
+        )
+        self.stdout.write(
+            f"Delivery latency: p50 {percentile(latencies, 50):.1f}ms, "
+            f"p90 {percentile(latencies, 90):.1f}ms, p99 {percentile(latencies, 99):.1f}ms, "
+            f"max {max(latencies):.1f}ms"
+        )
+        self.stdout.write(
+            f"Messages received: {results.burst_messages} during the bursts, "
+            f"{results.burst_messages / duration:.0f}/s"
+        )
+
+        if delivered < expected:
+            raise CommandError(f"{expected - delivered} events were not delivered")
+        self.stdout.write(self.style.SUCCESS("Every event was delivered"))
@@ -0,0 +1,229 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date, parse_etags
+
+from .models import RentHistory, RentProperty, Tenant
+
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_file_etag(stat):
+    """
+    Build a strong ETag for a file from its size and modification time.
+
+    Args:
+        stat (os.stat_result): The result of os.stat() on the file.
+
+    Returns:
+        str: The quoted ETag value.
+    """
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def user_can_access_media(user, name):
+    """
+    Check that a media file belongs to one of the user's tenants or properties.
+
+    Args:
+        user (User): The requesting user.
+        name (str): The file name relative to MEDIA_ROOT.
+
+    Returns:
+        bool: True if the user is the landlord the file belongs to.
+    """
+    folder = name.split("/", 1)[0]
+    # rentals emptied before the contract name was archived left its media URL instead
+    history_contracts = [name, settings.MEDIA_URL + filepath_to_uri(name)]
+
+    if folder == "tenants_ID":
+        return Tenant.objects.filter(landlord=user, id_image=name).exists()
+    elif folder == "contracts":
+        # an emptied rental keeps its contract in the rent history under the same name
+        return (
+            RentProperty.objects.filter(property__user=user, contract=name).exists()
+            or RentHistory.objects.filter(
+                property__user=user, contract__in=history_contracts
+            ).exists()
+        )
+    elif folder == "rent_history_contracts":
+        return RentHistory.objects.filter(
+            property__user=user, contract__in=history_contracts
+        ).exists()
+
+    return False
+
+
+def parse_range(header, size):
+    """
+    Parse a single byte range from a Range header.
+
+    Multi-range requests are not supported and are answered with the full file.
+
+    Args:
+        header (str): The value of the Range header.
+        size (int): The size of the file in bytes.
+
+    Returns:
+        tuple | None: A (start, end) tuple with an inclusive end, None when the
+        header should be ignored.
+
+    Raises:
+        ValueError: If the range can not be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # suffix range, the last N bytes of the file
+        length = int(end)
+        if length == 0:
+            raise ValueError("range not satisfiable")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+
+    return start, end
+
+
+def iter_file_range(path, start, length, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield a slice of a file in chunks so it is never held in memory at once.
+
+    Args:
+        path (str): The absolute path of the file.
+        start (int): The offset of the first byte to send.
+        length (int): The number of bytes to send.
+        chunk_size (int, optional): The size of each chunk. Defaults to 64KB.
+
+    Yields:
+        bytes: The next chunk of the file.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def sendfile_response(name, content_type):
+    """
+    Hand the transfer of a media file over to the front server.
+
+    Nginx expects an internal location in X-Accel-Redirect, Apache and Lighttpd
+    expect the absolute file path in X-Sendfile. Both are percent-encoded, so
+    names with spaces or non-ASCII characters survive as header values.
+
+    Args:
+        name (str): The file name relative to MEDIA_ROOT.
+        content_type (str): The content type of the file.
+
+    Returns:
+        HttpResponse: An empty response carrying the redirect header.
+    """
+    response = HttpResponse(content_type=content_type)
+
+    if settings.MEDIA_SENDFILE_BACKEND == "nginx":
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    else:
+        response["X-Sendfile"] = quote(os.path.join(settings.MEDIA_ROOT, name))
+
+    return response
+
+
+def serve_media(request, name):
+    """
+    Serve a file from MEDIA_ROOT after the caller has checked permissions.
+
+    When MEDIA_SENDFILE_BACKEND is set the transfer is delegated to the front
+    server, otherwise the file is streamed from Python with support for
+    conditional requests (If-None-Match) and single byte ranges.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        name (str): The file name relative to MEDIA_ROOT.
+
+    Returns:
+        HttpResponse: The file response, a 206 partial response, a 304 or a 416.
+    """
+    path = safe_join(settings.MEDIA_ROOT, name)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if settings.MEDIA_SENDFILE_BACKEND:
+        response = sendfile_response(name, content_type)
+    else:
+        stat = os.stat(path)
+        etag = get_file_etag(stat)
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (
+            if_none_match.strip() == "*" or etag in parse_etags(if_none_match)
+        ):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        size = stat.st_size
+        byte_range = None
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+
+        # a stale If-Range means the client must get the whole file again
+        if range_header and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                iter_file_range(path, start, length),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            length = size
+            response = StreamingHttpResponse(
+                iter_file_range(path, 0, size), content_type=content_type
+            )
+
+        response["Content-Length"] = str(length)
+        response["Accept-Ranges"] = "bytes"
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat.st_mtime)
+
+    response["Content-Disposition"] = "inline"
+    response["Cache-Control"] = "private, max-age=0, must-revalidate"
+    response["X-Content-Type-Options"] = "nosniff"
+
+    return response
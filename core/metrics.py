@@ -0,0 +1,328 @@
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """
+    A metric of the registry, its values are kept in memory per label values
+    """
+
+    type = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.metrics[name] = self
+
+    def get_key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self, values):
+        """
+        Format the values of the metric in the Prometheus text format.
+
+        Args:
+            values (dict): The values of the metric keyed by label values.
+
+        Returns:
+            list: The sample lines.
+        """
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.changed()
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.changed()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            # [count per bucket, count over the last bucket, sum]
+            counts = self.values.setdefault(key, [[0] * len(self.buckets), 0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][i] += 1
+                    break
+            else:
+                counts[1] += 1
+            counts[2] += value
+        self.registry.changed()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self, values):
+        lines = []
+        for key, (bucket_counts, over, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, bucket_counts):
+                cumulative += count
+                labels = format_labels(self.labelnames + ("le",), key + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += over
+            labels = format_labels(self.labelnames + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics of the process.
+
+    When METRICS_DIR is set every process writes a snapshot of its metrics to that
+    directory at most every METRICS_SNAPSHOT_INTERVAL seconds, and the metrics endpoint
+    of any worker reports the sum of all the snapshots. Nothing is written to the database.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.next_snapshot = 0
+
+    def counter(self, name, help, labelnames=()):
+        return Counter(self, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return Gauge(self, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return Histogram(self, name, help, labelnames, buckets)
+
+    def changed(self):
+        if settings.METRICS_DIR and time.monotonic() >= self.next_snapshot:
+            self.snapshot()
+
+    def snapshot(self):
+        """
+        Write the metrics of this process to METRICS_DIR.
+        """
+        self.next_snapshot = time.monotonic() + settings.METRICS_SNAPSHOT_INTERVAL
+        data = {}
+        for name, metric in self.metrics.items():
+            with metric.lock:
+                data[name] = [
+                    [list(key), copy.deepcopy(value)] for key, value in metric.values.items()
+                ]
+
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, f"{os.getpid()}.json")
+        # write then rename so readers never see a partial file
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self):
+        """
+        Collect the values of each metric, summed over the snapshots of all the processes
+        when METRICS_DIR is set.
+
+        Returns:
+            dict: The values of each metric keyed by label values.
+        """
+        if not settings.METRICS_DIR:
+            collected = {}
+            for name, metric in self.metrics.items():
+                with metric.lock:
+                    collected[name] = copy.deepcopy(metric.values)
+            return collected
+
+        self.snapshot()
+        collected = {name: {} for name in self.metrics}
+        for filename in os.listdir(settings.METRICS_DIR):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            # the gauges of stopped processes are stale, their counters still count
+            alive = is_process_alive(int(filename[: -len(".json")]))
+
+            for name, values in data.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == "gauge" and not alive):
+                    continue
+                for key, value in values:
+                    key = tuple(key)
+                    collected[name][key] = merge_values(collected[name].get(key), value)
+        return collected
+
+    def render(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.samples(values))
+        return "\n".join(lines) + "\n"
+
+
+def merge_values(current, value):
+    if current is None:
+        return value
+    if isinstance(value, list):
+        return [
+            [a + b for a, b in zip(current[0], value[0])],
+            current[1] + value[1],
+            current[2] + value[2],
+        ]
+    return current + value
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    labels = ",".join(
+        f'{name}="{escape_label(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + labels + "}"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "ejaraat_request_duration_seconds",
+    "Time to handle a request, per view.",
+    ["view", "method"],
+)
+REQUESTS = registry.counter(
+    "ejaraat_requests_total",
+    "Handled requests, per view and status code.",
+    ["view", "status"],
+)
+GROUP_SENDS = registry.counter(
+    "ejaraat_group_send_total",
+    "Messages sent to channel layer groups, per message type.",
+    ["type"],
+)
+GROUP_SEND_LATENCY = registry.histogram(
+    "ejaraat_group_send_duration_seconds",
+    "Time to send a message to a channel layer group, per message type.",
+    ["type"],
+)
+WEBSOCKETS = registry.gauge(
+    "ejaraat_websockets_connected",
+    "Connected WebSocket clients.",
+)
+MAIL_OUTBOX = registry.gauge(
+    "ejaraat_mail_outbox",
+    "Emails being sent.",
+)
+MAILS = registry.counter(
+    "ejaraat_mail_total",
+    "Sent emails, per result.",
+    ["result"],
+)
+CURRENCY_RATES_CACHE = registry.counter(
+    "ejaraat_currency_rates_cache_total",
+    "Lookups of the cached exchange rates, per result (hit or miss).",
+    ["result"],
+)
+COMPRESSION_CACHE = registry.counter(
+    "ejaraat_compression_cache_total",
+    "Lookups of the cached compressed responses, per encoding and result (hit or miss).",
+    ["encoding", "result"],
+)
+STATUS_TRANSITIONS = registry.counter(
+    "ejaraat_rental_status_transitions_total",
+    "Changes of the payment status of rentals.",
+    ["from_status", "to_status"],
+)
+
+
+@contextmanager
+def track_mail():
+    """
+    Count an email in the outbox while it is sent, and count its result.
+    """
+    with MAIL_OUTBOX.track_in_progress():
+        try:
+            yield
+        except Exception:
+            MAILS.inc(result="error")
+            raise
+        MAILS.inc(result="sent")
@@ -0,0 +1,465 @@
+import gzip
+import hashlib
+import logging
+import random
+import secrets
+import struct
+import time
+import zlib
+from time import perf_counter
+
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .metrics import COMPRESSION_CACHE, REQUEST_LATENCY, REQUESTS
+from .profiling import Profile, current_profile
+from .routers import RoutingState, routing_state
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Profile a sample of the requests and report where their time went.
+
+    Sampled responses get a Server-Timing header with the database, template, outbound
+    HTTP and mail time, and requests slower than SERVER_TIMING_SLOW_MS are logged with
+    the same breakdown. Put it first in MIDDLEWARE so the other middlewares are counted.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profile = Profile()
+        token = current_profile.set(profile)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+
+        return self.report(request, response, profile, perf_counter() - start)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        profile = Profile()
+        token = current_profile.set(profile)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+
+        return self.report(request, response, profile, perf_counter() - start)
+
+    def report(self, request, response, profile, total):
+        response["Server-Timing"] = profile.header(total)
+
+        if total * 1000 >= settings.SERVER_TIMING_SLOW_MS:
+            logger.warning(
+                "Slow request %s %s took %.1fms (%d queries): %s",
+                request.method,
+                request.path,
+                total * 1000,
+                profile.queries,
+                ", ".join(
+                    f"{section} {milliseconds:.1f}ms"
+                    for section, milliseconds in profile.breakdown(total)
+                ),
+            )
+
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record the latency and the status code of each request per view name.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        start = perf_counter()
+        response = self.get_response(request)
+        return self.record(request, response, perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, perf_counter() - start)
+
+    def record(self, request, response, duration):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        REQUEST_LATENCY.observe(duration, view=view, method=request.method)
+        REQUESTS.inc(view=view, status=response.status_code)
+
+        return response
+
+
+# Content types worth compressing, images and archives are already compressed
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def get_accepted_encoding(request):
+    """
+    Pick the encoding of a response from the Accept-Encoding header of the request,
+    brotli when the client accepts it, then gzip.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        str | None: "br", "gzip" or None when the client accepts neither.
+    """
+    accepted = {}
+    for coding in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = coding.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in ("br", "gzip"):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def get_padding(max_random_bytes):
+    """
+    Get the random-length padding that hides the exact size of a compressed body.
+
+    Args:
+        max_random_bytes (int): The maximum length of the padding.
+
+    Returns:
+        bytes: Between 1 and max_random_bytes bytes.
+    """
+    # the padding is not compressed, only its length matters, see django.utils.text.compress_string
+    return b"a" * (secrets.randbelow(max_random_bytes) + 1)
+
+
+def get_gzip_header():
+    """
+    Get a gzip header that carries the padding as its file name, the way Django's
+    GZipMiddleware does.
+
+    Returns:
+        bytes: The header, followed by a raw deflate stream and the gzip trailer.
+    """
+    # magic, deflate, FNAME, no modification time, no extra flags, unknown OS
+    return (
+        b"\x1f\x8b\x08"
+        + bytes([gzip.FNAME])
+        + b"\x00\x00\x00\x00\x00\xff"
+        + get_padding(settings.COMPRESSION_MAX_RANDOM_BYTES)
+        + b"\x00"
+    )
+
+
+def get_brotli_padding():
+    """
+    Get a brotli metadata block that carries the padding, the decoders skip it.
+
+    The stream must end on a byte boundary where the block starts, i.e. right after
+    a flush of the compressor.
+
+    Returns:
+        bytes: The metadata block.
+    """
+    # a metadata block holds up to 256 bytes, its length is stored in one byte
+    padding = get_padding(min(settings.COMPRESSION_MAX_RANDOM_BYTES, 256))
+    length = len(padding) - 1
+    # ISLAST 0, MNIBBLES 0 (11), reserved 0, MSKIPBYTES 1 (01), then the length - 1
+    return bytes([0b00010110 | (length & 0b11) << 6, length >> 2]) + padding
+
+
+def compress(content, encoding, cached=False):
+    """
+    Compress the body of a response, with random-length padding against BREACH.
+
+    The padding changes the size of the compressed body by up to
+    COMPRESSION_MAX_RANDOM_BYTES bytes, so the length of a response that reflects the
+    input of a request next to a secret does not tell how much of the two match. Gzip
+    gets it as the file name of its header and brotli as a metadata block.
+
+    Args:
+        content (bytes): The body.
+        encoding (str): "br" or "gzip".
+        cached (bool, optional): Whether the result is cached, it is then compressed harder.
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "br":
+        quality = (
+            settings.COMPRESSION_CACHED_BROTLI_QUALITY
+            if cached
+            else settings.COMPRESSION_BROTLI_QUALITY
+        )
+        compressor = brotli.Compressor(quality=quality)
+        return (
+            compressor.process(content)
+            + compressor.flush()
+            + get_brotli_padding()
+            + compressor.finish()
+        )
+
+    level = settings.COMPRESSION_CACHED_GZIP_LEVEL if cached else settings.COMPRESSION_GZIP_LEVEL
+    # the padded header replaces the 10 bytes of the plain one
+    return get_gzip_header() + gzip.compress(content, compresslevel=level, mtime=0)[10:]
+
+
+class StreamCompressor:
+    """
+    Compress a streamed body chunk by chunk, with the padding of compress().
+
+    Each chunk is flushed, so it reaches the client as soon as the view produces it.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # a raw deflate stream, the header and the trailer are written here
+            self.compressor = zlib.compressobj(
+                settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS
+            )
+            self.crc = 0
+            self.size = 0
+
+    def start(self):
+        return b"" if self.encoding == "br" else get_gzip_header()
+
+    def process(self, chunk):
+        if self.encoding == "br":
+            return self.compressor.process(chunk) + self.compressor.flush()
+
+        self.crc = zlib.crc32(chunk, self.crc)
+        self.size += len(chunk)
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self.compressor.flush() + get_brotli_padding() + self.compressor.finish()
+
+        return self.compressor.flush() + struct.pack("<II", self.crc, self.size & 0xFFFFFFFF)
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    yield compressor.start()
+    for chunk in chunks:
+        if chunk:
+            yield compressor.process(chunk)
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    yield compressor.start()
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.process(chunk)
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress the text responses with brotli or gzip, whichever the client prefers.
+
+    Bodies under COMPRESSION_MIN_SIZE bytes are sent as they are, and streamed responses
+    are compressed chunk by chunk. Responses that serve byte ranges, the media files, are
+    left alone, their Content-Range and ETag are those of the file, and so are the
+    responses that already have a Content-Encoding. A view whose response comes from a
+    cache can set `response.compression_cache_key`, the compressed body is then cached
+    under that key and reused as long as the body is the same.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        if not self.should_compress(response):
+            return response
+        return self.compress_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if not self.should_compress(response):
+            return response
+        if response.streaming:
+            # the stream is only wrapped here, it is compressed as it is sent
+            return self.compress_response(request, response)
+        # compressing and the cache lookups block, they run off the event loop
+        return await sync_to_async(self.compress_response, thread_sensitive=False)(
+            request, response
+        )
+
+    def should_compress(self, response):
+        return (
+            not response.has_header("Content-Encoding")
+            and not response.has_header("Content-Range")
+            and not response.has_header("Accept-Ranges")
+            and response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            and (response.streaming or len(response.content) >= settings.COMPRESSION_MIN_SIZE)
+        )
+
+    def compress_response(self, request, response):
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = get_accepted_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = compress_stream(
+                    response.streaming_content, encoding
+                )
+            del response.headers["Content-Length"]
+        else:
+            compressed = self.get_compressed_content(response, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # the compressed body is not byte for byte the one a strong ETag was computed for
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def get_compressed_content(self, response, encoding):
+        cache_key = getattr(response, "compression_cache_key", None)
+        if cache_key is None:
+            return compress(response.content, encoding)
+
+        cache_key = f"compressed_{encoding}_{cache_key}"
+        digest = hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+
+        cached = cache.get(cache_key)
+        if cached is not None and cached[0] == digest:
+            COMPRESSION_CACHE.inc(encoding=encoding, result="hit")
+            return cached[1]
+        COMPRESSION_CACHE.inc(encoding=encoding, result="miss")
+
+        compressed = compress(response.content, encoding, cached=True)
+        cache.set(cache_key, (digest, compressed), settings.COMPRESSION_CACHE_TTL)
+        return compressed
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep the reads of a session on the primary database for REPLICA_PIN_SECONDS after it
+    wrote, so it reads its own writes while the replicas catch up.
+
+    The end of the window is kept in the REPLICA_PIN_COOKIE_NAME cookie. Put it before
+    SessionMiddleware so the session writes pin too.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = self.get_state(request)
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        state = self.get_state(request)
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        return self.pin(response, state)
+
+    def get_state(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE_NAME, 0))
+        except ValueError:
+            pinned_until = 0
+        return RoutingState(pinned=pinned_until > time.time())
+
+    def pin(self, response, state):
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE_NAME,
+                str(int(time.time() + settings.REPLICA_PIN_SECONDS)),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
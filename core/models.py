@@ -1,5 +1,6 @@
 from datetime import timedelta, date
 from dateutil.relativedelta import relativedelta
+import uuid
 
 from django.contrib.auth.models import User
 from django_countries.fields import CountryField
@@ -17,6 +18,9 @@ class Property(models.Model):
     class Meta:
         verbose_name = "Property"
         verbose_name_plural = "Properties"
+        indexes = [
+            models.Index(fields=["user", "updated_at", "id"], name="property_user_updated_idx"),
+        ]
 
     TYPE_CHOICES = (
         ("R", _("Room")),
@@ -53,6 +57,8 @@ class Property(models.Model):
     )
     is_rented = models.BooleanField(default=False)
     created_at = models.DateField(auto_now_add=True)
+    # the offline clients sync the rows changed since their last sync
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - belong to {self.user} / {self.property_type}"
@@ -100,6 +106,14 @@ class Tenant(models.Model):
         blank=True,
         help_text="[Passport, National ID]",
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["landlord", "updated_at", "id"], name="tenant_landlord_updated_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} / {self.landlord}'s Tenant" 
@@ -113,6 +127,11 @@ class RentProperty(models.Model):
     class Meta:
         verbose_name = "Rent Property"
         verbose_name_plural = "Rent Properties"
+        indexes = [
+            models.Index(
+                fields=["property", "updated_at", "id"], name="rental_property_updated_idx"
+            ),
+        ]
 
     PAYMENT_OPTIONS = (
         ("1", _("Daily")),
@@ -149,6 +168,7 @@ class RentProperty(models.Model):
     end_date = models.DateField(default=date.today() + timedelta(days=30))
     status = models.CharField(max_length=10, choices=STATUS_OPTIONS, default="paid")
     contract = models.ImageField(upload_to="contracts", null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.property.name} - Rented to {self.tenant.name} by {self.property.user}"
@@ -267,11 +287,20 @@ class RentHistory(models.Model):
     contract = models.ImageField(
         upload_to="rent_history_contracts", null=True, blank=True
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Rent History"
         verbose_name_plural = "Rent Histories"
         ordering = ["-end_date"]
+        indexes = [
+            models.Index(
+                fields=["property", "-end_date", "-id"], name="history_property_end_idx"
+            ),
+            models.Index(
+                fields=["property", "updated_at", "id"], name="history_property_updated_idx"
+            ),
+        ]
 
     def __str__(self):
         property_name = self.property.name
@@ -300,6 +329,10 @@ class RecentActivity(models.Model):
         verbose_name = "Recent Activity"
         verbose_name_plural = "Recent Activities"
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["user", "-timestamp"], name="activity_user_timestamp_idx"),
+            models.Index(fields=["timestamp"], name="activity_timestamp_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} {self.activity_type} for {self.property.name} on {self.timestamp}"
@@ -310,6 +343,8 @@ class Notifications(models.Model):
     A model to represent notifications for a user
     """
 
+    KIND_OPTIONS = (("overdue", _("Overdue")),)
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     property = models.ForeignKey(
         Property, on_delete=models.CASCADE, null=True, blank=True
@@ -317,11 +352,128 @@ class Notifications(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # a notification is only sent once per kind and payment period of a property
+    kind = models.CharField(max_length=20, choices=KIND_OPTIONS, default="overdue")
+    period = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["user", "is_read"], name="notification_user_read_idx"),
+            models.Index(
+                fields=["user", "-timestamp"], name="notification_user_time_idx"
+            ),
+            models.Index(fields=["timestamp"], name="notification_timestamp_idx"),
+            models.Index(
+                fields=["user", "updated_at", "id"], name="notification_user_updated_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "property", "kind", "period"],
+                name="unique_notification_per_period",
+            )
+        ]
 
     def __str__(self):
         return f"Notification for {self.user}"
+
+
+class ArchivedActivity(models.Model):
+    """
+    A model to keep recent activities that are older than their retention period
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    property = models.ForeignKey(
+        Property, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    activity_type = models.CharField(
+        max_length=50, choices=RecentActivity.ACTIVITIES_OPTIONS
+    )
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Archived Activity"
+        verbose_name_plural = "Archived Activities"
+        ordering = ["-timestamp"]
+
+    def __str__(self):
+        return f"{self.user} {self.activity_type} on {self.timestamp} (archived)"
+
+
+class ArchivedNotification(models.Model):
+    """
+    A model to keep read notifications that are older than their retention period
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    property = models.ForeignKey(
+        Property, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    message = models.TextField()
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Archived Notification"
+        verbose_name_plural = "Archived Notifications"
+        ordering = ["-timestamp"]
+
+    def __str__(self):
+        return f"Notification for {self.user} on {self.timestamp} (archived)"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A model to track a resumable upload that is sent in chunks
+    """
+
+    STATUS_OPTIONS = (
+        ("uploading", _("Uploading")),
+        ("complete", _("Complete")),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_OPTIONS, default="uploading")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Chunked Upload"
+        verbose_name_plural = "Chunked Uploads"
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size}) by {self.user}"
+
+
+class Tombstone(models.Model):
+    """
+    A model to remember a deleted row until the offline clients synced its deletion
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # the name of the resource of the row, e.g. "properties", see core.api.API_RESOURCES
+    resource = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    # when the row was deleted
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Tombstone"
+        verbose_name_plural = "Tombstones"
+        indexes = [
+            models.Index(fields=["user", "timestamp", "id"], name="tombstone_user_time_idx"),
+            models.Index(fields=["timestamp"], name="tombstone_timestamp_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} deleted on {self.timestamp}"
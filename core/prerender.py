@@ -0,0 +1,132 @@
+import hashlib
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import translation
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+
+
+# The public pages rendered once per language by `manage.py build_static`: their URL name
+# and template. They must not depend on the user.
+PRERENDERED_PAGES = {
+    "landing": "core/landing.html",
+    "not_developed": "core/not_developed.html",
+}
+
+# The value of the CSRF inputs of a pre-rendered page, includes/csrf_from_cookie.html
+# replaces it with the token from the cookie set when the page is served
+PRERENDERED_CSRF_TOKEN = "prerendered"
+
+
+def get_prerendered_path(name, language):
+    return os.path.join(settings.PRERENDERED_PAGES_DIR, f"{name}.{language}.html")
+
+
+def prerender_pages():
+    """
+    Render the PRERENDERED_PAGES in each of the LANGUAGES to PRERENDERED_PAGES_DIR.
+
+    Run it after the static files are collected, so the pages link the hashed files.
+
+    Returns:
+        list: The paths of the written pages.
+    """
+    from django.test import RequestFactory
+
+    os.makedirs(settings.PRERENDERED_PAGES_DIR, exist_ok=True)
+    paths = []
+
+    for language, _ in settings.LANGUAGES:
+        with translation.override(language):
+            for name, template_name in PRERENDERED_PAGES.items():
+                request = RequestFactory().get(reverse(name))
+                request.user = AnonymousUser()
+                request.LANGUAGE_CODE = language
+
+                html = render_to_string(
+                    template_name, {"csrf_token": PRERENDERED_CSRF_TOKEN}, request
+                )
+                path = get_prerendered_path(name, language)
+                with open(path, "w") as file:
+                    file.write(html)
+                paths.append(path)
+
+    read_prerendered_page.cache_clear()
+    return paths
+
+
+@lru_cache
+def read_prerendered_page(name, language):
+    # a missing page raises, so it is not cached and is served once it is built
+    with open(get_prerendered_path(name, language), "rb") as file:
+        content = file.read()
+
+    return content, f'"{hashlib.md5(content, usedforsecurity=False).hexdigest()}"'
+
+
+def get_prerendered_page(name, language):
+    """
+    Read a pre-rendered page, cached once it was found.
+
+    Args:
+        name (str): The name of the page, one of PRERENDERED_PAGES.
+        language (str): The language code.
+
+    Returns:
+        tuple | None: The HTML and its ETag, None when the page was not pre-rendered.
+    """
+    try:
+        return read_prerendered_page(name, language)
+    except FileNotFoundError:
+        return None
+
+
+def serve_prerendered(request, name):
+    """
+    Serve a pre-rendered page in the language of the request to an anonymous user.
+
+    The page is rendered as usual for a logged-in user, whose page carries its own
+    data (e.g. the live events sequence number), and when the pages were not built.
+
+    The page is cached by the browser for PRERENDERED_PAGES_MAX_AGE seconds. It varies on
+    the cookies, so the language cookie or a login are seen right away.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        name (str): The name of the page, one of PRERENDERED_PAGES.
+
+    Returns:
+        HttpResponse: The page.
+    """
+    if request.user.is_authenticated:
+        return render(request, PRERENDERED_PAGES[name])
+
+    language = translation.get_supported_language_variant(translation.get_language())
+    page = get_prerendered_page(name, language)
+    if page is None:
+        return render(request, PRERENDERED_PAGES[name])
+    content, etag = page
+
+    # the forms of the page read the token from the CSRF cookie
+    get_token(request)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content)
+        response.compression_cache_key = f"prerendered_{name}_{language}"
+
+    response.headers["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=settings.PRERENDERED_PAGES_MAX_AGE)
+    patch_vary_headers(response, ("Cookie", "Accept-Language"))
+    return response
@@ -0,0 +1,143 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+
+# The profile of the current request, None when the request is not sampled
+current_profile = ContextVar("current_profile", default=None)
+
+# Time spent in the sections nested in the current section, subtracted from its own time
+_nested_time = ContextVar("nested_time", default=None)
+
+
+class Profile:
+    """
+    The time spent per section (db, tpl, http, mail) while handling a request
+    """
+
+    LABELS = {
+        "db": "Database",
+        "tpl": "Templates",
+        "http": "Outbound HTTP",
+        "mail": "Mail",
+    }
+
+    def __init__(self):
+        self.timings = {}
+        self.queries = 0
+
+    def add(self, section, seconds):
+        self.timings[section] = self.timings.get(section, 0.0) + seconds
+
+    def breakdown(self, total):
+        """
+        Split the total time of the request in its sections.
+
+        Args:
+            total (float): The total time of the request in seconds.
+
+        Returns:
+            list: (section, milliseconds) tuples, the time outside the sections last as "app".
+        """
+        sections = [
+            (section, self.timings[section] * 1000)
+            for section in self.LABELS
+            if section in self.timings
+        ]
+        app = total - sum(self.timings.values())
+        return sections + [("app", max(app, 0) * 1000)]
+
+    def header(self, total):
+        """
+        Build the Server-Timing header of the request.
+
+        Args:
+            total (float): The total time of the request in seconds.
+
+        Returns:
+            str: The Server-Timing header value.
+        """
+        metrics = []
+        for section, milliseconds in self.breakdown(total):
+            desc = self.LABELS.get(section, "Application")
+            if section == "db":
+                desc = f"{self.queries} queries"
+            metrics.append(f'{section};dur={milliseconds:.1f};desc="{desc}"')
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+@contextmanager
+def timed(section):
+    """
+    Add the time spent in the block to a section of the current request profile.
+
+    Sections can be nested, the time of the inner section is not counted in the outer one.
+    Outside of a sampled request this does nothing.
+
+    Args:
+        section (str): The section name, one of Profile.LABELS.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    outer = _nested_time.get()
+    nested = [0.0]
+    token = _nested_time.set(nested)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        _nested_time.reset(token)
+        profile.add(section, elapsed - nested[0])
+        if outer is not None:
+            outer[0] += elapsed
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    A database execute wrapper that adds each query to the current request profile.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    profile.queries += 1
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if settings.SERVER_TIMING_ENABLED and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed("tpl"):
+            return super().render(context, request)
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with the render time added to the request profile
+    """
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfiledTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,133 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+class RoutingState:
+    """
+    Where the reads of a request, or of a block of code outside of a request, go.
+    """
+
+    def __init__(self, pinned=False):
+        # the reads may go to a replica, see use_replicas
+        self.replica_reads = False
+        # the session wrote less than REPLICA_PIN_SECONDS ago
+        self.pinned = pinned
+        # something was written since the state was created
+        self.wrote = False
+
+    @property
+    def reads_from_replicas(self):
+        return self.replica_reads and not self.pinned and not self.wrote
+
+
+# Set per request by ReplicaPinningMiddleware. The state is shared, not copied, by the
+# threads and tasks the request starts, so a write in one of them pins the others.
+routing_state = ContextVar("routing_state", default=None)
+
+
+class ReplicaRouter:
+    """
+    Send the reads of the views and reports that opted in with use_replicas or
+    read_from_replicas to one of the DATABASE_REPLICAS, everything else to the primary.
+
+    Once something was written, the reads of the request stay on the primary so it reads
+    its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if settings.DATABASE_REPLICAS and state is not None and state.reads_from_replicas:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replicas are migrated by the replication
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_replicas(changed_at=None):
+    """
+    Send the reads of a block to the replicas, e.g. the queries of a report or an export.
+
+    The reads stay on the primary when the session wrote recently, or when the data read
+    changed less than REPLICA_PIN_SECONDS ago, since the replicas may not have it yet.
+
+    Args:
+        changed_at (float, optional): The time the data last changed, e.g. the data
+            version of the landlord.
+
+    Yields:
+        RoutingState: The routing state of the block.
+    """
+    state = routing_state.get()
+    token = None
+    if state is None:
+        state = RoutingState()
+        token = routing_state.set(state)
+
+    previous = state.replica_reads
+    state.replica_reads = (
+        changed_at is None or time.time() - changed_at >= settings.REPLICA_PIN_SECONDS
+    )
+    try:
+        yield state
+    finally:
+        state.replica_reads = previous
+        if token is not None:
+            routing_state.reset(token)
+
+
+def read_from_replicas(view):
+    """
+    Decorator for the read-only views of a landlord's data, e.g. the list pages and the
+    dashboard panels, that sends their reads to the replicas.
+
+    The reads stay on the primary while the landlord's data version is recent. Put it
+    under landlord_conditional, which sets the version on the request, or under
+    login_required.
+
+    Args:
+        view (callable): The view, sync or async.
+
+    Returns:
+        callable: The decorated view.
+    """
+    from .utils import aget_landlord_version, get_landlord_version
+
+    if iscoroutinefunction(view):
+
+        async def wrapper(request, *args, **kwargs):
+            version = getattr(request, "landlord_version", None)
+            if version is None:
+                version = await aget_landlord_version((await request.auser()).id)
+            with use_replicas(version):
+                return await view(request, *args, **kwargs)
+
+    else:
+
+        def wrapper(request, *args, **kwargs):
+            version = getattr(request, "landlord_version", None)
+            if version is None:
+                version = get_landlord_version(request.user.id)
+            with use_replicas(version):
+                return view(request, *args, **kwargs)
+
+    return wraps(view)(wrapper)
@@ -1,12 +1,82 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext as _
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from .dashboard import invalidate_panels
+from .events import (
+    is_online,
+    publish_activity,
+    publish_event,
+    publish_notification,
+    skip_event,
+)
+from .metrics import STATUS_TRANSITIONS
+from .models import (
+    Notifications,
+    Property,
+    RecentActivity,
+    RentHistory,
+    RentProperty,
+    Tenant,
+    Tombstone,
+)
+from .sync import SYNC_MODELS
+from .utils import (
+    bump_landlord_version,
+    bump_property_versions,
+    create_notification_once,
+    get_payment_period_start,
+    get_payment_status_chart,
+    get_unread_notifications_count,
+    increment_unread_notifications_count,
+    reset_unread_notifications_count,
+)
 
-from .models import Property, RecentActivity, RentProperty, Notifications
-from .utils import get_payment_status_chart
+
+def get_landlord_id(sender, instance):
+    """
+    Get the id of the landlord a row of the landlord's data belongs to.
+
+    Args:
+        sender (Model): The model class of the row.
+        instance (Model instance): The row.
+
+    Returns:
+        int: The id of the landlord.
+    """
+    if sender == Property:
+        return instance.user_id
+    elif sender in (RentProperty, RentHistory):
+        return instance.property.user_id
+    elif sender == Tenant:
+        return instance.landlord_id
+    return instance.user_id
+
+
+@receiver(post_init, sender=RentProperty)
+def remember_rental_status(sender, instance, **kwargs):
+    # read __dict__ so a deferred status is not loaded
+    instance._original_status = instance.__dict__.get("status")
+
+
+@receiver(post_save, sender=RentProperty)
+def count_status_transition(sender, instance, created, **kwargs):
+    """
+    Signal receiver that counts the payment status changes of rentals.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (RentProperty): The instance of the model that was saved.
+        created (bool): A boolean indicating whether the instance was created.
+        **kwargs: Additional keyword arguments.
+    """
+    original_status = instance._original_status
+    if not created and original_status and instance.status != original_status:
+        STATUS_TRANSITIONS.inc(from_status=original_status, to_status=instance.status)
+    instance._original_status = instance.status
 
 
 @receiver(post_save, sender=Property)
@@ -28,6 +98,8 @@ def create_recent_activity(sender, instance, created, **kwargs):
         - Creates a recent activity record when a Property instance is created.
         - Creates a recent activity record when a RentProperty instance is created.
         - Creates a recent activity record when a RentProperty instance's status is updated to "paid".
+        - Creates an overdue notification and activity record once per payment period when a
+          RentProperty instance's status is "overdue".
     """
 
     # Create recent activity for Property instance
@@ -53,11 +125,24 @@ def create_recent_activity(sender, instance, created, **kwargs):
                     activity_type="payment",
                 )
             elif instance.status == "overdue":
-                RecentActivity.objects.create(
+                # saving an overdue rental again must not notify the landlord again
+                notification = create_notification_once(
                     user=instance.property.user,
                     property=instance.property,
-                    activity_type="overdue",
+                    kind="overdue",
+                    period=get_payment_period_start(
+                        instance.payment, instance.start_date, instance.end_date
+                    ),
+                    message=_("Payment overdue for property"),
                 )
+                if notification:
+                    activity = RecentActivity(
+                        user=instance.property.user,
+                        property=instance.property,
+                        activity_type="overdue",
+                    )
+                    activity.notification = notification
+                    activity.save()
 
 
 @receiver(post_save, sender=RecentActivity)
@@ -76,49 +161,173 @@ def handle_recent_activity(sender, instance, created, **kwargs):
 
     Actions:
         - Handles recent activities if the activity_type is not "overdue".
-        - Creates a notification for the user if the activity_type is "overdue".
-        - Sends the appropriate data to the user's WebSocket channel.
+        - Sends the notification created with an "overdue" activity.
+        - Sends them, and the payment status chart, as events to the user's WebSocket clients.
+        - Does nothing but skip the event when the user has no connected client.
     """
-    if created:
-        channel_layer = get_channel_layer()
+    # most activities are saved while the landlord has no page open, e.g. by the batch
+    # status updates, nothing is queried, rendered or sent for them
+    if not is_online(instance.user_id):
+        skip_event(instance.user_id)
+        return
 
-        # Handle recent activities and overdue notifications
+    if created:
+        # only send the new item, the clients keep the ones they have
         if instance.activity_type != "overdue":
-            recent_activities = list(
-                RecentActivity.objects.filter(user=instance.user)
-                .exclude(activity_type="overdue")
-                .order_by("-timestamp")[:10]
-            )
-            async_to_sync(channel_layer.group_send)(
-                f"user_{instance.user.id}",
-                {
-                    "type": "send_recent_activities",
-                    "recent_activities": recent_activities,
-                },
-            )
-        else:
-            Notifications.objects.create(
-                user=instance.user,
-                property=instance.property,
-                message=_(f"Payment overdue for property"),
-            )
-            notifications = list(
-                Notifications.objects.filter(user=instance.user, is_read=False)
-            )
-            async_to_sync(channel_layer.group_send)(
-                f"user_{instance.user.id}",
-                {
-                    "type": "send_overdue_notifications",
-                    "notifications": notifications,
-                },
-            )
+            publish_activity(instance)
+        elif getattr(instance, "notification", None):
+            notification = instance.notification
+
+            def send_notification():
+                publish_notification(
+                    notification, get_unread_notifications_count(instance.user)
+                )
+
+            transaction.on_commit(send_notification)
+
+    publish_event(instance.user_id, "chart.updated", get_payment_status_chart(instance.user))
+
+
+@receiver(post_save, sender=Notifications)
+def count_new_notification(sender, instance, created, **kwargs):
+    """
+    Signal receiver that keeps the cached unread notifications counter up to date.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Notifications): The instance of the model that was saved.
+        created (bool): A boolean indicating whether the instance was created.
+        **kwargs: Additional keyword arguments.
+
+    Actions:
+        - Increments the counter when an unread notification is created.
+        - Drops the counter when an existing notification is saved, it is recounted on the next read.
+    """
+    if created:
+        if not instance.is_read:
+            increment_unread_notifications_count(instance.user_id)
+    else:
+        reset_unread_notifications_count(instance.user_id)
+
+
+@receiver(post_delete, sender=Notifications)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    """
+    Signal receiver that drops the cached unread notifications counter when an unread notification is deleted.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Notifications): The instance of the model that was deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    if not instance.is_read:
+        reset_unread_notifications_count(instance.user_id)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+@receiver(post_save, sender=RentProperty)
+@receiver(post_delete, sender=RentProperty)
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+@receiver(post_save, sender=RentHistory)
+@receiver(post_delete, sender=RentHistory)
+@receiver(post_save, sender=RecentActivity)
+def handle_landlord_data_change(sender, instance, **kwargs):
+    """
+    Signal receiver that marks the cached views of a landlord as stale when their data changes.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Model instance): The instance of the model that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+
+    Actions:
+        - Bumps the data version of the landlord, the ETag of their pages changes with it.
+        - Drops the cached dashboard panels of the landlord.
+    """
+    # rows deleted with their property or tenant are covered by the signal of that object
+    origin = kwargs.get("origin")
+    if isinstance(origin, (Property, Tenant)) and origin is not instance:
+        return
+
+    user_id = get_landlord_id(sender, instance)
+
+    # a new activity is always saved with the change it records
+    if sender != RecentActivity:
+        bump_landlord_version(user_id)
+    transaction.on_commit(lambda: invalidate_panels(user_id))
+
+
+@receiver(post_delete, sender=Property)
+@receiver(post_delete, sender=Tenant)
+@receiver(post_delete, sender=RentProperty)
+@receiver(post_delete, sender=RentHistory)
+@receiver(post_delete, sender=Notifications)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Signal receiver that records a deleted row for the offline clients, see core.sync.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Model instance): The instance of the model that was deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    # the clients delete the rows of a deleted property or tenant with it, the way the
+    # database cascades, so only the property or tenant gets a tombstone
+    origin = kwargs.get("origin")
+    if isinstance(origin, (Property, Tenant)) and origin is not instance:
+        return
+    # a deleted landlord has no clients left to sync, and their tombstones go with them
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+
+    Tombstone.objects.create(
+        user_id=get_landlord_id(sender, instance),
+        resource=SYNC_MODELS[sender],
+        object_id=instance.id,
+    )
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_save, sender=RentProperty)
+@receiver(post_delete, sender=RentProperty)
+@receiver(post_save, sender=RentHistory)
+@receiver(post_delete, sender=RentHistory)
+def invalidate_property_fragments(sender, instance, **kwargs):
+    """
+    Signal receiver that marks the cached property card and rent history of a property as stale.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Model instance): The instance of the model that was saved or deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    # the fragments of a deleted property are never read again
+    if isinstance(kwargs.get("origin"), Property):
+        return
+
+    bump_property_versions([instance.id if sender == Property else instance.property_id])
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(pre_delete, sender=Tenant)
+def invalidate_tenant_property_fragments(sender, instance, created=False, **kwargs):
+    """
+    Signal receiver that marks the cached fragments of the properties a tenant rents or
+    rented as stale, since they show the tenant's details.
 
-    data = get_payment_status_chart(instance.user)
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Tenant): The instance of the model that was saved or is about to be deleted.
+        created (bool): A boolean indicating whether the instance was created.
+        **kwargs: Additional keyword arguments.
+    """
+    if created:
+        return
 
-    async_to_sync(channel_layer.group_send)(
-        f"user_{instance.user.id}",
-        {
-            "type": "send_payment_status_chart",
-            "data": data,
-        },
-    )
\ No newline at end of file
+    # before the delete, the rent histories of the tenant still point to it
+    property_ids = Property.objects.filter(
+        Q(property_rentals__tenant=instance) | Q(renthistory__tenant=instance)
+    ).values_list("id", flat=True)
+    bump_property_versions(set(property_ids))
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .api import API_RESOURCES
+from .models import Tombstone
+
+
+# The resources the offline clients keep a copy of. Their changed rows and the
+# tombstones of their deleted rows are sent in one stream ordered by the time of the
+# change, then by the position of the resource here, then by id.
+SYNC_RESOURCES = ("properties", "tenants", "rentals", "history", "notifications")
+
+SYNC_MODELS = {API_RESOURCES[name]["model"]: name for name in SYNC_RESOURCES}
+
+# the position of the tombstones in the stream, after the resources
+TOMBSTONES = len(SYNC_RESOURCES)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class SyncCursorExpired(Exception):
+    """
+    The cursor of a client is older than the tombstones, the client has to sync from scratch.
+    """
+
+
+def encode_sync_cursor(changed_at, source, id):
+    """
+    Encode the position of a change in the sync stream.
+
+    Args:
+        changed_at (datetime): The time of the change.
+        source (int): The position of the resource in SYNC_RESOURCES, or TOMBSTONES.
+        id (int): The id of the row or of the tombstone.
+
+    Returns:
+        str: The cursor, "<microseconds since epoch>-<source>-<id>".
+    """
+    microseconds = (changed_at - EPOCH) // timedelta(microseconds=1)
+    return f"{microseconds}-{source}-{id}"
+
+
+def decode_sync_cursor(cursor):
+    """
+    Decode a cursor created by encode_sync_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The (changed_at, source, id) of the last change the client has.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    microseconds, source, id = cursor.split("-")
+    source, id = int(source), int(id)
+    # ids beyond a bigint would overflow in the database instead
+    if not 0 <= id < 2**63:
+        raise ValueError("Cursor id is out of range")
+
+    try:
+        return EPOCH + timedelta(microseconds=int(microseconds)), source, id
+    except OverflowError:
+        raise ValueError("Cursor time is out of range")
+
+
+def get_changes(user, source, position, until, limit):
+    """
+    Get the changes of one source of the sync stream after a position.
+
+    Args:
+        user (User): The landlord.
+        source (int): The position of the resource in SYNC_RESOURCES, or TOMBSTONES.
+        position (tuple | None): The decoded cursor of the client.
+        until (datetime): The time of the last change sent.
+        limit (int): The maximum number of changes.
+
+    Returns:
+        list: The (changed_at, source, id, row) of each change, in the stream order.
+    """
+    if source == TOMBSTONES:
+        rows = Tombstone.objects.filter(user=user)
+        time_field, fields = "timestamp", ("id", "resource", "object_id", "timestamp")
+    else:
+        resource = API_RESOURCES[SYNC_RESOURCES[source]]
+        rows = resource["model"].objects.filter(**{resource["owner"]: user})
+        time_field, fields = "updated_at", (*resource["fields"], "updated_at")
+
+    rows = rows.filter(**{f"{time_field}__lte": until})
+
+    if position:
+        changed_at, last_source, last_id = position
+        if source < last_source:
+            rows = rows.filter(**{f"{time_field}__gt": changed_at})
+        elif source == last_source:
+            rows = rows.filter(
+                Q(**{f"{time_field}__gt": changed_at})
+                | Q(**{time_field: changed_at, "id__gt": last_id})
+            )
+        else:
+            rows = rows.filter(**{f"{time_field}__gte": changed_at})
+
+    return [
+        (row[time_field], source, row["id"], row)
+        for row in rows.order_by(time_field, "id").values(*fields)[:limit]
+    ]
+
+
+def get_sync_page(user, cursor=None, limit=None):
+    """
+    Get the next page of the changes of a landlord's data for an offline client.
+
+    The client applies the changed rows and deletes the rows of the tombstones, then asks
+    for the next page with the returned cursor until "more" is false, and keeps the last
+    cursor for its next sync. A deleted property or tenant only gets its own tombstone,
+    the client deletes the rows that belong to it the way the database cascades.
+
+    The changes of the last SYNC_SETTLE_SECONDS are left for the next sync, since the
+    transaction that made them may not be committed yet.
+
+    Args:
+        user (User): The landlord.
+        cursor (str, optional): The cursor of the last page, None for a first sync.
+        limit (int, optional): The page size. Defaults to SYNC_PAGE_SIZE.
+
+    Returns:
+        dict: The changed rows by resource in "changes", the ids of the deleted rows by
+            resource in "deleted", the cursor in "next" and whether there are more
+            changes in "more".
+
+    Raises:
+        ValueError: If the cursor is malformed.
+        SyncCursorExpired: If the cursor is older than SYNC_TOMBSTONE_TTL_DAYS.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    now = timezone.now()
+    position = decode_sync_cursor(cursor) if cursor else None
+
+    if position and position[0] < now - timedelta(days=settings.SYNC_TOMBSTONE_TTL_DAYS):
+        raise SyncCursorExpired
+
+    until = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    if position and position[0] >= until:
+        return {"changes": {}, "deleted": {}, "next": cursor, "more": False}
+
+    changes = sorted(
+        change
+        for source in range(TOMBSTONES + 1)
+        for change in get_changes(user, source, position, until, limit + 1)
+    )
+    more = len(changes) > limit
+    changes = changes[:limit]
+
+    page = {"changes": {}, "deleted": {}, "more": more}
+    for _, source, _, row in changes:
+        if source == TOMBSTONES:
+            page["deleted"].setdefault(row["resource"], []).append(row["object_id"])
+        else:
+            page["changes"].setdefault(SYNC_RESOURCES[source], []).append(row)
+
+    if more:
+        changed_at, source, id, _ = changes[-1]
+        page["next"] = encode_sync_cursor(changed_at, source, id)
+    else:
+        # nothing is left up to `until`, the next sync starts after it
+        page["next"] = encode_sync_cursor(until, TOMBSTONES + 1, 0)
+
+    return page
@@ -1,6 +1,6 @@
 from django import template
 
-from babel.numbers import format_number
+from core import formatting
 
 
 register = template.Library()
@@ -9,9 +9,10 @@ register = template.Library()
 @register.filter
 def format_numbers(value):
     """
-    Format a number using the Babel library.
+    Format a number in the active language.
 
-    This filter formats a number using the Babel library and returns the formatted number.
+    This filter formats a number the way it is written in the active language, with the
+    locale and number pattern cached per language, and returns the formatted number.
 
     Args:
         value (int): The number to be formatted.
@@ -20,4 +21,20 @@ def format_numbers(value):
         str: The formatted number.
     """
 
-    return format_number(value, locale="en_US")
+    return formatting.format_number(value)
+
+
+@register.filter
+def format_currency(value, currency):
+    """
+    Format an amount of money in the active language.
+
+    Args:
+        value (int): The amount to be formatted.
+        currency (str): The currency of the amount, e.g. property.currency.
+
+    Returns:
+        str: The formatted amount with its currency symbol.
+    """
+
+    return formatting.format_currency(value, currency)
@@ -0,0 +1,46 @@
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from core.images import get_responsive_images
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(path, sizes="100vw", **attrs):
+    """
+    Render a static image with its WebP/AVIF variants.
+
+    The image is wrapped in a <picture> with a source per format, each with a srcset of the
+    widths built by `manage.py build_static`, so the browser downloads the smallest file it
+    can use. The <img> gets the width and height of the image from the same manifest, so
+    the browser reserves its space before it loads. Without built variants it is a plain
+    <img>.
+
+    Args:
+        path (str): The static path of the image, e.g. "images/about.png".
+        sizes (str, optional): The sizes attribute of the sources. Defaults to "100vw".
+        **attrs: The attributes of the <img>, e.g. alt and class.
+
+    Returns:
+        str: The HTML of the image.
+    """
+    image = get_responsive_images().get(path)
+    if image is None:
+        return format_html('<img src="{}"{}>', static(path), flatatt(attrs))
+
+    attrs = {"width": image["width"], "height": image["height"], **attrs}
+    img = format_html('<img src="{}"{}>', static(path), flatatt(attrs))
+
+    sources = format_html_join(
+        "",
+        '<source type="image/{}" srcset="{}" sizes="{}">',
+        (
+            (format, ", ".join(f"{static(name)} {width}w" for width, name in variants), sizes)
+            for format, variants in image["variants"].items()
+        ),
+    )
+    return format_html("<picture>{}{}</picture>", sources, img)
@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import importlib
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+import brotli
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template, engines
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from .checks import check_live_events_cache
+from .events import (
+    get_event_key,
+    get_event_seq,
+    get_missed_events,
+    mark_connected,
+    publish_event,
+)
+from .formatting import (
+    format_currencies,
+    format_currency,
+    format_number,
+    format_numbers,
+    format_rental_prices,
+)
+from .images import get_responsive_images, get_supported_formats
+from .management.commands.check_query_budgets import (
+    QUERY_BUDGETS,
+    Command as CheckQueryBudgetsCommand,
+    get_budget_problems,
+)
+from .middleware import CompressionMiddleware
+from .models import (
+    ChunkedUpload,
+    Notifications,
+    Property,
+    RecentActivity,
+    RentHistory,
+    RentProperty,
+    Tenant,
+    Tombstone,
+)
+from .prerender import prerender_pages, read_prerendered_page
+from .routers import RoutingState, routing_state
+from .sync import (
+    SyncCursorExpired,
+    decode_sync_cursor,
+    encode_sync_cursor,
+    get_sync_page,
+)
+from .uploads import get_partial_path, parse_content_range
+from .urls import urlpatterns
+from .utils import (
+    create_notification_once,
+    get_notifications_page,
+    get_portfolio_summary,
+    get_upcoming_payments,
+)
+from .warmup import find_templates, warm_up
+
+
+def create_landlord(username):
+    """
+    Create a landlord with a rented property.
+
+    Args:
+        username (str): The username of the landlord.
+
+    Returns:
+        tuple: The user, the property, the tenant and the rental.
+    """
+    user = User.objects.create_user(username, f"{username}@example.com", "password")
+    property = Property.objects.create(
+        user=user, name="Flat", country="SD", city="Khartoum", address="Street 1"
+    )
+    tenant = Tenant.objects.create(landlord=user, name="Tenant", phone_number="+249912345678")
+    rental = RentProperty.objects.create(
+        property=property, tenant=tenant, payment="30", price=1000
+    )
+    return user, property, tenant, rental
+
+
+class MediaRootTestCase(TestCase):
+    """
+    A test case that writes its media files to a temporary MEDIA_ROOT
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, MEDIA_SENDFILE_BACKEND=None
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def write_media(self, name, content=b"contract"):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+
+class MediaAccessTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.property, self.tenant, self.rental = create_landlord("owner")
+        self.other, *_ = create_landlord("other")
+        self.client.force_login(self.user)
+
+    def get_media(self, name, **headers):
+        return self.client.get(reverse("protected_media", args=[name]), headers=headers)
+
+    def test_rental_contract_is_served_to_its_landlord_only(self):
+        self.write_media("contracts/lease.pdf")
+        RentProperty.objects.filter(id=self.rental.id).update(contract="contracts/lease.pdf")
+
+        response = self.get_media("contracts/lease.pdf")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"contract")
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.get_media("contracts/lease.pdf").status_code, 404)
+
+    def test_archived_contract_is_served_to_its_landlord(self):
+        # an emptied rental keeps the name of its contract in the rent history
+        self.write_media("contracts/old.pdf")
+        RentHistory.objects.create(
+            property=self.property,
+            tenant=self.tenant,
+            price=1000,
+            payment_type="30",
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 12, 31),
+            contract="contracts/old.pdf",
+        )
+
+        self.assertEqual(self.get_media("contracts/old.pdf").status_code, 200)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.get_media("contracts/old.pdf").status_code, 404)
+
+    def test_unknown_folders_and_missing_files_are_not_found(self):
+        self.write_media("chunked_uploads/secret.part")
+        Tenant.objects.filter(id=self.tenant.id).update(id_image="tenants_ID/missing.png")
+
+        self.assertEqual(self.get_media("chunked_uploads/secret.part").status_code, 404)
+        self.assertEqual(self.get_media("tenants_ID/missing.png").status_code, 404)
+
+    def test_conditional_and_range_requests(self):
+        self.write_media("tenants_ID/id.png", b"0123456789")
+        Tenant.objects.filter(id=self.tenant.id).update(id_image="tenants_ID/id.png")
+
+        response = self.get_media("tenants_ID/id.png")
+        etag = response["ETag"]
+        self.assertEqual(self.get_media("tenants_ID/id.png", if_none_match=etag).status_code, 304)
+
+        response = self.get_media("tenants_ID/id.png", range="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+
+        response = self.get_media("tenants_ID/id.png", range="bytes=20-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_contract_archived_as_a_url_is_served(self):
+        # rentals emptied before the contract name was archived left the media URL
+        self.write_media("contracts/old lease.pdf")
+        RentHistory.objects.create(
+            property=self.property,
+            tenant=self.tenant,
+            price=1000,
+            payment_type="30",
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 12, 31),
+            contract="/media/contracts/old%20lease.pdf",
+        )
+
+        self.assertEqual(self.get_media("contracts/old lease.pdf").status_code, 200)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.get_media("contracts/old lease.pdf").status_code, 404)
+
+    def test_sendfile_headers_are_quoted(self):
+        self.write_media("tenants_ID/هوية 1.png")
+        Tenant.objects.filter(id=self.tenant.id).update(id_image="tenants_ID/هوية 1.png")
+
+        with self.settings(MEDIA_SENDFILE_BACKEND="nginx"):
+            response = self.get_media("tenants_ID/هوية 1.png")
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX
+            + "tenants_ID/%D9%87%D9%88%D9%8A%D8%A9%201.png",
+        )
+
+        with self.settings(MEDIA_SENDFILE_BACKEND="apache"):
+            response = self.get_media("tenants_ID/هوية 1.png")
+        self.assertTrue(
+            response["X-Sendfile"].endswith("/tenants_ID/%D9%87%D9%88%D9%8A%D8%A9%201.png")
+        )
+
+
+class ChunkedUploadTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.property, self.tenant, self.rental = create_landlord("uploader")
+        self.client.force_login(self.user)
+
+    def start_upload(self, size):
+        response = self.client.post(
+            reverse("start_upload"), {"filename": "lease.pdf", "size": size}
+        )
+        self.assertEqual(response.status_code, 201)
+        return ChunkedUpload.objects.get(id=response.json()["id"])
+
+    def put_chunk(self, upload, data, start, total, **headers):
+        return self.client.put(
+            reverse("upload_chunk", args=[upload.id]),
+            data,
+            content_type="application/octet-stream",
+            headers={
+                "Content-Range": f"bytes {start}-{start + len(data) - 1}/{total}",
+                **headers,
+            },
+        )
+
+    def test_parse_content_range(self):
+        self.assertEqual(parse_content_range("bytes 0-1048575/5242880"), (0, 1048575, 5242880))
+        self.assertEqual(parse_content_range(" bytes 9-9/10 "), (9, 9, 10))
+
+        for header in (None, "", "bytes 0-9", "bytes 5-4/10", "bytes 0-10/10", "items 0-1/2"):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                parse_content_range(header)
+
+    def test_chunks_are_written_in_order(self):
+        upload = self.start_upload(10)
+
+        self.assertEqual(self.put_chunk(upload, b"56789", 5, 10).status_code, 409)
+        self.assertEqual(self.put_chunk(upload, b"01234", 0, 11).status_code, 409)
+        self.assertEqual(
+            self.put_chunk(upload, b"01234", 0, 10, x_chunk_sha256="0" * 64).status_code, 400
+        )
+
+        response = self.put_chunk(
+            upload, b"01234", 0, 10, x_chunk_sha256=hashlib.sha256(b"01234").hexdigest()
+        )
+        self.assertEqual(response.json()["offset"], 5)
+        response = self.put_chunk(upload, b"56789", 5, 10)
+        self.assertEqual(response.json()["status"], "complete")
+
+        with open(get_partial_path(upload), "rb") as f:
+            self.assertEqual(f.read(), b"0123456789")
+
+    def test_upload_of_another_user_is_not_found(self):
+        upload = self.start_upload(10)
+        other, *_ = create_landlord("stranger")
+        self.client.force_login(other)
+
+        self.assertEqual(self.put_chunk(upload, b"01234", 0, 10).status_code, 404)
+
+    def test_rental_is_not_saved_with_an_incomplete_upload(self):
+        upload = self.start_upload(10)
+        property = Property.objects.create(
+            user=self.user, name="House", country="SD", city="Khartoum", address="Street 2"
+        )
+
+        response = self.client.post(
+            reverse("rent_property", args=[property.id]),
+            {
+                "tenant_name": "new tenant",
+                "tenant_phone_number": "+249911111111",
+                "payment": "30",
+                "price": 500,
+                "start_date": "2026-01-01",
+                "end_date": "2026-02-01",
+                "status": "paid",
+                "contract_upload": str(upload.id),
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(RentProperty.objects.filter(property=property).exists())
+        self.assertFalse(Tenant.objects.filter(phone_number="+249911111111").exists())
+        property.refresh_from_db()
+        self.assertFalse(property.is_rented)
+
+    def test_abandoned_uploads_are_pruned(self):
+        abandoned = self.start_upload(10)
+        self.put_chunk(abandoned, b"01234", 0, 10)
+        ChunkedUpload.objects.filter(id=abandoned.id).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        recent = self.start_upload(10)
+
+        call_command("prune_history", stdout=open(os.devnull, "w"))
+
+        self.assertFalse(ChunkedUpload.objects.filter(id=abandoned.id).exists())
+        self.assertFalse(os.path.exists(get_partial_path(abandoned)))
+        self.assertTrue(ChunkedUpload.objects.filter(id=recent.id).exists())
+
+
+class NotificationsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.property, self.tenant, self.rental = create_landlord("notified")
+
+    def test_pages_do_not_repeat_or_skip(self):
+        now = timezone.now()
+        notifications = [
+            Notifications.objects.create(user=self.user, message=str(n)) for n in range(7)
+        ]
+        # rows with the same timestamp are ordered by id
+        Notifications.objects.filter(id__in=[n.id for n in notifications[:4]]).update(timestamp=now)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = get_notifications_page(self.user, cursor, limit=3)
+            seen += [notification.id for notification in page]
+            if not cursor:
+                break
+
+        self.assertCountEqual(seen, [n.id for n in Notifications.objects.filter(user=self.user)])
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_notification_is_created_once_per_period(self):
+        period = date(2026, 1, 1)
+        first = create_notification_once(self.user, self.property, "overdue", period, "Overdue")
+        second = create_notification_once(self.user, self.property, "overdue", period, "Overdue")
+
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(
+            Notifications.objects.filter(
+                property=self.property, kind="overdue", period=period
+            ).count(),
+            1,
+        )
+
+    def test_notification_insert_pins_the_request_to_the_primary(self):
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            create_notification_once(
+                self.user, self.property, "overdue", date(2026, 1, 1), "Overdue"
+            )
+        finally:
+            routing_state.reset(token)
+
+        self.assertTrue(state.wrote)
+
+    def test_notification_of_a_rental_still_overdue_is_not_pruned(self):
+        period = date(2025, 1, 1)
+        create_notification_once(self.user, self.property, "overdue", period, "Overdue")
+        Notifications.objects.filter(user=self.user).update(
+            is_read=True, timestamp=timezone.now() - timedelta(days=365)
+        )
+        RentProperty.objects.filter(id=self.rental.id).update(status="overdue")
+
+        call_command("prune_history", stdout=open(os.devnull, "w"))
+
+        self.assertTrue(Notifications.objects.filter(user=self.user).exists())
+        self.assertIsNone(
+            create_notification_once(self.user, self.property, "overdue", period, "Overdue")
+        )
+
+        RentProperty.objects.filter(id=self.rental.id).update(status="paid")
+        call_command("prune_history", stdout=open(os.devnull, "w"))
+
+        self.assertFalse(Notifications.objects.filter(user=self.user).exists())
+
+
+class SyncCursorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.property, self.tenant, self.rental = create_landlord("sync")
+        self.client.force_login(self.user)
+
+    def test_cursor_round_trip(self):
+        changed_at = timezone.now().replace(microsecond=123456)
+        cursor = encode_sync_cursor(changed_at, 2, 42)
+
+        self.assertEqual(decode_sync_cursor(cursor), (changed_at, 2, 42))
+
+    def test_malformed_cursors_raise_value_error(self):
+        for cursor in (
+            "",
+            "abc",
+            "1-2",
+            "99999999999999999999-1-1",
+            "1-1-99999999999999999999",
+            "1-1--5",
+        ):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_sync_cursor(cursor)
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        response = self.client.get(reverse("api_sync"), {"since": "99999999999999999999-1-1"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_expired_cursor(self):
+        changed_at = timezone.now() - timedelta(days=365)
+
+        with self.settings(SYNC_TOMBSTONE_TTL_DAYS=90):
+            with self.assertRaises(SyncCursorExpired):
+                get_sync_page(self.user, encode_sync_cursor(changed_at, 0, 1))
+
+            response = self.client.get(
+                reverse("api_sync"), {"since": encode_sync_cursor(changed_at, 0, 1)}
+            )
+        self.assertEqual(response.status_code, 410)
+
+    def test_pages_cover_changes_and_deletions_once(self):
+        extra = [
+            Property.objects.create(
+                user=self.user, name=f"Flat {n}", country="SD", city="Khartoum", address="Street"
+            )
+            for n in range(4)
+        ]
+        deleted_id = extra[0].id
+        extra[0].delete()
+        # changes younger than SYNC_SETTLE_SECONDS are left for the next sync
+        past = timezone.now() - timedelta(minutes=1)
+        Property.objects.filter(user=self.user).update(updated_at=past)
+        Tenant.objects.filter(landlord=self.user).update(updated_at=past)
+        RentProperty.objects.filter(property__user=self.user).update(updated_at=past)
+        Tombstone.objects.filter(user=self.user).update(timestamp=past)
+
+        properties, deleted, cursor = [], [], None
+        while True:
+            page = get_sync_page(self.user, cursor, limit=2)
+            properties += [row["id"] for row in page["changes"].get("properties", [])]
+            deleted += page["deleted"].get("properties", [])
+            cursor = page["next"]
+            if not page["more"]:
+                break
+
+        self.assertCountEqual(properties, [self.property.id] + [p.id for p in extra[1:]])
+        self.assertEqual(deleted, [deleted_id])
+
+        # nothing changed since the last cursor
+        page = get_sync_page(self.user, cursor)
+        self.assertEqual((page["changes"], page["deleted"]), ({}, {}))
+
+    def test_pruning_records_no_tombstones(self):
+        notification = Notifications.objects.create(
+            user=self.user, property=self.property, message="Paid", is_read=True
+        )
+        Notifications.objects.filter(id=notification.id).update(
+            timestamp=timezone.now() - timedelta(days=365)
+        )
+
+        call_command("prune_history", stdout=open(os.devnull, "w"))
+
+        self.assertFalse(Notifications.objects.filter(id=notification.id).exists())
+        self.assertFalse(
+            Tombstone.objects.filter(resource="notifications", object_id=notification.id).exists()
+        )
+
+
+class MetricsTests(TestCase):
+    def test_metrics_are_not_served_without_a_token(self):
+        with self.settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+    def test_metrics_require_the_token(self):
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+            self.assertEqual(
+                self.client.get(
+                    reverse("metrics"), headers={"Authorization": "Bearer wrong"}
+                ).status_code,
+                403,
+            )
+            response = self.client.get(
+                reverse("metrics"), headers={"Authorization": "Bearer secret"}
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, *_ = create_landlord("compressed")
+        self.client.force_login(self.user)
+
+    def test_compressed_pages_decode_and_vary_in_length(self):
+        for encoding, decompress in (("br", brotli.decompress), ("gzip", gzip.decompress)):
+            with self.subTest(encoding=encoding):
+                lengths = set()
+                for _ in range(10):
+                    response = self.client.get(
+                        reverse("all_properties"), headers={"Accept-Encoding": encoding}
+                    )
+                    self.assertEqual(response["Content-Encoding"], encoding)
+                    self.assertIn(b"property-card", decompress(response.content))
+                    lengths.add(len(response.content))
+                self.assertGreater(len(lengths), 1)
+
+    def test_streamed_text_is_compressed_chunk_by_chunk(self):
+        chunks = [b"line %d\n" % n * 50 for n in range(5)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks), content_type="text/csv")
+        )
+
+        for encoding, decompress in (("br", brotli.decompress), ("gzip", gzip.decompress)):
+            with self.subTest(encoding=encoding):
+                lengths = set()
+                for _ in range(10):
+                    request = RequestFactory().get("/", headers={"Accept-Encoding": encoding})
+                    response = middleware(request)
+                    self.assertEqual(response["Content-Encoding"], encoding)
+                    content = b"".join(response.streaming_content)
+                    self.assertEqual(decompress(content), b"".join(chunks))
+                    lengths.add(len(content))
+                self.assertGreater(len(lengths), 1)
+
+    def test_media_files_are_sent_as_they_are(self):
+        tenant = Tenant.objects.get(landlord=self.user)
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            os.makedirs(os.path.join(media_root, "tenants_ID"))
+            with open(os.path.join(media_root, "tenants_ID", "id.txt"), "wb") as f:
+                f.write(b"id " * 1000)
+            Tenant.objects.filter(id=tenant.id).update(id_image="tenants_ID/id.txt")
+
+            response = self.client.get(
+                reverse("protected_media", args=["tenants_ID/id.txt"]),
+                headers={"Accept-Encoding": "br, gzip", "Range": "bytes=0-9"},
+            )
+
+        self.assertEqual(response.status_code, 206)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class UpcomingPaymentsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.property, self.tenant, self.rental = create_landlord("upcoming")
+        # a rental that ended unpaid is overdue
+        RentProperty.objects.filter(id=self.rental.id).update(
+            status="pending",
+            start_date=date.today() - timedelta(days=60),
+            end_date=date.today() - timedelta(days=1),
+        )
+
+    def test_overdue_rental_is_updated(self):
+        upcoming = get_upcoming_payments(Property.objects.filter(id=self.property.id))
+
+        self.assertEqual([rental.id for rental in upcoming], [self.rental.id])
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, "overdue")
+
+    def test_status_changed_since_the_read_is_kept(self):
+        properties = list(
+            Property.objects.filter(id=self.property.id).prefetch_related("property_rentals")
+        )
+        # marked as paid after the rentals were read, e.g. from a replica that is behind
+        RentProperty.objects.filter(id=self.rental.id).update(status="paid")
+
+        upcoming = get_upcoming_payments(properties)
+
+        self.assertEqual(upcoming, [])
+        self.rental.refresh_from_db()
+        self.assertEqual(self.rental.status, "paid")
+
+
+class LiveEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("live", "live@example.com", "password")
+
+    def test_missed_events_are_replayed_in_order(self):
+        last_seq = get_event_seq(self.user.id)
+        seqs = [publish_event(self.user.id, "chart.updated", {"paid": n}) for n in range(3)]
+
+        self.assertEqual(seqs, [last_seq + 1, last_seq + 2, last_seq + 3])
+        seq, events = get_missed_events(self.user.id, last_seq + 1)
+        self.assertEqual(seq, last_seq + 3)
+        self.assertEqual(len(events), 2)
+        self.assertIn('"paid":1', events[0])
+
+        self.assertEqual(get_missed_events(self.user.id, seq), (seq, []))
+
+    def test_page_is_rendered_with_the_last_sequence_number(self):
+        publish_event(self.user.id, "chart.updated", {})
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("home"))
+
+        self.assertContains(response, f'data-event-seq="{get_event_seq(self.user.id)}"')
+
+    def test_client_resyncs_when_events_are_gone(self):
+        last_seq = get_event_seq(self.user.id)
+        publish_event(self.user.id, "chart.updated", {})
+        publish_event(self.user.id, "chart.updated", {})
+        cache.delete(f"ws_event_{self.user.id}_{last_seq + 1}")
+
+        self.assertIsNone(get_missed_events(self.user.id, last_seq)[1])
+
+        with self.settings(WS_REPLAY_BUFFER_SIZE=1):
+            publish_event(self.user.id, "chart.updated", {})
+            self.assertIsNone(get_missed_events(self.user.id, last_seq + 1)[1])
+
+
+
+class PresenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_events_of_offline_users_are_skipped(self):
+        _, property, *_ = create_landlord("offline")
+        last_seq = get_event_seq(property.user_id)
+
+        RecentActivity.objects.create(user=property.user, property=property, activity_type="add")
+
+        # the sequence number is used, so a client that missed it resyncs, but nothing is sent
+        self.assertEqual(get_event_seq(property.user_id), last_seq + 1)
+        self.assertIsNone(cache.get(get_event_key(property.user_id, last_seq + 1)))
+
+        mark_connected(property.user_id)
+        RecentActivity.objects.create(user=property.user, property=property, activity_type="add")
+
+        seq = get_event_seq(property.user_id)
+        self.assertIsNotNone(cache.get(get_event_key(property.user_id, seq)))
+
+    def test_shared_channel_layer_requires_a_shared_cache(self):
+        redis_layer = {"default": {"BACKEND": "channels_redis.core.RedisChannelLayer"}}
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+
+        with self.settings(CHANNEL_LAYERS=redis_layer, CACHES=locmem):
+            errors = check_live_events_cache(None)
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+        with self.settings(CHANNEL_LAYERS=redis_layer, CACHES=redis):
+            self.assertEqual(check_live_events_cache(None), [])
+        self.assertEqual(check_live_events_cache(None), [])
+
+
+class PrerenderedPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        pages_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pages_dir, ignore_errors=True)
+        settings_override = override_settings(PRERENDERED_PAGES_DIR=pages_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        read_prerendered_page.cache_clear()
+        self.addCleanup(read_prerendered_page.cache_clear)
+
+    def test_anonymous_users_get_the_prerendered_page(self):
+        # not built yet, the page is rendered and the miss is not cached
+        response = self.client.get(reverse("not_developed"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+
+        prerender_pages()
+
+        response = self.client.get(reverse("not_developed"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        response = self.client.get(
+            reverse("not_developed"), headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_users_get_a_rendered_page(self):
+        prerender_pages()
+        user, *_ = create_landlord("prerendered")
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("not_developed"))
+
+        self.assertFalse(response.has_header("ETag"))
+        self.assertContains(response, f'data-event-seq="{get_event_seq(user.id)}"')
+
+
+class LandlordConditionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.property, self.tenant, self.rental = create_landlord("conditional")
+        self.client.force_login(self.user)
+
+    def test_up_to_date_clients_get_a_not_modified(self):
+        response = self.client.get(reverse("all_properties"))
+        etag = response["ETag"]
+
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+        response = self.client.get(reverse("all_properties"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # the ETag also covers the URL
+        response = self.client.get(reverse("all_tenants"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_a_write_changes_the_validators(self):
+        response = self.client.get(reverse("all_properties"))
+        etag = response["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.name = "Renamed"
+            self.property.save()
+
+        response = self.client.get(reverse("all_properties"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "Renamed")
+
+
+class PropertyFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.property, self.tenant, self.rental = create_landlord("fragments")
+        self.client.force_login(self.user)
+
+    def test_a_write_drops_the_cached_fragment(self):
+        url = reverse("view_property", args=[self.property.id])
+        self.assertContains(self.client.get(url), "Street 1")
+
+        # an update sends no signal, the cached fragment is still rendered
+        Property.objects.filter(id=self.property.id).update(address="Street 9")
+        self.assertNotContains(self.client.get(url), "Street 9")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.address = "Street 9"
+            self.property.save()
+        self.assertContains(self.client.get(url), "Street 9")
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.property, self.tenant, self.rental = create_landlord("api")
+        self.client.force_login(self.user)
+
+    def get_api(self, name, **params):
+        return self.client.get(reverse("api_resource", args=[name]), params)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        for n in range(4):
+            Property.objects.create(
+                user=self.user, name=f"Flat {n}", country="SD", city="Khartoum", address="Street"
+            )
+        create_landlord("other api")
+
+        ids, after = [], None
+        while True:
+            page = self.get_api("properties", limit=2, **({"after": after} if after else {}))
+            ids += [row["id"] for row in page.json()["results"]]
+            after = page.json()["next"]
+            if not after:
+                break
+
+        self.assertEqual(
+            ids,
+            list(
+                Property.objects.filter(user=self.user)
+                .order_by("id")
+                .values_list("id", flat=True)
+            ),
+        )
+
+    def test_fields_select_the_columns(self):
+        page = self.get_api("properties", fields="city,name").json()
+
+        self.assertEqual(
+            page["results"], [{"id": self.property.id, "city": "Khartoum", "name": "Flat"}]
+        )
+
+    def test_invalid_parameters_are_bad_requests(self):
+        for params in (
+            {"fields": "name,password"},
+            {"limit": "0"},
+            {"after": "x"},
+            {"is_rented": "maybe"},
+        ):
+            with self.subTest(params=params):
+                response = self.get_api("properties", **params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+        self.assertEqual(self.get_api("users").status_code, 404)
+
+    def test_up_to_date_clients_get_a_not_modified(self):
+        for url in (
+            reverse("api_resource", args=["properties"]),
+            reverse("api_resource", args=["notifications"]),
+            reverse("api_summary"),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)["ETag"]
+                response = self.client.get(url, headers={"If-None-Match": etag})
+                self.assertEqual(response.status_code, 304)
+
+        etag = self.client.get(reverse("api_summary"))["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Property.objects.create(
+                user=self.user, name="House", country="SD", city="Khartoum", address="Street"
+            )
+        response = self.client.get(reverse("api_summary"), headers={"If-None-Match": etag})
+        self.assertEqual(response.json()["total_units"], 2)
+
+
+class FormattingTests(TestCase):
+    def test_numbers(self):
+        self.assertEqual(format_number(12500, "en"), "12,500")
+        self.assertEqual(format_number(1234.5, "en"), "1,234.5")
+        self.assertEqual(format_number(12500, "ar"), "12٬500")
+        self.assertEqual(format_number(1234.5, "ar"), "1٬234٫5")
+        self.assertEqual(format_numbers([1, 1000], "ar"), ["1", "1٬000"])
+
+    def test_currencies(self):
+        # whole amounts are written without decimals
+        self.assertEqual(format_currency(12500, "USD", "en"), "$12,500")
+        self.assertEqual(format_currency(Decimal("12500.5"), "SDG", "en"), "SDG12,500.50")
+        self.assertEqual(format_currency(12500, "USD", "ar"), "\u200f12٬500\xa0US$")
+        self.assertEqual(format_currency(Decimal("2.5"), "EUR", "ar"), "\u200f2٫50\xa0€")
+        # without a currency the amount is a number
+        self.assertEqual(format_currency(7, None, "ar"), "7")
+        self.assertEqual(
+            format_currencies([(1000, "USD"), (2.5, "EUR")], "en"), ["$1,000", "€2.50"]
+        )
+
+    def test_rental_prices_are_in_the_currency_of_their_property(self):
+        _, property, _, rental = create_landlord("formatted")
+        Property.objects.filter(id=property.id).update(currency="USD")
+        rentals = list(RentProperty.objects.select_related("property").filter(id=rental.id))
+
+        with translation.override("en"):
+            format_rental_prices(rentals)
+
+        self.assertEqual(rentals[0].formatted_price, "$1,000")
+
+
+class WarmUpTests(TestCase):
+    def test_templates_are_compiled(self):
+        names = find_templates()
+
+        result = warm_up()
+
+        self.assertEqual(result["templates"], len(names))
+        self.assertIn("includes/view_property.html", names)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertTrue(all(name in loader.get_template_cache for name in names))
+
+    def test_a_broken_template_does_not_stop_the_warm_up(self):
+        templates_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, templates_dir, ignore_errors=True)
+        for name, content in (("broken.html", "{% if %}"), ("fine.html", "{{ value }}")):
+            with open(os.path.join(templates_dir, name), "w") as f:
+                f.write(content)
+        templates = [{**settings.TEMPLATES[0], "DIRS": [templates_dir]}]
+
+        with self.settings(TEMPLATES=templates), self.assertLogs("core.warmup", "ERROR"):
+            result = warm_up()
+
+        self.assertEqual(result["templates"], 1)
+
+    def test_servers_warm_up_on_boot(self):
+        for module in ("Ejaraat.asgi", "Ejaraat.wsgi"):
+            with self.subTest(module=module):
+                with self.settings(WARMUP_ON_BOOT=True), self.assertLogs("core.warmup", "INFO"):
+                    importlib.reload(importlib.import_module(module))
+                with self.settings(WARMUP_ON_BOOT=False), self.assertNoLogs("core.warmup"):
+                    importlib.reload(importlib.import_module(module))
+
+
+class BuildStaticTests(TestCase):
+    def setUp(self):
+        build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, build_dir, ignore_errors=True)
+        source_dir = os.path.join(build_dir, "static")
+        os.makedirs(os.path.join(source_dir, "images"))
+        Image.new("RGB", (300, 150)).save(os.path.join(source_dir, "images", "wide.png"))
+        images_dir = os.path.join(build_dir, "static_build")
+
+        settings_override = override_settings(
+            STATICFILES_DIRS=[source_dir, images_dir],
+            RESPONSIVE_IMAGES_DIR=images_dir,
+            STATIC_ROOT=os.path.join(build_dir, "staticfiles"),
+            PRERENDERED_PAGES_DIR=os.path.join(build_dir, "prerendered"),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for cached in (get_responsive_images, read_prerendered_page):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+    def render_image(self):
+        return Template(
+            "{% load responsive_images %}"
+            '{% responsive_image "images/wide.png" sizes="50vw" alt="Wide" %}'
+        ).render(Context())
+
+    def test_build_static(self):
+        # without the variants the image is a plain <img>
+        self.assertEqual(self.render_image(), '<img src="/static/images/wide.png" alt="Wide">')
+
+        call_command("build_static", stdout=open(os.devnull, "w"), verbosity=0)
+
+        image = get_responsive_images()["images/wide.png"]
+        self.assertEqual((image["width"], image["height"]), (300, 150))
+        self.assertEqual(list(image["variants"]), list(get_supported_formats()))
+        self.assertEqual(
+            image["variants"]["webp"],
+            [
+                [80, "images/wide-80w.webp"],
+                [160, "images/wide-160w.webp"],
+                [200, "images/wide-200w.webp"],
+                [300, "images/wide-300w.webp"],
+            ],
+        )
+        collected = os.path.join(settings.STATIC_ROOT, "images", "wide-160w.webp")
+        with Image.open(collected) as variant:
+            self.assertEqual(variant.size, (160, 80))
+
+        self.assertTrue(
+            os.path.exists(os.path.join(settings.PRERENDERED_PAGES_DIR, "landing.ar.html"))
+        )
+
+        html = self.render_image()
+        self.assertIn(
+            '<source type="image/webp" srcset="/static/images/wide-80w.webp 80w, '
+            '/static/images/wide-160w.webp 160w, /static/images/wide-200w.webp 200w, '
+            '/static/images/wide-300w.webp 300w" sizes="50vw">',
+            html,
+        )
+        self.assertIn(
+            '<img src="/static/images/wide.png" alt="Wide" height="150" width="300">', html
+        )
+
+
+class DashboardTests(TransactionTestCase):
+    """
+    A TransactionTestCase, so the threads the panels are loaded in see the portfolio and
+    the panels are dropped when the change commits.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user, self.property, self.tenant, self.rental = create_landlord("dashboard")
+        self.client.force_login(self.user)
+
+    def get_panel(self, name):
+        return self.client.get(reverse("dashboard_panel", args=[name]))
+
+    def test_panel_is_cached_until_the_landlord_data_changes(self):
+        self.assertContains(self.get_panel("recent_tenants"), "Tenant")
+
+        # an update sends no signal, the cached panel is still served
+        Tenant.objects.filter(id=self.tenant.id).update(name="Renamed")
+        self.assertNotContains(self.get_panel("recent_tenants"), "Renamed")
+
+        self.tenant.name = "Renamed"
+        self.tenant.save()
+        self.assertContains(self.get_panel("recent_tenants"), "Renamed")
+
+    def test_unknown_panel_is_not_found(self):
+        self.assertEqual(self.get_panel("unknown").status_code, 404)
+
+    def test_portfolio_summary_counts(self):
+        today = date.today()
+        RentProperty.objects.filter(id=self.rental.id).update(
+            status="paid", end_date=today + timedelta(days=90)
+        )
+        Property.objects.create(
+            user=self.user, name="Empty", country="SD", city="Khartoum", address="Street 2"
+        )
+        for name, status, end_date in (
+            ("Overdue", "overdue", today + timedelta(days=10)),
+            ("Ended", "pending", today - timedelta(days=1)),
+        ):
+            property = Property.objects.create(
+                user=self.user, name=name, country="SD", city="Khartoum", address="Street 3"
+            )
+            RentProperty.objects.create(
+                property=property,
+                tenant=self.tenant,
+                payment="30",
+                price=500,
+                status=status,
+                end_date=end_date,
+            )
+        Property.objects.filter(user=self.user).exclude(name="Empty").update(is_rented=True)
+        # another landlord's portfolio is not counted
+        create_landlord("neighbour")
+
+        self.assertEqual(
+            get_portfolio_summary(self.user),
+            {
+                "available_units": 1,
+                "rented_units": 3,
+                "total_units": 4,
+                "paid": 1,
+                "pending": 1,
+                "overdue": 1,
+                "expiring_soon": 2,
+            },
+        )
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """
+    The query budgets of manage.py check_query_budgets, run with the tests.
+
+    A TransactionTestCase, so the threads the async views run their sections in see the
+    portfolios on their own connections.
+    """
+
+    def test_every_url_has_a_budget(self):
+        self.assertEqual(
+            [pattern.name for pattern in urlpatterns if pattern.name not in QUERY_BUDGETS], []
+        )
+
+    def test_views_are_within_their_query_budget(self):
+        command = CheckQueryBudgetsCommand()
+        names = [pattern.name for pattern in urlpatterns]
+        fixture = Path(settings.BASE_DIR) / "core" / "data" / "currency_rates.json"
+
+        with self.settings(CURRENCY_RATES_FIXTURE=str(fixture)):
+            small = command.run_all(names, 3, "small")
+            large = command.run_all(names, 30, "large")
+
+        for name in small:
+            with self.subTest(view=name):
+                self.assertEqual(get_budget_problems(name, small[name], large[name]), [])
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import ChunkedUpload, RentProperty
+from .utils import bump_landlord_version, bump_property_versions
+
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+READ_SIZE = 64 * 1024
+
+
+def get_partial_path(upload):
+    """
+    Get the path of the file an upload is being written to.
+
+    Args:
+        upload (ChunkedUpload): The upload.
+
+    Returns:
+        str: The absolute path of the partial file.
+    """
+    return os.path.join(settings.MEDIA_ROOT, "chunked_uploads", f"{upload.id}.part")
+
+
+def parse_content_range(header):
+    """
+    Parse the Content-Range header of a chunk.
+
+    Args:
+        header (str): The value of the Content-Range header, e.g. "bytes 0-1048575/5242880".
+
+    Returns:
+        tuple: A (start, end, total) tuple with an inclusive end.
+
+    Raises:
+        ValueError: If the header is missing or malformed.
+    """
+    match = CONTENT_RANGE_RE.match((header or "").strip())
+    if not match:
+        raise ValueError("Content-Range must look like 'bytes start-end/total'")
+
+    start, end, total = (int(value) for value in match.groups())
+    if start > end or end >= total:
+        raise ValueError("Content-Range is out of bounds")
+
+    return start, end, total
+
+
+def chain_checksum(checksum, chunk_digest):
+    """
+    Fold the digest of a chunk into the running checksum of an upload.
+
+    The checksum of an upload is sha256(previous checksum + chunk sha256) over
+    its chunks in order, so it can be kept up to date without re-reading the
+    file and verified by the client the same way.
+
+    Args:
+        checksum (str): The hex checksum of the chunks received so far.
+        chunk_digest (bytes): The raw sha256 digest of the new chunk.
+
+    Returns:
+        str: The new hex checksum.
+    """
+    return hashlib.sha256(bytes.fromhex(checksum) + chunk_digest).hexdigest()
+
+
+def write_chunk(upload, stream, start, length, expected_sha256=None):
+    """
+    Stream a chunk from the request body to the end of the partial file.
+
+    The chunk is read in 64KB blocks and hashed while it is written so memory
+    use does not depend on the chunk size. If the chunk is short or does not
+    match its expected hash the partial file is truncated back to its previous
+    size.
+
+    Args:
+        upload (ChunkedUpload): The upload, locked by the caller.
+        stream (file-like): The request body.
+        start (int): The offset the chunk starts at, equal to upload.offset.
+        length (int): The number of bytes in the chunk.
+        expected_sha256 (str, optional): The hex sha256 the client sent for the chunk.
+
+    Returns:
+        ChunkedUpload: The updated upload.
+
+    Raises:
+        ValueError: If the chunk is incomplete or its hash does not match.
+    """
+    path = get_partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    digest = hashlib.sha256()
+    received = 0
+
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        f.seek(start)
+        f.truncate()
+        while received < length:
+            block = stream.read(min(READ_SIZE, length - received))
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+            received += len(block)
+
+        if received != length:
+            f.truncate(start)
+            raise ValueError("Chunk is incomplete")
+
+        if expected_sha256 and expected_sha256.lower() != digest.hexdigest():
+            f.truncate(start)
+            raise ValueError("Chunk checksum does not match")
+
+    upload.offset = start + length
+    upload.checksum = chain_checksum(upload.checksum or "", digest.digest())
+    if upload.offset == upload.size:
+        upload.status = "complete"
+    upload.save(update_fields=["offset", "checksum", "status"])
+
+    return upload
+
+
+def get_complete_upload(user, upload_id):
+    """
+    Get a complete upload of a user before a rental is saved with it as its contract.
+
+    The upload is locked until the end of the caller's transaction, so it cannot be
+    attached twice.
+
+    Args:
+        user (User): The user who started the upload.
+        upload_id (str): The id of the upload.
+
+    Returns:
+        ChunkedUpload: The upload.
+
+    Raises:
+        ValueError: If the user has no such upload or it is not complete.
+    """
+    try:
+        upload = ChunkedUpload.objects.select_for_update().get(id=upload_id, user=user)
+    except (ChunkedUpload.DoesNotExist, ValidationError):
+        raise ValueError("Upload not found")
+
+    if upload.status != "complete":
+        raise ValueError("Upload is not complete")
+
+    return upload
+
+
+def attach_upload(upload, rental):
+    """
+    Move a complete upload into place as the contract of a rental.
+
+    The partial file is renamed into the contracts folder, so the data is not
+    read or copied again.
+
+    Args:
+        upload (ChunkedUpload): A complete upload.
+        rental (RentProperty): The rental to attach the contract to.
+
+    Returns:
+        str: The new file name of the contract relative to MEDIA_ROOT.
+
+    Raises:
+        ValueError: If the upload is not complete.
+    """
+    if upload.status != "complete":
+        raise ValueError("Upload is not complete")
+
+    name = default_storage.get_available_name(
+        os.path.join("contracts", get_valid_filename(upload.filename))
+    )
+    destination = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    os.replace(get_partial_path(upload), destination)
+
+    # update() instead of save() so attaching a file is not logged as an activity
+    RentProperty.objects.filter(id=rental.id).update(
+        contract=name, updated_at=timezone.now()
+    )
+    rental.contract.name = name
+    # update() sends no signal, the cached pages of the rental are marked as stale here
+    bump_landlord_version(upload.user_id)
+    bump_property_versions([rental.property_id])
+    upload.delete()
+
+    return name
+
+
+def delete_expired_uploads(before):
+    """
+    Delete the uploads started before a date that were never attached, with their partial files.
+
+    Args:
+        before (datetime): The uploads created before this are deleted.
+
+    Returns:
+        int: The number of uploads deleted.
+    """
+    expired = list(ChunkedUpload.objects.filter(created_at__lt=before))
+    for upload in expired:
+        try:
+            os.remove(get_partial_path(upload))
+        except FileNotFoundError:
+            pass
+
+    ChunkedUpload.objects.filter(id__in=[upload.id for upload in expired]).delete()
+    return len(expired)
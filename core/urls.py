@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path("", views.landing, name="landing"),
     path("home/", views.home, name="home"),
+    path("home/panels/<str:name>/", views.dashboard_panel, name="dashboard_panel"),
     path("add/", views.add_property, name="add_property"),
     path("rent_property/<int:pk>/", views.rent_property, name="rent_property"),
     path("edit_rental/<int:pk>/", views.edit_rental, name="edit_rental"),
@@ -12,10 +13,24 @@ urlpatterns = [
     path("delete_property/<int:pk>", views.delete_property, name="delete_property"),
     path("edit_property/<int:pk>", views.edit_property, name="edit_property"),
     path("view_property/<int:pk>", views.view_property, name="view_property"),
+    path("rent_history/<int:pk>", views.rent_history, name="rent_history"),
     path("mark_as_paid/<int:pk>", views.mark_as_paid, name="mark_as_paid"),
     path("empty_property/<int:pk>", views.empty_property, name="empty_property"),
     path("search_all_properties/", views.search_all_properties, name="search_all_properties"),
     path("not_developed/", views.not_developed, name="not_developed"),
     path("all_tenants/", views.all_tenants, name="all_tenants"),
     path("search_all_tenants/", views.search_all_tenants, name="search_all_tenants"),
+    path("notifications/", views.notifications_feed, name="notifications_feed"),
+    path("uploads/", views.start_upload, name="start_upload"),
+    path("uploads/<uuid:pk>/", views.upload_chunk, name="upload_chunk"),
+    path(
+        "uploads/<uuid:pk>/attach/<int:rental_pk>/",
+        views.attach_contract_upload,
+        name="attach_contract_upload",
+    ),
+    path("media/<path:path>", views.protected_media, name="protected_media"),
+    path("metrics", views.metrics, name="metrics"),
+    path("api/summary/", views.api_summary, name="api_summary"),
+    path("api/sync/", views.api_sync, name="api_sync"),
+    path("api/<str:name>/", views.api_resource, name="api_resource"),
 ]
@@ -1,11 +1,26 @@
-from datetime import date
+import asyncio
+from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 from datetime import timedelta
+from datetime import timezone as dt_timezone
+from functools import lru_cache, wraps
+import hashlib
+import json
 import os
-import requests
+import time
 
-from django.template.loader import get_template
-from django.db.models import Count
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .metrics import CURRENCY_RATES_CACHE
+from .profiling import timed
 
 
 def get_expiring_contracts(properties):
@@ -29,6 +44,43 @@ def get_expiring_contracts(properties):
     ]
 
 
+def set_rental_status(rental, status):
+    """
+    Move a rental to a new payment status, unless its status changed since it was read.
+
+    The rentals may have been read from a replica that is behind the primary, e.g. before
+    they were marked as paid. The current status is read again from the primary, locked,
+    and only the status is written.
+
+    Args:
+        rental (RentProperty): The rental, with the status it was read with.
+        status (str): The new status.
+
+    Returns:
+        RentProperty: The rental, with its new status or the current one.
+    """
+    from .models import RentProperty
+
+    with transaction.atomic():
+        # select_for_update always reads from the primary
+        current = (
+            RentProperty.objects.select_for_update()
+            .filter(id=rental.id)
+            .values_list("status", flat=True)
+            .first()
+        )
+        if current is None:
+            return rental
+        if current != rental.status:
+            rental.status = current
+            return rental
+
+        rental.status = status
+        rental.save(update_fields=["status", "updated_at"])
+
+    return rental
+
+
 def get_upcoming_payments(properties):
     """
     Retrieve a list of rentals with upcoming payments from a given list of properties.
@@ -57,14 +109,12 @@ def get_upcoming_payments(properties):
                     # Handle overdue payments
                     if today > due_date:
                         if rental.status != "overdue" and rental.status != "paid":
-                            rental.status = "overdue"
-                            rental.save()
+                            set_rental_status(rental, "overdue")
                         upcoming_payments.append(rental)
                     else:
                         # Handle pending payments due within 7 days
                         if rental.status != "pending" and rental.status != "paid":
-                            rental.status = "pending"
-                            rental.save()
+                            set_rental_status(rental, "pending")
                             upcoming_payments.append(rental)
 
                         # Always append rentals due within 7 days, regardless of status
@@ -76,8 +126,7 @@ def get_upcoming_payments(properties):
             else:
                 # Handle rentals with no more payments and unpaid/overdue status
                 if rental.status != "paid" and rental.status != "overdue":
-                    rental.status = "overdue"
-                    rental.save()
+                    set_rental_status(rental, "overdue")
                 upcoming_payments.append(rental)
 
                 if rental.status == "paid" and rental in upcoming_payments:
@@ -86,6 +135,95 @@ def get_upcoming_payments(properties):
     return upcoming_payments
 
 
+@lru_cache(maxsize=None)
+def load_currency_rates_fixture(path):
+    """
+    Load exchange rates from a JSON fixture instead of the exchange rate API.
+
+    The fixture maps each source currency code to its conversion rates, in the same shape
+    as the "conversion_rates" of the API response.
+
+    Args:
+        path (str): The path of the JSON fixture.
+
+    Returns:
+        dict: The conversion rates of each source currency.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def get_conversion_rates(from_currency):
+    """
+    Get the latest conversion rates of a currency.
+
+    The rates come from the exchange rate API and are cached for CURRENCY_RATES_CACHE_TTL
+    seconds, or from the CURRENCY_RATES_FIXTURE file when it is set so benchmarks and
+    offline environments do not need the network.
+
+    Args:
+        from_currency (str): The source currency code.
+
+    Returns:
+        dict | None: The conversion rates keyed by target currency code, None if they are not available.
+    """
+
+    if settings.CURRENCY_RATES_FIXTURE:
+        return load_currency_rates_fixture(settings.CURRENCY_RATES_FIXTURE).get(from_currency)
+
+    cache_key = f"conversion_rates_{from_currency}"
+    conversion_rates = cache.get(cache_key)
+    if conversion_rates is not None:
+        CURRENCY_RATES_CACHE.inc(result="hit")
+        return conversion_rates
+    CURRENCY_RATES_CACHE.inc(result="miss")
+
+    # requests is slow to import and only needed on a cache miss
+    import requests
+
+    with timed("http"):
+        response = requests.get(get_conversion_rates_url(from_currency))
+        data = response.json()
+
+    if response.status_code == 200:
+        cache.set(cache_key, data["conversion_rates"], settings.CURRENCY_RATES_CACHE_TTL)
+        return data["conversion_rates"]
+
+
+async def aget_conversion_rates(from_currency, client):
+    """
+    Get the latest conversion rates of a currency, like get_conversion_rates, without blocking.
+
+    Args:
+        from_currency (str): The source currency code.
+        client (httpx.AsyncClient): The HTTP client the API is called with.
+
+    Returns:
+        dict | None: The conversion rates keyed by target currency code, None if they are not available.
+    """
+    if settings.CURRENCY_RATES_FIXTURE:
+        return load_currency_rates_fixture(settings.CURRENCY_RATES_FIXTURE).get(from_currency)
+
+    cache_key = f"conversion_rates_{from_currency}"
+    conversion_rates = await cache.aget(cache_key)
+    if conversion_rates is not None:
+        CURRENCY_RATES_CACHE.inc(result="hit")
+        return conversion_rates
+    CURRENCY_RATES_CACHE.inc(result="miss")
+
+    with timed("http"):
+        response = await client.get(get_conversion_rates_url(from_currency))
+
+    if response.status_code == 200:
+        conversion_rates = response.json()["conversion_rates"]
+        await cache.aset(cache_key, conversion_rates, settings.CURRENCY_RATES_CACHE_TTL)
+        return conversion_rates
+
+
+def get_conversion_rates_url(from_currency):
+    return f"https://v6.exchangerate-api.com/v6/{os.getenv('CURRENCY_CONVERTER_API')}/latest/{from_currency}"
+
+
 def convert_currency(amount, from_currency, to_currency="USD"):
     """
     Convert an amount from one currency to another using the exchange rate API.
@@ -105,13 +243,11 @@ def convert_currency(amount, from_currency, to_currency="USD"):
         ValueError: If the conversion rate for the target currency is not found.
     """
 
-    url = f"https://v6.exchangerate-api.com/v6/{os.getenv('CURRENCY_CONVERTER_API')}/latest/{from_currency}"
-    response = requests.get(url)
-    data = response.json()
+    conversion_rates = get_conversion_rates(from_currency)
 
-    if response.status_code == 200:
-        if to_currency in data["conversion_rates"]:
-            rate = data["conversion_rates"][to_currency]
+    if conversion_rates is not None:
+        if to_currency in conversion_rates:
+            rate = conversion_rates[to_currency]
             return amount * rate
         else:
             raise ValueError(f"conversion rate for {to_currency} not found")
@@ -132,22 +268,12 @@ def get_monthly_revenue(properties):
         float: The total monthly revenue for the given properties.
     """
     today = date.today()
-    temp = 0
     monthly_revenue = 0
 
     for property in properties:
         for rental in property.property_rentals.all():
             if rental.start_date <= today and rental.end_date >= today:
-
-                rental_payment = int(rental.payment)
-                if rental_payment == 1:
-                    temp = rental.price * 30
-                elif rental_payment == 7:
-                    temp = rental.price * 4
-                elif rental_payment == 30:
-                    temp = rental.price
-                elif rental_payment == 365:
-                    temp = rental.price / 12
+                temp = get_monthly_price(rental)
 
                 try:
                     converted_price = convert_currency(
@@ -161,29 +287,333 @@ def get_monthly_revenue(properties):
     return monthly_revenue
 
 
+async def aget_monthly_revenue(properties):
+    """
+    Calculate the total monthly revenue for a given list of properties, like get_monthly_revenue.
+
+    The exchange rates of all the currencies are fetched concurrently with an async HTTP client
+    instead of one blocking request per rental.
+
+    Args:
+        properties (list): Property instances with their property_rentals prefetched.
+
+    Returns:
+        float: The total monthly revenue for the given properties.
+    """
+    today = date.today()
+    rentals = [
+        rental
+        for property in properties
+        for rental in property.property_rentals.all()
+        if rental.start_date <= today and rental.end_date >= today
+    ]
+    currencies = list({rental.property.currency for rental in rentals})
+
+    # httpx is slow to import and only needed by the revenue panel
+    import httpx
+
+    async with httpx.AsyncClient(timeout=10) as client:
+        results = await asyncio.gather(
+            *(aget_conversion_rates(currency, client) for currency in currencies),
+            return_exceptions=True,
+        )
+    rates = {
+        currency: result if isinstance(result, dict) else {}
+        for currency, result in zip(currencies, results)
+    }
+
+    monthly_revenue = 0
+    for rental in rentals:
+        temp = get_monthly_price(rental)
+        rate = rates[rental.property.currency].get("USD")
+        monthly_revenue += temp * rate if rate else temp
+
+    return monthly_revenue
+
+
+def get_monthly_price(rental):
+    """
+    Get the price of a rental for one month.
+
+    Args:
+        rental (RentProperty): The rental.
+
+    Returns:
+        float: The price of the rental for one month, in the currency of its property.
+    """
+    rental_payment = int(rental.payment)
+    if rental_payment == 1:
+        return rental.price * 30
+    elif rental_payment == 7:
+        return rental.price * 4
+    elif rental_payment == 30:
+        return rental.price
+    elif rental_payment == 365:
+        return rental.price / 12
+    return 0
+
+
+def sync_to_thread(func, *args, **kwargs):
+    """
+    Run a sync function, e.g. one that queries the database, in a worker thread of its own.
+
+    Unlike the async ORM methods, which all share the one thread of the request, each call
+    gets its own thread and database connection so several calls run concurrently.
+
+    Args:
+        func (callable): The sync function.
+        *args: The positional arguments of the function.
+        **kwargs: The keyword arguments of the function.
+
+    Returns:
+        coroutine: Awaits the result of the function.
+    """
+
+    def run():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # the thread is not part of the request, close its connection like the request would
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+def get_unread_count_key(user_id):
+    """
+    Get the cache key of the unread notifications counter of a user.
+
+    Args:
+        user_id (int): The id of the user.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"unread_notifications_{user_id}"
+
+
+def get_unread_notifications_count(user):
+    """
+    Get the number of unread notifications for a given user.
+
+    The counter is kept in the cache and only counted from the database when it is missing.
+
+    Args:
+        user (User): The user whose notifications are counted.
+
+    Returns:
+        int: The number of unread notifications.
+    """
+    from .models import Notifications
+
+    key = get_unread_count_key(user.id)
+    count = cache.get(key)
+
+    if count is None:
+        count = Notifications.objects.filter(user=user, is_read=False).count()
+        cache.set(key, count, None)
+
+    return count
+
+
+def increment_unread_notifications_count(user_id):
+    """
+    Increment the unread notifications counter of a user once the transaction commits.
+
+    Args:
+        user_id (int): The id of the user.
+    """
+
+    def increment():
+        try:
+            cache.incr(get_unread_count_key(user_id))
+        except ValueError:
+            # not cached yet, it will be counted on the next read
+            pass
+
+    transaction.on_commit(increment)
+
+
+def reset_unread_notifications_count(user_id, count=None):
+    """
+    Set or drop the unread notifications counter of a user once the transaction commits.
+
+    Args:
+        user_id (int): The id of the user.
+        count (int, optional): The new value. The counter is dropped when None.
+    """
+    key = get_unread_count_key(user_id)
+
+    if count is None:
+        transaction.on_commit(lambda: cache.delete(key))
+    else:
+        transaction.on_commit(lambda: cache.set(key, count, None))
+
+
 def clear_notification_service(user):
     """
     Clear the notifications for a given user.
 
-    This function marks all unread notifications for a given user as read and returns the updated
-    notifications HTML.
+    This function marks all unread notifications for a given user as read in a single update
+    and resets the unread counter.
 
     Args:
         user (User): The user whose notifications are to be cleared.
 
     Returns:
-        str: The updated notifications HTML.
+        int: The number of notifications that were marked as read.
     """
 
     from .models import Notifications
 
-    Notifications.objects.filter(user=user).update(is_read=True)
-    notifications = Notifications.objects.filter(user=user, is_read=False)
-    notifications_html = get_template("includes/notifications.html").render(
-        context={"notifications": notifications}
+    cleared = Notifications.objects.filter(user=user, is_read=False).update(
+        is_read=True, updated_at=timezone.now()
     )
+    reset_unread_notifications_count(user.id, 0)
+
+    return cleared
+
+
+def encode_cursor(instance):
+    """
+    Encode the keyset cursor of an instance ordered by (-timestamp, -id).
+
+    Args:
+        instance (Model): An instance with a timestamp field.
+
+    Returns:
+        str: The cursor, "<microseconds since epoch>-<id>".
+    """
+    timestamp = int(instance.timestamp.timestamp() * 1_000_000)
+    return f"{timestamp}-{instance.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Decode a keyset cursor created by encode_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The (timestamp, id) of the last row of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    timestamp, id = cursor.split("-", 1)
+    timestamp = datetime.fromtimestamp(int(timestamp) / 1_000_000, tz=dt_timezone.utc)
+    return timestamp, int(id)
+
+
+def get_notifications_page(user, cursor=None, unread_only=False, limit=None):
+    """
+    Retrieve a page of notifications for a given user with keyset pagination.
+
+    Pages are ordered from the newest to the oldest notification and each page
+    starts after the cursor of the previous one, so the cost of a page does not
+    grow with how far back the user scrolls.
+
+    Args:
+        user (User): The user whose notifications are retrieved.
+        cursor (str, optional): The cursor returned with the previous page.
+        unread_only (bool, optional): Only return unread notifications. Defaults to False.
+        limit (int, optional): The page size. Defaults to NOTIFICATIONS_PAGE_SIZE.
 
-    return notifications_html
+    Returns:
+        tuple: The list of notifications and the cursor of the next page, or None on the last page.
+    """
+    from .models import Notifications
+
+    limit = limit or settings.NOTIFICATIONS_PAGE_SIZE
+    notifications = Notifications.objects.filter(user=user).select_related("property")
+
+    if unread_only:
+        notifications = notifications.filter(is_read=False)
+
+    if cursor:
+        timestamp, id = decode_cursor(cursor)
+        notifications = notifications.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=id)
+        )
+
+    notifications = list(notifications.order_by("-timestamp", "-id")[: limit + 1])
+    next_cursor = None
+
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        next_cursor = encode_cursor(notifications[-1])
+
+    return notifications, next_cursor
+
+
+def encode_history_cursor(history):
+    """
+    Encode the keyset cursor of a rent history ordered by (-end_date, -id).
+
+    Args:
+        history (RentHistory): A rent history.
+
+    Returns:
+        str: The cursor, "<end date>_<id>".
+    """
+    return f"{history.end_date.isoformat()}_{history.id}"
+
+
+def decode_history_cursor(cursor):
+    """
+    Decode a keyset cursor created by encode_history_cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The (end_date, id) of the last row of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    end_date, id = cursor.split("_", 1)
+    return date.fromisoformat(end_date), int(id)
+
+
+def get_rent_history_page(property_id, cursor=None, limit=None):
+    """
+    Retrieve a page of the rent history of a property with keyset pagination.
+
+    Pages are ordered from the latest to the oldest end date, each page starts after
+    the cursor of the previous one.
+
+    Args:
+        property_id (int): The id of the property.
+        cursor (str, optional): The cursor returned with the previous page.
+        limit (int, optional): The page size. Defaults to RENT_HISTORY_PAGE_SIZE.
+
+    Returns:
+        tuple: The list of rent histories and the cursor of the next page, or None on the last page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    from .models import RentHistory
+
+    limit = limit or settings.RENT_HISTORY_PAGE_SIZE
+    histories = RentHistory.objects.filter(property_id=property_id).select_related("tenant")
+
+    if cursor:
+        end_date, id = decode_history_cursor(cursor)
+        histories = histories.filter(
+            Q(end_date__lt=end_date) | Q(end_date=end_date, id__lt=id)
+        )
+
+    histories = list(histories.order_by("-end_date", "-id")[: limit + 1])
+    next_cursor = None
+
+    if len(histories) > limit:
+        histories = histories[:limit]
+        next_cursor = encode_history_cursor(histories[-1])
+
+    return histories, next_cursor
 
 
 def get_next_payment(payment, start_date, end_date):
@@ -223,46 +653,308 @@ def get_next_payment(payment, start_date, end_date):
     return current_payment_date, days_until_next_payment
 
 
+def get_payment_period_start(payment, start_date, end_date):
+    """
+    Get the due date of the current payment period.
+
+    This function walks the payment dates from the start of the rental contract the same way
+    get_next_payment does and returns the last one that is not in the future.
+
+    Args:
+        payment (int): The payment interval in days.
+        start_date (date): The start date of the rental contract.
+        end_date (date): The end date of the rental contract.
+
+    Returns:
+        date: The due date of the current payment period.
+    """
+
+    interval_days = int(payment)
+    today = date.today()
+    period_start = start_date
+    current_payment_date = start_date
+
+    while current_payment_date <= today and current_payment_date < end_date:
+        period_start = current_payment_date
+        if interval_days == 365:
+            current_payment_date += relativedelta(years=1)
+        elif interval_days == 30:
+            current_payment_date += relativedelta(months=1)
+        else:
+            current_payment_date += timedelta(days=interval_days)
+
+    return period_start
+
+
+def create_notification_once(user, property, kind, period, message):
+    """
+    Create a notification unless one already exists for the same property, kind and period.
+
+    The row is written with INSERT ... ON CONFLICT DO NOTHING against the
+    unique_notification_per_period constraint, so a repeated event costs a single
+    statement and no second row, even when two workers race.
+
+    Args:
+        user (User): The user to notify.
+        property (Property): The property the notification is about.
+        kind (str): The kind of notification, one of Notifications.KIND_OPTIONS.
+        period (date): The payment period the notification is about.
+        message (str): The notification message.
+
+    Returns:
+        Notifications | None: The new notification, or None if it already existed.
+    """
+    from .models import Notifications
+
+    now = timezone.now()
+    # the raw insert does not run the auto_now and auto_now_add fields
+    notification = Notifications(
+        user=user,
+        property=property,
+        message=message,
+        kind=kind,
+        period=period,
+        timestamp=now,
+        updated_at=now,
+    )
+
+    # the raw insert does not go through the ORM, ask the router for the primary so the
+    # request is pinned to it like any other write
+    db = connections[router.db_for_write(Notifications)]
+    fields = [
+        field
+        for field in Notifications._meta.concrete_fields
+        if not field.primary_key
+    ]
+    columns = ", ".join(db.ops.quote_name(field.column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    conflict = ", ".join(
+        db.ops.quote_name(Notifications._meta.get_field(name).column)
+        for name in ("user", "property", "kind", "period")
+    )
+    params = [
+        field.get_db_prep_save(getattr(notification, field.attname), db)
+        for field in fields
+    ]
+
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {db.ops.quote_name(Notifications._meta.db_table)} "
+            f"({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({conflict}) DO NOTHING RETURNING id",
+            params,
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    notification.id = row[0]
+    notification._state.adding = False
+    # the raw insert does not send post_save, keep the unread counter in step
+    increment_unread_notifications_count(user.id)
+
+    return notification
+
+
+def get_portfolio_summary(user):
+    """
+    Get the summary numbers of a landlord's portfolio in a single query.
+
+    The properties are joined with their rentals once and every number is a conditional
+    aggregate of the same rows. The dashboard and the API share it.
+
+    Args:
+        user (User): The landlord.
+
+    Returns:
+        dict: The available, rented and total units, the paid, pending and overdue
+            rentals, and the rentals whose contract ends in the next 30 days or has ended.
+    """
+    from .models import Property
+
+    # the window of RentProperty.expiring_contracts
+    expiring_before = date.today() + timedelta(days=30)
+
+    return Property.objects.filter(user=user).aggregate(
+        available_units=Count("id", filter=Q(is_rented=False), distinct=True),
+        rented_units=Count("id", filter=Q(is_rented=True), distinct=True),
+        total_units=Count("id", distinct=True),
+        paid=Count("property_rentals", filter=Q(property_rentals__status="paid")),
+        pending=Count("property_rentals", filter=Q(property_rentals__status="pending")),
+        overdue=Count("property_rentals", filter=Q(property_rentals__status="overdue")),
+        expiring_soon=Count(
+            "property_rentals", filter=Q(property_rentals__end_date__lte=expiring_before)
+        ),
+    )
+
+
 def get_payment_status_chart(user):
     """
     Retrieve the payment status counts for a given user's properties.
 
-    This function queries the database to get the count of payments with different statuses
-    (paid, pending, overdue) for a given user's properties.
-
     Args:
         user (User): The user whose payment status counts are to be retrieved.
 
     Returns:
         dict: A dictionary containing the counts of payments with different statuses.
     """
-    from .models import RentProperty
+    summary = get_portfolio_summary(user)
+
+    return {
+        "paid": summary["paid"],
+        "pending": summary["pending"],
+        "overdue": summary["overdue"],
+    }
+
+
+def get_landlord_version_key(user_id):
+    """
+    Get the cache key of the data version of a landlord.
+
+    Args:
+        user_id (int): The id of the landlord.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"landlord_version_{user_id}"
+
+
+def get_landlord_version(user_id):
+    """
+    Get the data version of a landlord, the time their properties, rentals, tenants or
+    rent history last changed.
+
+    A landlord without a version, e.g. after a cache restart, gets the current time so
+    whatever the clients have is considered stale once.
 
-    payment_status_counts = (
-        RentProperty.objects.filter(property__user=user)
-        .values("status")
-        .annotate(count=Count("status"))
+    Args:
+        user_id (int): The id of the landlord.
+
+    Returns:
+        float: The version, a UNIX timestamp.
+    """
+    key = get_landlord_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_landlord_version(user_id):
+    key = get_landlord_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_landlord_version(user_id):
+    """
+    Move the data version of a landlord to now once the current transaction is committed.
+
+    Args:
+        user_id (int): The id of the landlord.
+    """
+    transaction.on_commit(
+        lambda: cache.set(get_landlord_version_key(user_id), time.time(), None)
     )
 
-    # Prepare the data for the chart
-    data = {
-        "paid": 0,
-        "pending": 0,
-        "overdue": 0,
-    }
 
-    # Populate the data dictionary based on query results
-    for entry in payment_status_counts:
-        if entry["status"] == "paid":
-            data["paid"] = entry["count"]
-        elif entry["status"] == "pending":
-            data["pending"] = entry["count"]
-        elif entry["status"] == "overdue":
-            data["overdue"] = entry["count"]
+def get_property_version_key(property_id):
+    return f"property_version_{property_id}"
 
-    # Pass the data to the frontend
-    return {
-        "paid": data["paid"],
-        "pending": data["pending"],
-        "overdue": data["overdue"],
-    }
+
+def get_property_version(property_id):
+    """
+    Get the data version of a property, the time its details, its rental or its rent
+    history last changed. The cached fragments of the property are keyed by it.
+
+    Args:
+        property_id (int): The id of the property.
+
+    Returns:
+        float: The version, a UNIX timestamp.
+    """
+    key = get_property_version_key(property_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_property_versions(property_ids):
+    """
+    Move the data version of properties to now once the current transaction is committed.
+
+    Args:
+        property_ids (iterable): The ids of the properties.
+    """
+    keys = [get_property_version_key(property_id) for property_id in property_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time()), None))
+
+
+def landlord_conditional(view):
+    """
+    Decorator for views that only show the data of the current landlord.
+
+    It derives a weak ETag and a Last-Modified date from the landlord's data version, and
+    answers conditional GETs from clients that are up to date with a 304 before the view
+    runs, so the main tables are not queried. The ETag also covers the URL, the language
+    and the date, since the views show due dates relative to today.
+
+    Args:
+        view (callable): The view, sync or async, behind login_required.
+
+    Returns:
+        callable: The decorated view.
+    """
+
+    def get_validators(request, user_id, version):
+        key = f"{user_id}:{version}:{get_language()}:{date.today()}:{request.get_full_path()}"
+        etag = f'W/"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+        return etag, int(version)
+
+    def finish(request, response, etag, last_modified):
+        if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+            response.headers.setdefault("ETag", etag)
+            response.headers.setdefault("Last-Modified", http_date(last_modified))
+        # revalidate every time, the response is only fresh until the next change
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    if iscoroutinefunction(view):
+
+        async def wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            version = await aget_landlord_version(user.id)
+            etag, last_modified = get_validators(request, user.id, version)
+            request.landlord_version = version
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return finish(request, response, etag, last_modified)
+
+    else:
+
+        def wrapper(request, *args, **kwargs):
+            version = get_landlord_version(request.user.id)
+            etag, last_modified = get_validators(request, request.user.id, version)
+            request.landlord_version = version
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return finish(request, response, etag, last_modified)
+
+    return wraps(view)(wrapper)
@@ -1,16 +1,42 @@
+import asyncio
 from datetime import datetime
 
+from asgiref.sync import sync_to_async
+
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import render, redirect
 from django.shortcuts import get_object_or_404
-from django.utils.translation import gettext as _
-from django.http import JsonResponse
+from django.utils.translation import get_language, gettext as _
+from django.http import (
+    JsonResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+)
 from django.core.mail import send_mail
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
 from django.template.loader import render_to_string
 from django.conf import settings
 
+from .api import API_RESOURCES, json_response, serve_api_page
+from .dashboard import PANELS, get_panel_cache_key, render_panel
+from .formatting import format_rental_prices
 from .forms import PropertyForm, RentPropertyForm
+from .media import serve_media, user_can_access_media
+from .metrics import registry, track_mail
+from .prerender import serve_prerendered
+from .profiling import timed
+from .routers import read_from_replicas
+from .sync import SyncCursorExpired, get_sync_page
+from .uploads import (
+    attach_upload,
+    get_complete_upload,
+    parse_content_range,
+    write_chunk,
+)
 from .models import *
 from .utils import *
 
@@ -23,19 +49,25 @@ def landing(request):
         request (HttpRequest): The HTTP request object.
 
     Returns:
-        HttpResponse: The rendered landing page.
+        HttpResponse: The landing page, pre-rendered by `manage.py build_static`.
     """
     if request.user.is_authenticated:
         return redirect("home")
 
-    return render(request, "core/landing.html")
+    return serve_prerendered(request, "landing")
 
 
 @login_required
-def home(request):
+@read_from_replicas
+async def home(request):
     """
-    This view renders the home page template with the user's available properties,
-    rented properties, and recent activities and notifications.
+    This view renders the home page template with the summary of the user's portfolio
+    and notifications.
+
+    The slower panels (revenue, payments, contracts, activities, chart and tenants) are
+    loaded afterwards by HTMX from the dashboard_panel view, so the page is sent as soon
+    as the overview is ready, and so are the property lists of the overview modals when
+    they are opened. The sections of the overview are loaded concurrently.
 
     Args:
         request (HttpRequest): The HTTP request object.
@@ -43,44 +75,51 @@ def home(request):
     Returns:
         HttpResponse: The rendered home page.
     """
-    available_properties = Property.objects.filter(
-        user=request.user, is_rented=False
-    ).order_by("created_at")
+    user = await request.auser()
+
+    (
+        portfolio_summary,
+        (notifications, next_cursor),
+        unread_notifications_count,
+    ) = await asyncio.gather(
+        sync_to_thread(get_portfolio_summary, user),
+        sync_to_thread(get_notifications_page, user, unread_only=True),
+        sync_to_thread(get_unread_notifications_count, user),
+    )
 
-    rented_properties = Property.objects.filter(
-        user=request.user, is_rented=True
-    ).order_by("property_rentals__end_date")
+    context = {
+        "portfolio_summary": portfolio_summary,
+        "notifications": notifications,
+        "next_cursor": next_cursor,
+        "unread_only": True,
+        "unread_notifications_count": unread_notifications_count,
+    }
 
-    recent_activities = (
-        RecentActivity.objects.filter(user=request.user)
-        .exclude(activity_type="overdue")
-        .order_by("-timestamp")[:10]
-    )
+    return await sync_to_async(render)(request, "core/home.html", context)
 
-    recent_tenant = RentProperty.objects.filter(
-        tenant__landlord=request.user, property__user=request.user
-    ).order_by("-start_date")[:5]
-    notifications = Notifications.objects.filter(user=request.user, is_read=False)
 
-    expiring_contracts = get_expiring_contracts(rented_properties)
-    upcoming_payments = get_upcoming_payments(rented_properties)
-    monthly_revenue = get_monthly_revenue(rented_properties)
+@login_required
+@landlord_conditional
+@read_from_replicas
+async def dashboard_panel(request, name):
+    """
+    This view renders one of the lazy loaded panels of the home page.
 
-    payment_status_counts = get_payment_status_chart(request.user)
+    Args:
+        request (HttpRequest): The HTTP request object.
+        name (str): The name of the panel, one of core.dashboard.PANELS.
 
-    context = {
-        "available_properties": available_properties,
-        "rented_properties": rented_properties,
-        "expiring_contracts": expiring_contracts,
-        "upcoming_payments": upcoming_payments,
-        "recent_activities": recent_activities,
-        "notifications": notifications,
-        "monthly_revenue": monthly_revenue,
-        "payment_status_counts": payment_status_counts,
-        "recent_tenants": recent_tenant,
-    }
+    Returns:
+        HttpResponse: The panel, cached for its own TTL.
+    """
+    if name not in PANELS:
+        raise Http404
 
-    return render(request, "core/home.html", context)
+    user = await request.auser()
+    response = HttpResponse(await render_panel(request, user, name))
+    # the panel is the same until its cache entry changes, it is only compressed once
+    response.compression_cache_key = get_panel_cache_key(name, user.id, get_language())
+    return response
 
 
 @login_required
@@ -134,6 +173,8 @@ def edit_property(request, pk):
 
 
 @login_required
+@landlord_conditional
+@read_from_replicas
 def view_property(request, pk):
     """
     This view display the details of a property.
@@ -145,19 +186,63 @@ def view_property(request, pk):
     Returns:
         HttpResponse: The details of the property.
     """
-    property = get_object_or_404(Property, id=pk)
-    rental_histories = RentHistory.objects.filter(property_id=pk)
+    property = get_object_or_404(Property, id=pk, user=request.user)
+
+    # the rental and the history are only loaded when their cached fragments are stale
+    def load_rent_history():
+        rental_histories, next_cursor = get_rent_history_page(property.id)
+        return {"rental_histories": rental_histories, "next_cursor": next_cursor}
 
-    context = {}
+    context = {
+        "property": property,
+        "property_version": get_property_version(property.id),
+        "fragment_timeout": settings.PROPERTY_FRAGMENT_TTL,
+        "rent_history": SimpleLazyObject(load_rent_history),
+    }
     if property.is_rented:
-        instance = get_object_or_404(RentProperty, property=property)
-        context["rent_property"] = instance
-    context["property"] = property
-    context["rental_histories"] = rental_histories
+        context["rent_property"] = SimpleLazyObject(
+            lambda: RentProperty.objects.select_related("tenant").get(property=property)
+        )
 
     return render(request, "includes/view_property.html", context)
 
 
+@login_required
+@landlord_conditional
+@read_from_replicas
+def rent_history(request, pk):
+    """
+    This view renders the next page of the rent history of a property.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the cursor of the last page in "after".
+        pk (int): The primary key of the property.
+
+    Returns:
+        HttpResponse: The rent history rows and the trigger to load the page after them.
+    """
+    property = get_object_or_404(Property, id=pk, user=request.user)
+    cursor = request.GET.get("after", "")
+
+    try:
+        decode_history_cursor(cursor)
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    def load_rent_history():
+        rental_histories, next_cursor = get_rent_history_page(property.id, cursor)
+        return {"rental_histories": rental_histories, "next_cursor": next_cursor}
+
+    context = {
+        "property": property,
+        "property_version": get_property_version(property.id),
+        "fragment_timeout": settings.PROPERTY_FRAGMENT_TTL,
+        "cursor": cursor,
+        "rent_history": SimpleLazyObject(load_rent_history),
+    }
+    return render(request, "includes/rent_history_feed.html", context)
+
+
 @login_required
 def delete_property(request, pk):
     """
@@ -173,7 +258,9 @@ def delete_property(request, pk):
     instance = get_object_or_404(Property, id=pk)
     instance.delete()
 
-    all_properties = Property.objects.filter(user=request.user)
+    all_properties = Property.objects.filter(user=request.user).prefetch_related(
+        "property_rentals"
+    )
     return render(
         request, "core/all_properties.html", {"all_properties": all_properties}
     )
@@ -203,34 +290,46 @@ def rent_property(request, pk):
             phone_number = form.cleaned_data.get("tenant_phone_number")
             try:
                 if phone_number.startswith("+"):
-                    tenant, created = Tenant.objects.get_or_create(
-                        landlord=request.user,
-                        name=name.title(),
-                        phone_number=phone_number,
-                        defaults={"id_image": form.cleaned_data.get("tenant_image")},
-                    )
-                    rent_property = form.save(commit=False)
-                    rent_property.property = instance
-                    rent_property.tenant = tenant
-                    instance.is_rented = True
-                    instance.save()
-                    rent_property.save()
-
-                    send_mail(
-                        _("Property Rented"),
-                        _("Your property has been rented"),
-                        settings.DEFAULT_FROM_EMAIL,
-                        [request.user.email],
-                        html_message=render_to_string(
-                            "email/new_rental.html",
-                            {
-                                "tenant": tenant,
-                                "property": instance,
-                                "rental": rent_property,
-                                "user": request.user,
-                            },
-                        ),
-                    )
+                    upload_id = request.POST.get("contract_upload")
+                    with transaction.atomic():
+                        # checked before anything is saved, so a bad upload leaves no rental behind
+                        upload = (
+                            get_complete_upload(request.user, upload_id)
+                            if upload_id
+                            else None
+                        )
+                        tenant, created = Tenant.objects.get_or_create(
+                            landlord=request.user,
+                            name=name.title(),
+                            phone_number=phone_number,
+                            defaults={"id_image": form.cleaned_data.get("tenant_image")},
+                        )
+                        rent_property = form.save(commit=False)
+                        rent_property.property = instance
+                        rent_property.tenant = tenant
+                        instance.is_rented = True
+                        instance.save()
+                        rent_property.save()
+
+                        if upload:
+                            attach_upload(upload, rent_property)
+
+                    with timed("mail"), track_mail():
+                        send_mail(
+                            _("Property Rented"),
+                            _("Your property has been rented"),
+                            settings.DEFAULT_FROM_EMAIL,
+                            [request.user.email],
+                            html_message=render_to_string(
+                                "email/new_rental.html",
+                                {
+                                    "tenant": tenant,
+                                    "property": instance,
+                                    "rental": rent_property,
+                                    "user": request.user,
+                                },
+                            ),
+                        )
                     return redirect("all_properties")
 
                 else:
@@ -280,12 +379,22 @@ def edit_rental(request, pk):
 
             try:
                 if phone_number.startswith("+"):
-                    tenant.landlord = request.user
-                    tenant.name = name
-                    tenant.phone_number = phone_number
-                    tenant.id_image = form.cleaned_data.get("tenant_image")
-                    tenant.save()
-                    form.save()
+                    upload_id = request.POST.get("contract_upload")
+                    with transaction.atomic():
+                        upload = (
+                            get_complete_upload(request.user, upload_id)
+                            if upload_id
+                            else None
+                        )
+                        tenant.landlord = request.user
+                        tenant.name = name
+                        tenant.phone_number = phone_number
+                        tenant.id_image = form.cleaned_data.get("tenant_image")
+                        tenant.save()
+                        form.save()
+
+                        if upload:
+                            attach_upload(upload, rental)
                     return redirect("view_property", pk=rental.property.id)
                 else:
                     raise ValueError(
@@ -307,6 +416,8 @@ def edit_rental(request, pk):
 
 
 @login_required
+@landlord_conditional
+@read_from_replicas
 def all_properties(request):
     """
     This view all properties owned by the user.
@@ -317,12 +428,16 @@ def all_properties(request):
     Returns:
         HttpResponse: The list of all properties owned by the user.
     """
-    my_properties = Property.objects.filter(user=request.user)
+    my_properties = Property.objects.filter(user=request.user).prefetch_related(
+        "property_rentals"
+    )
     context = {"all_properties": my_properties}
     return render(request, "core/all_properties.html", context)
 
 
 @login_required
+@landlord_conditional
+@read_from_replicas
 def search_all_properties(request):
     """
     This view search all properties owned by the user.
@@ -336,11 +451,16 @@ def search_all_properties(request):
     q = request.GET.get("q", None)
 
     if q:
-        Properties = Property.objects.filter(
-            Q(name__icontains=q) | Q(country__icontains=q)
-        ).distinct()
+        Properties = (
+            Property.objects.filter(user=request.user)
+            .filter(Q(name__icontains=q) | Q(country__icontains=q))
+            .prefetch_related("property_rentals")
+            .distinct()
+        )
     else:
-        Properties = Property.objects.all()
+        Properties = Property.objects.filter(user=request.user).prefetch_related(
+            "property_rentals"
+        )
         return render(
             request,
             "core/all_properties.html",
@@ -362,31 +482,36 @@ def mark_as_paid(request, pk):
     Returns:
         HttpResponse: The list of upcoming payments.
     """
-    instance = get_object_or_404(RentProperty, id=pk)
+    instance = get_object_or_404(
+        RentProperty.objects.select_related("tenant", "property"), id=pk
+    )
 
     if instance:
         instance.status = "paid"
         instance.save()
 
-        send_mail(
-            _("Payment Received"),
-            _("Your payment has been received"),
-            settings.DEFAULT_FROM_EMAIL,
-            [request.user.email],
-            html_message=render_to_string(
-                "email/payment_received.html",
-                {
-                    "tenant": instance.tenant,
-                    "property": instance.property,
-                    "rental": instance,
-                    "user": request.user,
-                },
-            ),
-        )
+        with timed("mail"), track_mail():
+            send_mail(
+                _("Payment Received"),
+                _("Your payment has been received"),
+                settings.DEFAULT_FROM_EMAIL,
+                [request.user.email],
+                html_message=render_to_string(
+                    "email/payment_received.html",
+                    {
+                        "tenant": instance.tenant,
+                        "property": instance.property,
+                        "rental": instance,
+                        "user": request.user,
+                    },
+                ),
+            )
 
-        rented_properties = Property.objects.filter(
-            user=request.user, is_rented=True
-        ).order_by("property_rentals__end_date")
+        rented_properties = (
+            Property.objects.filter(user=request.user, is_rented=True)
+            .order_by("property_rentals__end_date")
+            .prefetch_related("property_rentals__tenant")
+        )
         upcoming_payments = get_upcoming_payments(rented_properties)
         return render(
             request,
@@ -410,7 +535,7 @@ def empty_property(request, pk):
     rental = get_object_or_404(RentProperty, id=pk)
     property = rental.property
     tenant = rental.tenant
-    contract_url = rental.contract.url if rental.contract else None
+    contract_name = rental.contract.name if rental.contract else None
 
     property.is_rented = False
     property.save()
@@ -427,24 +552,25 @@ def empty_property(request, pk):
             if rental.end_date == datetime.today().date()
             else datetime.today().date()
         ),
-        contract=contract_url,
+        contract=contract_name,
     )
 
-    send_mail(
-        _("Property Vacated"),
-        _("Your tenant has vacated the property"),
-        settings.DEFAULT_FROM_EMAIL,
-        [request.user.email],
-        html_message=render_to_string(
-            "email/vacated_property.html",
-            {
-                "tenant": tenant,
-                "property": property,
-                "rental": rental,
-                "user": request.user,
-            },
-        ),
-    )
+    with timed("mail"), track_mail():
+        send_mail(
+            _("Property Vacated"),
+            _("Your tenant has vacated the property"),
+            settings.DEFAULT_FROM_EMAIL,
+            [request.user.email],
+            html_message=render_to_string(
+                "email/vacated_property.html",
+                {
+                    "tenant": tenant,
+                    "property": property,
+                    "rental": rental,
+                    "user": request.user,
+                },
+            ),
+        )
 
     rental.delete()
 
@@ -461,9 +587,12 @@ def not_developed(request):
     Returns:
         HttpResponse: The rendered not developed page.
     """
-    return render(request, "core/not_developed.html")
+    return serve_prerendered(request, "not_developed")
 
 
+@login_required
+@landlord_conditional
+@read_from_replicas
 def all_tenants(request):
     """
     This view renders the all tenants page.
@@ -474,11 +603,16 @@ def all_tenants(request):
     Returns:
         HttpResponse: The rendered all tenants page.
     """
-    properties = RentProperty.objects.filter(tenant__landlord=request.user)
-    context = {"all_tenants": properties}
+    properties = RentProperty.objects.filter(
+        tenant__landlord=request.user
+    ).select_related("tenant", "property")
+    context = {"all_tenants": format_rental_prices(list(properties))}
     return render(request, "core/all_tenants.html", context)
 
 
+@login_required
+@landlord_conditional
+@read_from_replicas
 def search_all_tenants(request):
     """
     This view search all tenants owned by the user.
@@ -498,14 +632,276 @@ def search_all_tenants(request):
                 Q(tenant__name__icontains=q)
                 | Q(property__name__icontains=q)
             )
+            .select_related("tenant", "property")
             .distinct()
         )
     else:
-        Tenants = RentProperty.objects.all()
+        Tenants = RentProperty.objects.filter(
+            tenant__landlord=request.user
+        ).select_related("tenant", "property")
         return render(
             request,
             "core/all_tenants.html",
-            {"all_tenants": Tenants},
+            {"all_tenants": format_rental_prices(list(Tenants))},
+        )
+
+    return render(
+        request,
+        "core/all_tenants.html",
+        {"all_tenants": format_rental_prices(list(Tenants))},
+    )
+
+
+@login_required
+def protected_media(request, path):
+    """
+    This view serves a tenant ID image or a contract to the landlord it belongs to.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        path (str): The file name relative to MEDIA_ROOT.
+
+    Returns:
+        HttpResponse: The file, or a 404 if it does not belong to the user.
+    """
+    if not user_can_access_media(request.user, path):
+        raise Http404
+
+    try:
+        return serve_media(request, path)
+    except FileNotFoundError:
+        raise Http404
+
+
+@login_required
+def start_upload(request):
+    """
+    This view starts a resumable upload of a contract scan.
+
+    Args:
+        request (HttpRequest): The HTTP request object with the file name and its size in bytes.
+
+    Returns:
+        JsonResponse: The upload id, the offset to send from and the maximum chunk size.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        return JsonResponse({"error": "size is required"}, status=400)
+
+    filename = request.POST.get("filename", "")
+    if not filename or size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        return JsonResponse({"error": "Invalid file name or size"}, status=400)
+
+    upload = ChunkedUpload.objects.create(user=request.user, filename=filename, size=size)
+
+    return JsonResponse(
+        {
+            "id": str(upload.id),
+            "offset": upload.offset,
+            "chunk_size": settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        },
+        status=201,
+    )
+
+
+@login_required
+def upload_chunk(request, pk):
+    """
+    This view receives the next chunk of a resumable upload, or reports how far it got.
+
+    A chunk is sent with PUT, the raw bytes as the body and a Content-Range header.
+    A chunk that does not start at the current offset is rejected with 409 and the
+    offset to resume from.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        pk (uuid): The id of the upload.
+
+    Returns:
+        JsonResponse: The current offset, status and running checksum of the upload.
+    """
+    if request.method == "GET":
+        upload = get_object_or_404(ChunkedUpload, id=pk, user=request.user)
+    elif request.method == "PUT":
+        try:
+            start, end, total = parse_content_range(request.headers.get("Content-Range"))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        length = end - start + 1
+        if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+            return JsonResponse({"error": "Chunk is too large"}, status=413)
+
+        with transaction.atomic():
+            upload = get_object_or_404(
+                ChunkedUpload.objects.select_for_update(), id=pk, user=request.user
+            )
+            if upload.status == "complete" or total != upload.size or start != upload.offset:
+                return JsonResponse(
+                    {"error": "Unexpected chunk", "offset": upload.offset}, status=409
+                )
+
+            try:
+                write_chunk(
+                    upload, request, start, length, request.headers.get("X-Chunk-SHA256")
+                )
+            except ValueError as e:
+                return JsonResponse({"error": str(e), "offset": upload.offset}, status=400)
+    else:
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    return JsonResponse(
+        {
+            "id": str(upload.id),
+            "offset": upload.offset,
+            "size": upload.size,
+            "status": upload.status,
+            "checksum": upload.checksum,
+        }
+    )
+
+
+@login_required
+def attach_contract_upload(request, pk, rental_pk):
+    """
+    This view attaches a complete upload to a rental as its contract.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        pk (uuid): The id of the upload.
+        rental_pk (int): The primary key of the rental.
+
+    Returns:
+        JsonResponse: The file name of the attached contract.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    upload = get_object_or_404(ChunkedUpload, id=pk, user=request.user)
+    rental = get_object_or_404(RentProperty, id=rental_pk, property__user=request.user)
+
+    try:
+        name = attach_upload(upload, rental)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=409)
+
+    return JsonResponse({"contract": name})
+
+
+@login_required
+def notifications_feed(request):
+    """
+    This view renders the next page of the user's notifications.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the cursor of the last page in "before"
+            and "unread" to only list unread notifications.
+
+    Returns:
+        HttpResponse: The notification items and the trigger to load the page after them.
+    """
+    unread_only = request.GET.get("unread") == "1"
+
+    try:
+        notifications, next_cursor = get_notifications_page(
+            request.user, request.GET.get("before"), unread_only=unread_only
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    context = {
+        "notifications": notifications,
+        "next_cursor": next_cursor,
+        "unread_only": unread_only,
+    }
+    return render(request, "includes/notifications_feed.html", context)
+
+
+def metrics(request):
+    """
+    This view exposes the application metrics in the Prometheus text format.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The metrics, 403 without the METRICS_TOKEN bearer token, or 404 when
+            no token is set.
+    """
+    # the metrics are only served to a scraper that has the token
+    if not settings.METRICS_TOKEN:
+        raise Http404
+
+    authorization = request.headers.get("Authorization", "")
+    if not constant_time_compare(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+        return HttpResponse(status=403)
+
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@login_required
+def api_resource(request, name):
+    """
+    This view returns a page of one of the resources of the read API as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the selected fields in
+            "fields", the cursor of the last page in "after", the page size in "limit"
+            and the filters of the resource.
+        name (str): The name of the resource, one of core.api.API_RESOURCES.
+
+    Returns:
+        HttpResponse: The rows of the page and the cursor of the next page.
+    """
+    if name not in API_RESOURCES:
+        raise Http404
+
+    return serve_api_page(request, name)
+
+
+@login_required
+@landlord_conditional
+@read_from_replicas
+def api_summary(request):
+    """
+    This view returns the summary numbers of the user's portfolio as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The summary, see get_portfolio_summary.
+    """
+    return json_response(request, get_portfolio_summary(request.user))
+
+
+@login_required
+def api_sync(request):
+    """
+    This view returns the changes of the user's data since the last sync of an offline
+    client as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with the cursor returned by the
+            last sync in "since", none for a first sync.
+
+    Returns:
+        HttpResponse: The changed and deleted rows and the cursor of the next page, see
+            core.sync.get_sync_page. A 410 when the client has to sync from scratch.
+    """
+    try:
+        page = get_sync_page(request.user, request.GET.get("since"))
+    except ValueError:
+        return json_response(request, {"error": "Invalid cursor"}, status=400)
+    except SyncCursorExpired:
+        return json_response(
+            request, {"error": "The cursor expired, sync from scratch"}, status=410
         )
 
-    return render(request, "core/all_tenants.html", {"all_tenants": Tenants})
+    return json_response(request, page)
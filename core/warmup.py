@@ -0,0 +1,62 @@
+import logging
+import os
+from time import perf_counter
+
+from django.conf import settings
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver
+from django.utils import translation
+
+
+logger = logging.getLogger(__name__)
+
+
+def find_templates():
+    """
+    Find the templates of the TEMPLATES directories, e.g. "includes/nav.html".
+
+    Returns:
+        list: The template names.
+    """
+    names = []
+    for engine in settings.TEMPLATES:
+        for directory in engine.get("DIRS", []):
+            for root, _, files in os.walk(directory):
+                for file in files:
+                    if file.endswith((".html", ".txt")):
+                        path = os.path.relpath(os.path.join(root, file), directory)
+                        names.append(path.replace(os.sep, "/"))
+    return sorted(names)
+
+
+def warm_up():
+    """
+    Do the work the first requests of a new worker would otherwise pay for.
+
+    It imports the URLconf and with it the views, compiles the project templates into the
+    cached template loader and loads the translation catalog of each of the LANGUAGES.
+
+    Returns:
+        dict: The number of compiled templates and the seconds the warm-up took.
+    """
+    start = perf_counter()
+
+    get_resolver().url_patterns
+
+    compiled = 0
+    for name in find_templates():
+        try:
+            get_template(name)
+            compiled += 1
+        except TemplateSyntaxError:
+            logger.exception("Could not compile the template %s", name)
+
+    # activating a language loads its catalog
+    for language, _ in settings.LANGUAGES:
+        with translation.override(language):
+            pass
+
+    duration = perf_counter() - start
+    logger.info("Warmed up %d templates in %.0fms", compiled, duration * 1000)
+    return {"templates": compiled, "seconds": duration}
@@ -81,60 +81,147 @@ closeNotifications.forEach((close) => {
 });
 
 // Close recent activities container when close is pressed
-closeRecentActivities.addEventListener("click", () => {
-    recentActivitiesContainer.classList.add("d-none");
-});
+// (on the dashboard the recent activities are loaded lazily, see htmx:load below)
+if (closeRecentActivities) {
+    closeRecentActivities.addEventListener("click", () => {
+        recentActivitiesContainer.classList.add("d-none");
+    });
+}
 
 // Notifications counter
 const notificationsCount = document.querySelectorAll(".notification-counter");
 
+// Live events, see core/events.py. Each event has the sequence number of the user's
+// events: the events already applied are skipped, and a gap asks the server for the
+// missed ones. After a reconnect the server sends the events missed meanwhile, or the
+// current state when there are too many. Resuming is also the heartbeat that keeps the
+// user counted as connected, the server acknowledges each with a "hello".
+// The page starts from the sequence number it was rendered at, so the events sent
+// before the socket was open are replayed too. Content loaded after it, e.g. the lazy
+// panels, may already have some of them: an item already shown is not added again.
+const RECENT_ACTIVITIES_SHOWN = 10;
+let lastSeq = document.body.dataset.eventSeq
+    ? Number(document.body.dataset.eventSeq)
+    : null;
+let resuming = false;
+let socket = null;
+let heartbeat = null;
+
+function resume() {
+    resuming = true;
+    socket.send(JSON.stringify({ type: "resume", v: 2, last_seq: lastSeq }));
+}
+
+document.body.addEventListener("htmx:wsOpen", (event) => {
+    socket = event.detail.socketWrapper;
+    resume();
+});
+
 document.body.addEventListener("htmx:wsAfterMessage", (event) => {
     const message = JSON.parse(event.detail.message);
 
-    if (message.type === "notifications") {
-        let numberOfNotifications = parseInt(notificationsCount[0].innerHTML);
-
-        if (isNaN(numberOfNotifications)) {
-            numberOfNotifications = 0;
+    if (message.type === "hello") {
+        // after the missed events, if any, so only a fresh page starts from it
+        if (lastSeq === null) {
+            lastSeq = message.seq;
         }
+        resuming = false;
+        if (!heartbeat) {
+            heartbeat = setInterval(resume, message.heartbeat * 1000);
+        }
+        return;
+    }
+    if (message.type === "resync") {
+        lastSeq = message.seq;
+        applyResync(message.data);
+        return;
+    }
+    if (lastSeq === null || message.seq <= lastSeq) {
+        return;
+    }
+    if (message.seq > lastSeq + 1) {
+        if (!resuming) {
+            resume();
+        }
+        return;
+    }
+    lastSeq = message.seq;
+    resuming = false;
 
-        numberOfNotifications += 1;
-
-        notificationsCount.forEach((count) => {
-            count.classList.remove("d-none");
-            count.innerHTML = numberOfNotifications;
-        });
+    const data = message.data;
+    if (message.type === "notification.created") {
+        setNotificationsCount(data.unread_count);
 
         notificationsContainer.forEach((container) => {
-            container.innerHTML = message.notifications_html;
-            attachCloseButtonListener();
+            const timeline = container.querySelector(".timeline");
+            if (timeline.querySelector(`[data-notification-id="${data.id}"]`)) {
+                return;
+            }
+            timeline.insertAdjacentHTML("afterbegin", data.html);
+            container
+                .querySelectorAll(".clear-notifications")
+                .forEach((button) => button.classList.remove("d-none"));
+            htmx.process(container);
         });
-    } else if (message.type === "recent_activities") {
-        recentActivitiesContainer.innerHTML = message.activities_html;
-        attachCloseButtonListener();
-    } else if (message.type === "clear_notifications") {
-        notificationsCount.forEach((count) => {
-            count.classList.add("d-none");
-            count.innerHTML = "";
+    } else if (message.type === "activity.created") {
+        // the dashboard and the navbar both show the recent activities
+        document.querySelectorAll("#recent-activities .timeline").forEach((timeline) => {
+            if (timeline.querySelector(`[data-activity-id="${data.id}"]`)) {
+                return;
+            }
+            timeline.insertAdjacentHTML("afterbegin", data.html);
+            while (timeline.children.length > RECENT_ACTIVITIES_SHOWN) {
+                timeline.lastElementChild.remove();
+            }
+            htmx.process(timeline);
         });
+    } else if (message.type === "notifications.cleared") {
+        setNotificationsCount(data.unread_count);
 
         notificationsContainer.forEach((container) => {
-            container.innerHTML = message.notifications_html;
+            container.querySelector(".timeline").innerHTML = "";
+            container
+                .querySelectorAll(".clear-notifications")
+                .forEach((button) => button.classList.add("d-none"));
             container.classList.add("d-none");
-            attachCloseButtonListener();
         });
-    } else if ((message.type = "payment_status_chart")) {        
-        paymentCharts(
-            parseInt(message.data["paid"]),
-            parseInt(message.data["pending"]),
-            parseInt(message.data["overdue"])
-        );
+    } else if (message.type === "chart.updated") {
+        paymentCharts(data.paid, data.pending, data.overdue);
     }
 });
 
+function applyResync(data) {
+    document.querySelectorAll("#recent-activities").forEach((activities) => {
+        activities.outerHTML = data.activities_html;
+    });
+    attachCloseButtonListener();
+
+    setNotificationsCount(data.unread_count);
+    notificationsContainer.forEach((container) => {
+        container.querySelector(".timeline").innerHTML = data.notifications_html;
+        container
+            .querySelectorAll(".clear-notifications")
+            .forEach((button) => button.classList.toggle("d-none", !data.unread_count));
+    });
+    htmx.process(document.body);
+
+    paymentCharts(data.chart.paid, data.chart.pending, data.chart.overdue);
+}
+
+function setNotificationsCount(count) {
+    notificationsCount.forEach((counter) => {
+        counter.classList.toggle("d-none", !count);
+        counter.innerHTML = count ? count : "";
+    });
+}
+
 function paymentCharts(paid, pending, overdue) {
-    rentPaymentChart.data.datasets[0].data = [paid, pending, overdue];
-    rentPaymentChart.update();
+    // the chart panel is loaded lazily and only drawn when there are rentals
+    if (!window.rentPaymentChart) {
+        return;
+    }
+    window.rentPaymentChart.data.datasets[0].data = [paid, pending, overdue];
+    window.rentPaymentChart.update();
 }
 
 // Function to attach the close button event listener
@@ -146,12 +233,14 @@ function attachCloseButtonListener() {
         ".close-recent-activities"
     );
 
-    closeRecentActivities.addEventListener("click", function () {
-        const container = this.closest(".navbar-recent-activities");
-        if (container) {
-            container.classList.add("d-none");
-        }
-    });
+    if (closeRecentActivities) {
+        closeRecentActivities.addEventListener("click", function () {
+            const container = this.closest(".navbar-recent-activities");
+            if (container) {
+                container.classList.add("d-none");
+            }
+        });
+    }
 
     closeNotifications.forEach((close) => {
         close.addEventListener("click", function () {
@@ -165,6 +254,13 @@ function attachCloseButtonListener() {
 
 attachCloseButtonListener();
 
+// Attach the listeners when a lazy loaded recent activities panel is added
+document.body.addEventListener("htmx:load", (event) => {
+    if (event.detail.elt.id === "recent-activities") {
+        attachCloseButtonListener();
+    }
+});
+
 
 const clock = document.querySelector(".bi-clock-nav");
 const clockContainer = document.querySelector(".navbar-recent-activities");